@@ -1,285 +1,4452 @@
-from flask import Flask, request, jsonify
+from flask import Flask, Response, request, jsonify, send_file, stream_with_context
 import docker
 import os
 import logging
+import json
+import math
+import fnmatch
+import hashlib
+import itertools
+import time
+import fcntl
+import queue
+import re
+import shlex
+import threading
+import shutil
+import sqlite3
+import subprocess
+import sys
+import tempfile
+import urllib.parse
+import urllib.request
+import gzip
+from collections import OrderedDict, deque
+from contextlib import contextmanager
 from pathlib import Path
-from datetime import datetime
+from datetime import datetime, timedelta
 import uuid
 
+from prometheus_client import (CONTENT_TYPE_LATEST, REGISTRY, CollectorRegistry, Counter, Histogram,
+                               generate_latest, multiprocess)
+from prometheus_client.core import GaugeMetricFamily
+from precompress import PRECOMPRESS_SUFFIXES, available_formats, remove_sidecars
+
 # Logging konfigurieren
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
 
-app = Flask(__name__)
+app = Flask(__name__)
+
+# Konfiguration für den Compiler
+COMPILER_CONFIG = {
+    'image': 'hugomods/hugo:debian-ci-0.147.9',
+    'command': 'hugo --gc --minify --baseURL "https://{domain}/"',
+    'working_dir': '/repo',
+    'entrypoint': '/bin/sh'
+}
+
+# Images der übrigen Step-Container
+STEP_IMAGES = {
+    'git': 'alpine/git:latest',
+    'rsync': 'secoresearch/rsync:latest'
+}
+
+PAGES_ROOT = os.getenv("PAGES_ROOT", "/statichosts/pages")
+
+# Konfiguration für das Veröffentlichen der Build-Ausgabe
+# release: Build wird nach releases/<deploy_id>/ verschoben und public per Symlink umgeschaltet
+# rsync: Build wird per rsync Container in das public Verzeichnis synchronisiert
+PUBLISH_CONFIG = {
+    'mode': os.getenv('PUBLISH_MODE', 'release'),
+    # Anzahl der aufbewahrten Releases für Rollbacks
+    'keep_releases': int(os.getenv('KEEP_RELEASES', '5'))
+}
+
+# Konfiguration der persistenten Hugo Caches
+HUGO_CACHE_CONFIG = {
+    'enabled': os.getenv('HUGO_CACHE', '1') == '1',
+    # Obergrenze für die Summe aller Domain-Caches (cacheDir, Bildverarbeitung)
+    'max_mb': int(os.getenv('HUGO_CACHE_MAX_MB', '4096')),
+    # Obergrenze für den gemeinsamen Modul-Cache
+    'modules_max_mb': int(os.getenv('HUGO_MODULE_CACHE_MAX_MB', '2048'))
+}
+
+# Warme Builder-Container: Steps laufen per exec in langlebigen Containern
+# pro Image statt in je einem neuen Container
+BUILDER_POOL_CONFIG = {
+    'enabled': os.getenv('BUILDER_POOL', '1') == '1',
+    # Builder werden nach so vielen Steps neu erstellt
+    'max_jobs': int(os.getenv('BUILDER_MAX_JOBS', '50')),
+    # Builder pro Image, die immer bereitstehen
+    'warm': int(os.getenv('BUILDER_WARM', '1')),
+    # Zusätzliche Builder werden nach dieser Leerlaufzeit entfernt
+    'idle_timeout': int(os.getenv('BUILDER_IDLE_TIMEOUT', '600')),
+    'check_interval': 60.0
+}
+
+# Step-Images werden beim Start im Hintergrund geholt und per Digest
+# festgeschrieben, /health meldet erst danach Bereitschaft
+IMAGE_CONFIG = {
+    # Tags beim Start neu pullen (0: nur fehlende Images holen)
+    'pull_on_start': os.getenv('IMAGE_PULL_ON_START', '1') == '1',
+    # Deploys warten höchstens so lange auf die Images
+    'wait_timeout': int(os.getenv('IMAGE_WAIT_TIMEOUT', '900')),
+    'retry_interval': 30.0,
+    # /health fragt den Docker Daemon höchstens so oft an
+    'ping_ttl': float(os.getenv('HEALTH_PING_TTL', '10'))
+}
+
+# Ressourcen- und Zeitlimits der Step-Container (git_pull, hugo_compile, rsync)
+# Kann pro Domain im Abschnitt "limits" von <domain>/config.json überschrieben werden,
+# 0 bzw. null schaltet ein Limit ab
+CONTAINER_LIMITS = {
+    'cpus': float(os.getenv('CONTAINER_CPUS', os.getenv('DEPLOY_BUILD_CPUS', '2'))),
+    'memory_mb': int(os.getenv('CONTAINER_MEMORY_MB', '2048')),
+    'pids': int(os.getenv('CONTAINER_PIDS_LIMIT', '1024')),
+    # Zeitlimit in Sekunden pro Step, 'default' für alle übrigen
+    'timeout': {
+        'git_pull': int(os.getenv('GIT_PULL_TIMEOUT', '300')),
+        'hugo_compile': int(os.getenv('HUGO_TIMEOUT', '1800')),
+        'rsync': int(os.getenv('RSYNC_TIMEOUT', '600')),
+        'default': 900
+    }
+}
+
+# Konfiguration für vorkomprimierte Assets (Caddy file_server precompressed)
+# Kann pro Domain im Abschnitt "precompress" von <domain>/config.json überschrieben werden
+PRECOMPRESS_CONFIG = {
+    'enabled': os.getenv('PRECOMPRESS', '1') == '1',
+    'formats': os.getenv('PRECOMPRESS_FORMATS', 'gzip,br,zstd').split(','),
+    'levels': {'gzip': 9, 'br': 11, 'zstd': 19},
+    'extensions': ['.html', '.htm', '.css', '.js', '.mjs', '.json', '.xml', '.svg', '.txt',
+                   '.map', '.webmanifest', '.ico', '.wasm', '.ttf', '.otf', '.eot'],
+    'min_size': 256,
+    'max_size': 50 * 1024 * 1024,
+    'workers': int(os.getenv('PRECOMPRESS_WORKERS', str(os.cpu_count() or 1)))
+}
+
+# Synchronisation des Repositories im git_pull Step
+# fetch: flacher, partieller Fetch nur des Release-Branches, danach reset --hard
+# pull: bisheriges "git pull origin release"
+# Kann pro Domain im Abschnitt "repository" von <domain>/config.json überschrieben werden
+REPO_SYNC_CONFIG = {
+    'mode': os.getenv('GIT_SYNC_MODE', 'fetch'),
+    'branch': os.getenv('GIT_BRANCH', 'release'),
+    # Anzahl der geholten Commits (0: vollständige Historie), nur für bereits
+    # flache Clones. Tief genug, dass der Commit des letzten Builds für die
+    # Änderungsprüfung meist noch vorhanden ist
+    'depth': int(os.getenv('GIT_FETCH_DEPTH', '50')),
+    # Partieller Clone: Dateiinhalte werden erst beim Checkout geholt ('' aus)
+    'filter': os.getenv('GIT_FETCH_FILTER', 'blob:none'),
+    # Sparse Checkout: false, true (Hugo Verzeichnisse) oder Liste von Verzeichnissen
+    'sparse': os.getenv('GIT_SPARSE_CHECKOUT', '0') == '1',
+    # Nicht versionierte Dateien entfernen (ignorierte Dateien bleiben erhalten)
+    'clean': True,
+    # Build-Ausgabe (mit Sidecars) und Hugo Resource-Cache bleiben beim Clean erhalten
+    'clean_exclude': ['/public', '/resources/_gen'],
+    # 0: alpine/git Container, 1: lokales git Binary, auto: lokal falls vorhanden
+    'local': os.getenv('GIT_LOCAL', '0')
+}
+
+# Verzeichnisse für den Sparse Checkout mit "sparse": true, Dateien im
+# Wurzelverzeichnis (hugo.toml, go.mod, package.json, ...) sind immer enthalten
+HUGO_SPARSE_PATHS = ['archetypes', 'assets', 'config', 'content', 'data', 'i18n', 'layouts', 'static', 'themes']
+
+# Content-addressed Asset-Store: identische Dateien aller Domains als Hardlinks
+# auf ein gemeinsames Objekt unter PAGES_ROOT/_objects
+ASSET_STORE_CONFIG = {
+    'enabled': os.getenv('ASSET_STORE', '0') == '1',
+    # Kleinere Dateien werden nicht in den Store übernommen
+    'min_size': int(os.getenv('ASSET_STORE_MIN_SIZE', '1')),
+    # Alter der Store-Statistik in Sekunden, ab dem ein Publish sie neu berechnet
+    'stats_max_age': 300
+}
+
+# Cache-Header Manifest (<domain>/cache-manifest.json) für Caddy bzw. einen
+# vorgelagerten Cache, nach jedem Publish und Rollback neu geschrieben
+# Kann pro Domain im Abschnitt "cache" von <domain>/config.json überschrieben werden
+CACHE_HEADERS_CONFIG = {
+    'enabled': os.getenv('CACHE_MANIFEST', '1') == '1',
+    # Dateien mit Hash im Namen: Hugo Fingerprints (main.<hash>.css) und
+    # verarbeitete Bilder (_hu<hash>_), Inhalt ändert sich nie unter demselben Namen
+    'immutable_patterns': [r'\.[0-9a-f]{32,128}\.(css|js|mjs|map)$', r'_hu[0-9a-f]{8,}_'],
+    'immutable_cache_control': 'public, max-age=31536000, immutable',
+    'cache_control': 'public, max-age=0, must-revalidate'
+}
+
+# Cache-Warming nach dem Publish: meistbesuchte Seiten laut Access-Log
+# in den Page Cache lesen oder über einen lokalen HTTP Front abrufen
+CACHE_WARM_CONFIG = {
+    'enabled': os.getenv('CACHE_WARM', '0') == '1',
+    'access_log': os.getenv('CACHE_WARM_ACCESS_LOG', '/statichosts/access.log'),
+    # Anzahl der meistbesuchten Pfade pro Domain
+    'top': int(os.getenv('CACHE_WARM_TOP', '50')),
+    # Nur das Ende des Access-Logs auswerten
+    'max_log_mb': int(os.getenv('CACHE_WARM_LOG_MB', '50')),
+    # Basis-URL eines lokalen HTTP Fronts (z.B. http://caddy), leer: nur Page Cache
+    'url': os.getenv('CACHE_WARM_URL', ''),
+    # Wie lange die ausgewertete Zugriffsstatistik wiederverwendet wird
+    'log_max_age': 600
+}
+
+# Konfiguration für den Domain-Index von /caddy-check
+DOMAIN_INDEX_CONFIG = {
+    'enabled': os.getenv('CADDY_CHECK_INDEX', '1') == '1',
+    # Wie lange unbekannte Domains ohne erneuten Dateisystem-Zugriff abgelehnt werden
+    'negative_ttl': float(os.getenv('CADDY_CHECK_NEGATIVE_TTL', '60')),
+    'negative_max': 10000,
+    # Abstand der Prüfung auf Änderungen durch andere Worker
+    'check_interval': 1.0,
+    # Vollständiger Neuaufbau, um manuelle Änderungen unter PAGES_ROOT zu erfassen
+    'rescan_interval': 300.0,
+    'log_interval': 60.0
+}
+
+# Konfiguration der Deploy-Logs
+LOG_CONFIG = {
+    # Maximale Anzahl aufbewahrter Logs pro Domain
+    'keep': int(os.getenv('LOG_RETENTION_COUNT', '200')),
+    # Logs, die älter sind, werden entfernt
+    'max_age_days': int(os.getenv('LOG_RETENTION_DAYS', '90')),
+    # Nur die neuesten Logs bleiben unkomprimiert, ältere werden mit gzip komprimiert
+    'compress_after': max(2, int(os.getenv('LOG_COMPRESS_AFTER', '10')))
+}
+
+# Konfiguration der Deploy-Historie (SQLite im Datenverzeichnis)
+HISTORY_CONFIG = {
+    # Einträge pro Seite in /history/<domain>, Standard und Obergrenze
+    'page_size': 50,
+    'max_page_size': 500,
+    # Standardzeitraum in Tagen für /history-trends
+    'trend_days': int(os.getenv('HISTORY_TREND_DAYS', '30')),
+    # Kurzes Busy-Timeout mit Wiederholung: SQLite wartet in C und blockiert
+    # dabei den gevent Event Loop des ganzen Workers
+    'busy_timeout': 0.1,
+    'busy_retries': 100,
+    'busy_retry_interval': 0.1,
+    # Der Backfill committet nach so vielen Einträgen
+    'backfill_batch': 50
+}
+
+# Konfiguration für die Deploy-Jobs
+JOB_CONFIG = {
+    # Worker-Greenlets pro Gunicorn Worker ('auto': so viele wie Deploy-Slots)
+    'workers': os.getenv('DEPLOY_WORKERS', 'auto'),
+    # Maximale Anzahl gleichzeitiger Deploys über alle Gunicorn Worker
+    # ('auto': aus CPU-Kernen und Arbeitsspeicher berechnet)
+    'max_concurrent': os.getenv('DEPLOY_MAX_CONCURRENT', 'auto'),
+    # Geschätzter Bedarf eines Hugo Builds für die automatische Berechnung
+    'build_cpus': float(os.getenv('DEPLOY_BUILD_CPUS', '2')),
+    'build_memory_mb': int(os.getenv('DEPLOY_BUILD_MEMORY_MB', '1024')),
+    # Abgeschlossene Jobs werden nach dieser Zeit entfernt
+    'retention_days': int(os.getenv('JOB_RETENTION_DAYS', '7')),
+    'poll_interval': 0.5
+}
+
+# Standardwerte des Abschnitts "deploy" in <domain>/config.json
+DEPLOY_DEFAULTS = {
+    # Jobs mit höherer Priorität werden zuerst gebaut
+    'priority': 0
+}
+
+# Änderungsabhängige Deploys: Builds nur, wenn der Push relevante Dateien ändert
+# Muster im fnmatch Format relativ zum Repository, * passt auch auf /
+# Überschreibbar pro Domain im Abschnitt "changes" von <domain>/config.json
+CHANGES_CONFIG = {
+    'enabled': os.getenv('DEPLOY_CHANGE_FILTER', '1') == '1',
+    'include': [
+        'content/*', 'layouts/*', 'static/*', 'assets/*', 'themes/*', 'data/*', 'i18n/*',
+        'config/*', 'hugo.toml', 'hugo.yaml', 'hugo.yml', 'hugo.json',
+        'config.toml', 'config.yaml', 'config.yml', 'config.json', 'go.mod', 'go.sum'
+    ],
+    'exclude': []
+}
+
+# ---------------------------------------------------------------------------
+# Metriken
+# ---------------------------------------------------------------------------
+#
+# Unter Gunicorn setzt gunicorn_config.py PROMETHEUS_MULTIPROC_DIR, jeder
+# Worker schreibt seine Werte dann in eigene Dateien und /metrics fasst sie
+# beim Abruf zusammen. Queue-Tiefe und laufende Builds werden beim Abruf aus
+# den Job-Markern im Datenverzeichnis gelesen, damit sie für alle Worker gelten.
+
+STEP_BUCKETS = (0.5, 1, 2, 5, 10, 20, 30, 60, 120, 300, 600, 1200, 1800)
+
+DEPLOY_STEP_DURATION = Histogram(
+    'deployer_deploy_step_duration_seconds', 'Dauer der Deploy-Schritte',
+    ['domain', 'step', 'status'], buckets=STEP_BUCKETS
+)
+DEPLOY_DURATION = Histogram(
+    'deployer_deploy_duration_seconds', 'Dauer kompletter Deploys',
+    ['domain'], buckets=STEP_BUCKETS
+)
+DEPLOYS_TOTAL = Counter(
+    'deployer_deploys_total', 'Abgeschlossene Deploys nach Ergebnis (success, cache_hit, skipped, failed)',
+    ['domain', 'outcome']
+)
+DOCKER_API_DURATION = Histogram(
+    'deployer_docker_api_duration_seconds', 'Latenz der Docker API Aufrufe',
+    ['operation'], buckets=(0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30)
+)
+DOCKER_API_ERRORS = Counter(
+    'deployer_docker_api_errors_total', 'Fehlgeschlagene Docker API Aufrufe',
+    ['operation']
+)
+CADDY_CHECKS_TOTAL = Counter(
+    'deployer_caddy_check_total', 'Anfragen an /caddy-check nach Ergebnis (hit, miss, invalid, error)',
+    ['result']
+)
+CADDY_CHECK_DURATION = Histogram(
+    'deployer_caddy_check_duration_seconds', 'Antwortzeit von /caddy-check',
+    buckets=(0.0001, 0.00025, 0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25)
+)
+
+@contextmanager
+def docker_api(operation):
+    """
+    Misst einen Docker API Aufruf
+    """
+    start = time.monotonic()
+    try:
+        yield
+    except Exception:
+        DOCKER_API_ERRORS.labels(operation).inc()
+        raise
+    finally:
+        DOCKER_API_DURATION.labels(operation).observe(time.monotonic() - start)
+
+# Docker Client initialisieren
+try:
+    docker_client = docker.from_env()
+    logger.info("Docker Client erfolgreich initialisiert")
+except Exception as e:
+    logger.error(f"Fehler beim Initialisieren des Docker Clients: {e}")
+    docker_client = None
+
+def deploy_log_path(domain, deploy_id):
+    return Path(PAGES_ROOT) / domain / "logs" / f"deploy_{deploy_id}.log"
+
+def open_deploy_log(domain, deploy_id):
+    """
+    Öffnet den Deploy-Log zum Anhängen, neue Logs werden im Log-Index eingetragen
+    """
+    log_file = deploy_log_path(domain, deploy_id)
+
+    # Log-Verzeichnis erstellen
+    log_file.parent.mkdir(parents=True, exist_ok=True)
+
+    is_new = not log_file.exists()
+    f = open(log_file, 'a', encoding='utf-8')
+    if is_new:
+        try:
+            register_deploy_log(domain, deploy_id)
+        except Exception as e:
+            logger.error(f"Fehler beim Eintragen in den Log-Index: {e}")
+    return f
+
+def write_deploy_log(domain, deploy_id, step, output, error=None):
+    """
+    Schreibt Deploy-Logs in eine Datei
+    """
+    try:
+        timestamp = datetime.now().strftime("%Y-%m-%d %H:%M:%S")
+        
+        with open_deploy_log(domain, deploy_id) as f:
+            f.write(f"\n=== {step.upper()} - {timestamp} ===\n")
+            if output:
+                f.write(f"STDOUT:\n{output}\n")
+            if error:
+                f.write(f"STDERR:\n{error}\n")
+            f.write("=" * 50 + "\n")
+            
+    except Exception as e:
+        logger.error(f"Fehler beim Schreiben des Deploy-Logs: {e}")
+
+def data_path(*parts):
+    """
+    Gibt einen Pfad im internen Datenverzeichnis zurück
+    Der Unterstrich im Namen verhindert Kollisionen mit gültigen Domains
+    """
+    root = os.getenv("DATA_ROOT") or str(Path(PAGES_ROOT) / "_deployer")
+    return Path(root).joinpath(*parts)
+
+def is_valid_domain(domain):
+    """
+    Einfache Überprüfung eines Domain-Namens
+    """
+    return bool(domain) and domain.replace('.', '').replace('-', '').isalnum()
+
+def domain_config(domain, section, defaults):
+    """
+    Liest einen Abschnitt der Domain-Konfiguration (<domain>/config.json)
+    und ergänzt fehlende Werte aus den Defaults
+    """
+    config = dict(defaults)
+    overrides = read_json(Path(PAGES_ROOT) / domain / "config.json", {}).get(section) or {}
+    for key, value in overrides.items():
+        if isinstance(value, dict) and isinstance(config.get(key), dict):
+            config[key] = {**config[key], **value}
+        else:
+            config[key] = value
+    return config
+
+def write_json_atomic(path, data, indent=2):
+    """
+    Schreibt JSON über eine temporäre Datei, damit Leser nie halbe Dateien sehen
+    """
+    path = Path(path)
+    path.parent.mkdir(parents=True, exist_ok=True)
+    tmp_path = path.with_name(f".{path.name}.{os.getpid()}.{uuid.uuid4().hex[:8]}.tmp")
+    with open(tmp_path, 'w', encoding='utf-8') as f:
+        json.dump(data, f, indent=indent)
+    os.replace(tmp_path, path)
+
+def read_json(path, default=None):
+    """
+    Liest eine JSON-Datei, gibt bei Fehlern den Default zurück
+    """
+    try:
+        with open(path, 'r', encoding='utf-8') as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return default
+
+def try_lock(path, shared=False):
+    """
+    Versucht eine prozessübergreifende Sperre (flock) ohne zu blockieren
+    Gibt das geöffnete File-Objekt zurück oder None, falls die Sperre belegt ist
+    """
+    path = Path(path)
+    path.parent.mkdir(parents=True, exist_ok=True)
+    lock_file = open(path, 'a+')
+    try:
+        fcntl.flock(lock_file.fileno(), (fcntl.LOCK_SH if shared else fcntl.LOCK_EX) | fcntl.LOCK_NB)
+    except OSError:
+        lock_file.close()
+        return None
+    return lock_file
+
+def release_lock(lock_file):
+    """
+    Gibt eine mit try_lock erhaltene Sperre wieder frei
+    """
+    try:
+        fcntl.flock(lock_file.fileno(), fcntl.LOCK_UN)
+    finally:
+        lock_file.close()
+
+@contextmanager
+def file_lock(path, poll_interval=0.2, shared=False):
+    """
+    Wartet auf eine prozessübergreifende Sperre
+    Pollt statt blockierend zu warten, damit gevent andere Greenlets weiterlaufen lässt
+    """
+    lock_file = try_lock(path, shared)
+    while lock_file is None:
+        time.sleep(poll_interval)
+        lock_file = try_lock(path, shared)
+    try:
+        yield
+    finally:
+        release_lock(lock_file)
+
+def read_git_head(repo_path):
+    """
+    Liest den HEAD-Commit direkt aus dem .git Verzeichnis (ohne Container)
+    Gibt None zurück, falls kein Git Repository vorhanden ist
+    """
+    git_dir = Path(repo_path) / ".git"
+    try:
+        head = (git_dir / "HEAD").read_text().strip()
+        if not head.startswith("ref: "):
+            return head or None
+        ref = head[5:]
+        ref_file = git_dir / ref
+        if ref_file.exists():
+            return ref_file.read_text().strip() or None
+        packed_refs = git_dir / "packed-refs"
+        if packed_refs.exists():
+            for line in packed_refs.read_text().splitlines():
+                if line.endswith(f" {ref}"):
+                    return line.split(" ", 1)[0]
+    except OSError:
+        pass
+    return None
+
+def use_local_git(local):
+    """
+    git lokal statt im alpine/git Container ausführen (GIT_LOCAL=1, auto: falls vorhanden)
+    """
+    local = str(local).lower()
+    return local in ('1', 'true', 'yes') or (local == 'auto' and shutil.which('git') is not None)
+
+def run_git(repo_path, args):
+    """
+    Führt einen git Befehl im Repository aus und gibt die Ausgabe zurück
+    Nutzt mit GIT_LOCAL ein lokales git Binary, sonst einen alpine/git Builder,
+    None bei Fehlern
+    """
+    if use_local_git(REPO_SYNC_CONFIG['local']):
+        try:
+            result = subprocess.run(['git', '-C', str(repo_path)] + args, capture_output=True, timeout=30)
+            if result.returncode == 0:
+                return result.stdout
+        except (OSError, subprocess.SubprocessError) as e:
+            logger.warning(f"Lokales git {args[0]} fehlgeschlagen: {e}")
+    if docker_client:
+        try:
+            return run_builder_command(
+                Path(repo_path).parent.name,
+                image=STEP_IMAGES['git'],
+                command=args,
+                volumes={
+                    str(repo_path): {
+                        'bind': '/repo',
+                        'mode': 'ro'
+                    }
+                },
+                working_dir="/repo",
+                user='1000'
+            )
+        except docker.errors.ContainerError as e:
+            logger.warning(f"git {args[0]} fehlgeschlagen: {e}")
+    return None
+
+def git_commit_info(repo_path):
+    """
+    Liest Hash, Autor und Datum des HEAD-Commits
+    """
+    output = run_git(repo_path, ['log', '-1', '--pretty=format:%H%x1f%an%x1f%ad', '--date=iso'])
+    if not output:
+        return None
+    commit_info = output.decode('utf-8').strip().split('\x1f')
+    if len(commit_info) < 3:
+        return None
+    return {
+        'hash': commit_info[0],
+        'author': commit_info[1],
+        'date': commit_info[2]
+    }
+
+def git_changed_paths(repo_path, old_commit, new_commit):
+    """
+    Pfade, die sich zwischen zwei Commits geändert haben
+    None, falls der alte Commit fehlt (z.B. nach einem Force-Push)
+    """
+    output = run_git(repo_path, ['diff', '--name-only', '--no-renames', '-z', old_commit, new_commit])
+    if output is None:
+        return None
+    return [path for path in output.decode('utf-8', errors='replace').split('\0') if path]
+
+def relevant_changes(domain, paths):
+    """
+    Filtert die geänderten Pfade mit den include/exclude Mustern der Domain
+    """
+    config = domain_config(domain, 'changes', CHANGES_CONFIG)
+    return [
+        path for path in paths
+        if any(fnmatch.fnmatchcase(path, pattern) for pattern in config['include'])
+        and not any(fnmatch.fnmatchcase(path, pattern) for pattern in config['exclude'])
+    ]
+
+def compute_build_key(domain, commit):
+    """
+    Schlüssel für den Build-Cache: gleicher Commit, gleiches Hugo Image und
+    gleicher Hugo Befehl ergeben dieselbe Ausgabe
+    Das Image geht mit seinem festgeschriebenen Digest ein, ein neu gepullter
+    :latest Tag erzwingt also einen neuen Build
+    """
+    key_data = {
+        'domain': domain,
+        'commit': commit,
+        'image': pinned_image(COMPILER_CONFIG['image']),
+        'command': COMPILER_CONFIG['command'].format(domain=domain)
+    }
+    return hashlib.sha256(json.dumps(key_data, sort_keys=True).encode('utf-8')).hexdigest()
+
+_rate_limited_logs = {}
+
+def log_rate_limited(key, level, message, interval=60.0):
+    """
+    Schreibt eine Log-Zeile höchstens einmal pro Intervall und Schlüssel,
+    unterdrückte Meldungen werden beim nächsten Eintrag mitgezählt
+    """
+    now = time.monotonic()
+    last, suppressed = _rate_limited_logs.get(key, (None, 0))
+    if last is not None and now - last < interval:
+        _rate_limited_logs[key] = (last, suppressed + 1)
+        return
+    _rate_limited_logs[key] = (now, 0)
+    if suppressed:
+        message = f"{message} ({suppressed} weitere Meldungen unterdrückt)"
+    logger.log(level, message)
+
+STEP_OUTPUT_TAIL_LINES = 50
+STEP_OUTPUT_MAX_LINE = 64 * 1024
+
+class StepLimitError(Exception):
+    """
+    Ein Step-Container hat ein Ressourcen- oder Zeitlimit erreicht
+    """
+    def __init__(self, message, step, limit):
+        super().__init__(message)
+        self.step = step
+        self.limit = limit
+
+def step_limits(domain, step):
+    """
+    Limits eines Step-Containers für die Domain, gibt (limits, timeout) zurück
+    """
+    limits = domain_config(domain, 'limits', CONTAINER_LIMITS)
+    timeouts = limits.get('timeout') or {}
+    return limits, timeouts.get(step, timeouts.get('default'))
+
+def container_limit_kwargs(limits):
+    kwargs = {}
+    if limits.get('cpus'):
+        kwargs['nano_cpus'] = int(float(limits['cpus']) * 1e9)
+    if limits.get('memory_mb'):
+        # Ohne Swap, sonst greift das Limit erst sehr spät
+        kwargs['mem_limit'] = kwargs['memswap_limit'] = f"{int(limits['memory_mb'])}m"
+    if limits.get('pids'):
+        kwargs['pids_limit'] = int(limits['pids'])
+    return kwargs
+
+def _sample_container_stats(container, peak, stop=None):
+    """
+    Liest den Stats-Stream eines Containers bis zu dessen Ende (oder bis stop
+    gesetzt ist) und merkt sich die Spitzenwerte (läuft in eigenem Greenlet)
+    """
+    try:
+        for stats in container.stats(stream=True, decode=True):
+            if stop is not None and stop.is_set():
+                break
+            memory_stats = stats.get('memory_stats') or {}
+            # Page Cache abziehen, wie docker stats
+            usage = memory_stats.get('usage', 0) - (memory_stats.get('stats') or {}).get('inactive_file', 0)
+            peak['memory'] = max(peak['memory'], usage)
+            cpu_stats = stats.get('cpu_stats') or {}
+            precpu_stats = stats.get('precpu_stats') or {}
+            cpu_delta = ((cpu_stats.get('cpu_usage') or {}).get('total_usage', 0)
+                         - (precpu_stats.get('cpu_usage') or {}).get('total_usage', 0))
+            system_delta = cpu_stats.get('system_cpu_usage', 0) - precpu_stats.get('system_cpu_usage', 0)
+            if cpu_delta > 0 and system_delta > 0:
+                cpu_percent = cpu_delta / system_delta * cpu_stats.get('online_cpus', 1) * 100
+                peak['cpu'] = max(peak['cpu'], cpu_percent)
+            peak['pids'] = max(peak['pids'], (stats.get('pids_stats') or {}).get('current', 0))
+            peak['throttled'] = (cpu_stats.get('throttling_data') or {}).get('throttled_time', 0) / 1e9
+    except Exception:
+        # Container beendet oder entfernt
+        pass
+
+def format_step_resources(limits, timeout, peak, duration, limit_hit):
+    memory_limit = f"{limits['memory_mb']} MB" if limits.get('memory_mb') else "-"
+    lines = [
+        f"Limits: CPUs {limits.get('cpus') or '-'}, Speicher {memory_limit}, "
+        f"PIDs {limits.get('pids') or '-'}, Zeitlimit {f'{timeout}s' if timeout else '-'}",
+        f"Spitzenwerte: CPU {peak['cpu']:.0f}%, Speicher {peak['memory'] // (1024 * 1024)} MB, "
+        f"PIDs {peak['pids']}, gedrosselt {peak['throttled']:.1f}s",
+        f"Dauer: {duration:.1f}s"
+    ]
+    if limit_hit:
+        lines.append(f"Limit erreicht: {limit_hit}")
+    return "\n".join(lines)
+
+def _stream_step_output(domain, deploy_id, step, chunks, tail):
+    """
+    Schreibt die Ausgabe eines Steps zeilenweise in den Deploy-Log
+    """
+    with open_deploy_log(domain, deploy_id) as f:
+        f.write(f"\n=== {step.upper()} - {datetime.now().strftime('%Y-%m-%d %H:%M:%S')} ===\n")
+        f.write("STDOUT:\n")
+        f.flush()
+        pending = b''
+        for chunk in chunks:
+            pending += chunk
+            while b'\n' in pending or len(pending) > STEP_OUTPUT_MAX_LINE:
+                if b'\n' in pending:
+                    line, pending = pending.split(b'\n', 1)
+                else:
+                    line, pending = pending[:STEP_OUTPUT_MAX_LINE], pending[STEP_OUTPUT_MAX_LINE:]
+                text = line.decode('utf-8', errors='replace')
+                f.write(text + "\n")
+                tail.append(text)
+            f.flush()
+        if pending:
+            text = pending.decode('utf-8', errors='replace')
+            f.write(text + "\n")
+            tail.append(text)
+        f.write("=" * 50 + "\n")
+
+def run_step_container(domain, deploy_id, step, **run_kwargs):
+    """
+    Führt einen Step-Container aus und schreibt seine Ausgabe zeilenweise in
+    den Deploy-Log, während der Container läuft. Im Speicher bleiben nur die
+    letzten Zeilen für Fehlermeldungen. Gibt diese Zeilen zurück und wirft
+    docker.errors.ContainerError bei einem Exit-Code ungleich 0.
+
+    CPU, Speicher und PIDs sind pro Domain begrenzt. Nach Ablauf des
+    Zeitlimits wird der Container beendet, bei Zeitlimit oder Speicherlimit
+    wird StepLimitError geworfen. Limits und Spitzenwerte landen im Log.
+
+    Mit Builder-Pool läuft der Step per exec in einem warmen Builder, ist
+    keiner verfügbar, in einem eigenen Container.
+    """
+    if builder_pool_enabled(run_kwargs.get('image')):
+        try:
+            with lease_builder(run_kwargs['image'], domain) as builder:
+                return run_step_exec(builder, domain, deploy_id, step, **run_kwargs)
+        except BuilderUnavailable as e:
+            log_rate_limited(f"builder_unavailable_{run_kwargs['image']}", logging.WARNING,
+                             f"{e}, {step} läuft in eigenem Container", 60.0)
+
+    tail = deque(maxlen=STEP_OUTPUT_TAIL_LINES)
+    limits, timeout = step_limits(domain, step)
+    peak = {'cpu': 0.0, 'memory': 0, 'pids': 0, 'throttled': 0.0}
+    timed_out = threading.Event()
+    limit_hit = None
+    start = time.monotonic()
+
+    with docker_api('create'):
+        container = docker_client.containers.run(detach=True, **container_limit_kwargs(limits),
+                                                 **{**run_kwargs, 'image': pinned_image(run_kwargs['image'])})
+
+    def kill_on_timeout():
+        timed_out.set()
+        try:
+            with docker_api('kill'):
+                container.kill()
+        except Exception as e:
+            logger.warning(f"Container für {step} konnte nicht beendet werden: {e}")
+
+    watchdog = threading.Timer(timeout, kill_on_timeout) if timeout else None
+    try:
+        if watchdog:
+            watchdog.daemon = True
+            watchdog.start()
+        threading.Thread(target=_sample_container_stats, args=(container, peak), daemon=True).start()
+
+        _stream_step_output(domain, deploy_id, step,
+                            container.logs(stream=True, follow=True, stdout=True, stderr=True), tail)
+
+        with docker_api('wait'):
+            exit_code = container.wait().get('StatusCode', 1)
+        if watchdog:
+            watchdog.cancel()
+
+        if timed_out.is_set():
+            limit_hit = f"Zeitlimit ({timeout}s)"
+            raise StepLimitError(f"{step} nach {timeout}s abgebrochen (Zeitlimit)", step, 'timeout')
+        if exit_code != 0:
+            try:
+                with docker_api('inspect'):
+                    container.reload()
+                oom_killed = container.attrs.get('State', {}).get('OOMKilled', False)
+            except Exception:
+                oom_killed = False
+            if oom_killed:
+                limit_hit = f"Speicher ({limits['memory_mb']} MB)"
+                raise StepLimitError(f"{step} wegen Speicherlimit ({limits['memory_mb']} MB) beendet",
+                                     step, 'memory')
+            if limits.get('pids') and peak['pids'] >= int(limits['pids']):
+                limit_hit = f"PIDs ({limits['pids']})"
+            raise docker.errors.ContainerError(
+                container, exit_code, run_kwargs.get('command'), run_kwargs.get('image'), "\n".join(tail)
+            )
+    finally:
+        if watchdog:
+            watchdog.cancel()
+        try:
+            with docker_api('remove'):
+                container.remove(force=True)
+        except Exception as e:
+            logger.warning(f"Container für {step} konnte nicht entfernt werden: {e}")
+        write_deploy_log(domain, deploy_id, f"{step}_resources",
+                         format_step_resources(limits, timeout, peak, time.monotonic() - start, limit_hit))
+        if limit_hit:
+            logger.warning(f"{step} für {domain} hat ein Limit erreicht: {limit_hit}")
+
+    return "\n".join(tail)
+
+# ---------------------------------------------------------------------------
+# Builder-Pool
+# ---------------------------------------------------------------------------
+#
+# Pro Step-Image und Domain laufen langlebige Builder-Container, in denen die
+# Steps per exec ausgeführt werden. Eingebunden ist nur das Verzeichnis der
+# Domain (beim Hugo Image dazu ihr Cache und der Modul-Cache), jeweils unter
+# demselben Pfad. Die Bind-Pfade der Steps (/repo, /cache, /source, ...)
+# werden auf diese Pfade umgeschrieben. Jeder Builder ist über ein Lockfile
+# exklusiv an einen Step vergeben, das gilt für alle Gunicorn Worker. CPU- und
+# Speicherlimits der Domain werden vor dem Step per docker update gesetzt, das
+# PID-Limit beim Erstellen (ändert es sich, wird der Builder neu erstellt).
+# Builder werden nach BUILDER_MAX_JOBS Steps neu erstellt und nach der
+# Leerlaufzeit entfernt, bis auf die zuletzt genutzten BUILDER_WARM pro Image.
+
+class BuilderUnavailable(Exception):
+    """
+    Kein Builder verfügbar, der Step läuft in einem eigenen Container
+    """
+
+_builder_entrypoints = {}
+
+def builder_images():
+    return [STEP_IMAGES['git'], COMPILER_CONFIG['image'], STEP_IMAGES['rsync']]
+
+def builder_pool_enabled(image):
+    return BUILDER_POOL_CONFIG['enabled'] and docker_client is not None and image in builder_images()
+
+def builder_pool_size():
+    # Pro Domain einer für den laufenden Deploy und einer für Aufrufe außerhalb
+    return 2
+
+def builder_key(image, domain):
+    return hashlib.sha256(f"{image}\0{domain}".encode('utf-8')).hexdigest()[:12]
+
+def builder_name(key, slot):
+    return f"statichub-builder-{key}-{slot}"
+
+def builder_state_path(key, slot):
+    return data_path("builders", f"{key}_{slot}.json")
+
+def builder_lock_path(key, slot):
+    return data_path("builders", f"{key}_{slot}.lock")
+
+def builder_mounts(image, domain):
+    """
+    Verzeichnisse, die im Builder einer Domain unter demselben Pfad eingebunden sind
+    """
+    roots = [Path(PAGES_ROOT) / domain]
+    if image == COMPILER_CONFIG['image'] and HUGO_CACHE_CONFIG['enabled']:
+        roots += [hugo_cache_path(domain), module_cache_path()]
+    return [str(root.resolve()) for root in roots]
+
+def builder_pids_limit(domain):
+    return int(domain_config(domain, 'limits', CONTAINER_LIMITS).get('pids') or 0)
+
+def _create_builder(image, domain, key, slot, mounts, pids):
+    for root in mounts:
+        # Sonst legt Docker fehlende Bind-Verzeichnisse als root an
+        Path(root).mkdir(parents=True, exist_ok=True)
+    volumes = {root: {'bind': root, 'mode': 'rw'} for root in mounts}
+    kwargs = {'pids_limit': pids} if pids else {}
+    with docker_api('create'):
+        return docker_client.containers.run(
+            image=pinned_image(image),
+            entrypoint=['tail', '-f', '/dev/null'],
+            name=builder_name(key, slot),
+            labels={'statichub.builder': key, 'statichub.slot': str(slot), 'statichub.image': image,
+                    'statichub.domain': domain},
+            volumes=volumes,
+            user='1000',
+            detach=True,
+            **kwargs
+        )
+
+def remove_builder(key, slot):
+    try:
+        with docker_api('remove'):
+            docker_client.containers.get(builder_name(key, slot)).remove(force=True)
+    except docker.errors.NotFound:
+        pass
+    builder_state_path(key, slot).unlink(missing_ok=True)
+
+def _ensure_builder(image, domain, slot):
+    """
+    Prüft den Builder eines Slots und erstellt ihn bei Bedarf neu
+    Aufruf nur mit gehaltenem Slot-Lock
+    """
+    key = builder_key(image, domain)
+    mounts = builder_mounts(image, domain)
+    pids = builder_pids_limit(domain)
+    state_path = builder_state_path(key, slot)
+    state = read_json(state_path, {})
+    try:
+        with docker_api('inspect'):
+            container = docker_client.containers.get(builder_name(key, slot))
+    except docker.errors.NotFound:
+        container = None
+
+    if container is not None:
+        reason = None
+        if container.status != 'running':
+            reason = f"Status {container.status}"
+        elif state.get('container_id') != container.id:
+            reason = "unbekannter Zustand"
+        elif state.get('image_ref') != pinned_image(image):
+            reason = f"neues Image {pinned_image(image)}"
+        elif state.get('jobs', 0) >= BUILDER_POOL_CONFIG['max_jobs']:
+            reason = f"{state['jobs']} Steps ausgeführt"
+        elif state.get('mounts') != mounts:
+            reason = "geänderte Verzeichnisse"
+        elif state.get('pids') != pids:
+            reason = f"PID-Limit {pids or 'keins'}"
+        if reason:
+            logger.info(f"Builder {builder_name(key, slot)} wird neu erstellt ({reason})")
+            with docker_api('remove'):
+                container.remove(force=True)
+            container = None
+
+    if container is None:
+        container = _create_builder(image, domain, key, slot, mounts, pids)
+        state = {
+            'container_id': container.id,
+            'image': image,
+            'image_ref': pinned_image(image),
+            'domain': domain,
+            'mounts': mounts,
+            'pids': pids,
+            'jobs': 0,
+            'created': time.time(),
+            'last_used': time.time(),
+            'limits': None
+        }
+        write_json_atomic(state_path, state)
+
+    return {'image': image, 'key': key, 'slot': slot, 'container': container, 'state': state,
+            'mounts': mounts, 'broken': False}
+
+@contextmanager
+def lease_builder(image, domain):
+    """
+    Belegt einen Builder für Image und Domain exklusiv (prozessübergreifend)
+    Wirft BuilderUnavailable, wenn kein Builder bereitgestellt werden kann
+    """
+    key = builder_key(image, domain)
+    while True:
+        for slot in range(builder_pool_size()):
+            lock_file = try_lock(builder_lock_path(key, slot))
+            if lock_file is None:
+                continue
+            try:
+                try:
+                    builder = _ensure_builder(image, domain, slot)
+                except Exception as e:
+                    raise BuilderUnavailable(f"Builder für {image} nicht verfügbar: {e}") from e
+                try:
+                    yield builder
+                finally:
+                    if builder['broken']:
+                        remove_builder(key, slot)
+                    else:
+                        builder['state']['jobs'] = builder['state'].get('jobs', 0) + 1
+                        builder['state']['last_used'] = time.time()
+                        write_json_atomic(builder_state_path(key, slot), builder['state'])
+            finally:
+                release_lock(lock_file)
+            return
+        time.sleep(JOB_CONFIG['poll_interval'])
+
+def _translate_builder_path(value, mapping):
+    """
+    Ersetzt Bind-Pfade (/repo, /cache, ...) durch die Pfade im Builder
+    """
+    for bind, host in sorted(mapping.items(), key=lambda item: -len(item[0])):
+        value = re.sub(rf'(?<![\w./-]){re.escape(bind)}(?=/|\s|$|["\'])', lambda m: host, value)
+    return value
+
+def _builder_entrypoint(image):
+    if image not in _builder_entrypoints:
+        with docker_api('inspect'):
+            config = docker_client.images.get(image).attrs.get('Config') or {}
+        _builder_entrypoints[image] = list(config.get('Entrypoint') or [])
+    return _builder_entrypoints[image]
+
+def _apply_builder_limits(builder, limits):
+    """
+    Setzt CPU- und Speicherlimit der Domain für den nächsten Step
+    Das PID-Limit lässt sich nicht per docker update ändern, es gilt ab _ensure_builder
+    """
+    wanted = [limits.get('cpus') or 0, limits.get('memory_mb') or 0]
+    if builder['state'].get('limits') == wanted:
+        return
+    kwargs = {'cpu_period': 100000, 'cpu_quota': int(float(wanted[0]) * 100000) if wanted[0] else -1}
+    # Ohne Limit der Domain: Speicher des Hosts als Obergrenze
+    memory_mb = int(wanted[1]) or memory_total_mb()
+    if memory_mb:
+        kwargs['mem_limit'] = kwargs['memswap_limit'] = f"{memory_mb}m"
+    try:
+        with docker_api('update'):
+            builder['container'].update(**kwargs)
+    except Exception as e:
+        raise BuilderUnavailable(f"Limits für Builder nicht anwendbar: {e}") from e
+    builder['state']['limits'] = wanted
+
+def _builder_exec(builder, command=None, volumes=None, environment=None, working_dir=None,
+                  entrypoint=None, user=None, image=None, **ignored):
+    """
+    Startet einen Befehl im Builder mit den Parametern eines containers.run
+    Aufrufs, gibt (exec_id, Ausgabe-Stream) zurück
+    """
+    mounts = builder['mounts']
+    mapping = {}
+    for host, spec in (volumes or {}).items():
+        host_path = Path(host).resolve()
+        if not any(host_path.is_relative_to(root) for root in mounts):
+            raise BuilderUnavailable(f"{host} ist im Builder nicht eingebunden")
+        mapping[spec['bind']] = str(host_path)
+
+    args = shlex.split(command) if isinstance(command, str) else list(command or [])
+    if entrypoint:
+        prefix = shlex.split(entrypoint) if isinstance(entrypoint, str) else list(entrypoint)
+    else:
+        prefix = _builder_entrypoint(builder['image'])
+    cmd = prefix + [_translate_builder_path(arg, mapping) for arg in args]
+    env = {name: _translate_builder_path(str(value), mapping) for name, value in (environment or {}).items()}
+    workdir = _translate_builder_path(working_dir, mapping) if working_dir else None
+
+    with docker_api('exec'):
+        exec_id = docker_client.api.exec_create(builder['container'].id, cmd, user=user or '',
+                                                workdir=workdir, environment=env)['Id']
+        output = docker_client.api.exec_start(exec_id, stream=True)
+    return exec_id, output
+
+def run_step_exec(builder, domain, deploy_id, step, **run_kwargs):
+    """
+    Führt einen Step per exec in einem Builder aus (wie run_step_container)
+    Beim Zeitlimit wird der ganze Builder beendet und entfernt
+    """
+    tail = deque(maxlen=STEP_OUTPUT_TAIL_LINES)
+    limits, timeout = step_limits(domain, step)
+    _apply_builder_limits(builder, limits)
+    peak = {'cpu': 0.0, 'memory': 0, 'pids': 0, 'throttled': 0.0}
+    timed_out = threading.Event()
+    stop_sampling = threading.Event()
+    limit_hit = None
+    start = time.monotonic()
+    container = builder['container']
+
+    exec_id, output = _builder_exec(builder, **run_kwargs)
+
+    def kill_on_timeout():
+        timed_out.set()
+        builder['broken'] = True
+        try:
+            with docker_api('kill'):
+                container.kill()
+        except Exception as e:
+            logger.warning(f"Builder für {step} konnte nicht beendet werden: {e}")
+
+    watchdog = threading.Timer(timeout, kill_on_timeout) if timeout else None
+    try:
+        if watchdog:
+            watchdog.daemon = True
+            watchdog.start()
+        threading.Thread(target=_sample_container_stats, args=(container, peak, stop_sampling),
+                         daemon=True).start()
+
+        _stream_step_output(domain, deploy_id, step, output, tail)
+
+        with docker_api('inspect'):
+            exit_code = docker_client.api.exec_inspect(exec_id).get('ExitCode')
+        if watchdog:
+            watchdog.cancel()
+
+        if timed_out.is_set():
+            limit_hit = f"Zeitlimit ({timeout}s)"
+            raise StepLimitError(f"{step} nach {timeout}s abgebrochen (Zeitlimit)", step, 'timeout')
+        if exit_code != 0:
+            # SIGKILL ohne Zeitlimit: der OOM-Killer hat den Step beendet
+            if exit_code == 137 and limits.get('memory_mb'):
+                limit_hit = f"Speicher ({limits['memory_mb']} MB)"
+                raise StepLimitError(f"{step} wegen Speicherlimit ({limits['memory_mb']} MB) beendet",
+                                     step, 'memory')
+            if limits.get('pids') and peak['pids'] >= int(limits['pids']):
+                limit_hit = f"PIDs ({limits['pids']})"
+            raise docker.errors.ContainerError(
+                container, exit_code, run_kwargs.get('command'), run_kwargs.get('image'), "\n".join(tail)
+            )
+    finally:
+        stop_sampling.set()
+        if watchdog:
+            watchdog.cancel()
+        write_deploy_log(domain, deploy_id, f"{step}_resources",
+                         format_step_resources(limits, timeout, peak, time.monotonic() - start, limit_hit))
+        if limit_hit:
+            logger.warning(f"{step} für {domain} hat ein Limit erreicht: {limit_hit}")
+
+    return "\n".join(tail)
+
+def run_builder_command(domain, **run_kwargs):
+    """
+    Führt einen kurzen Befehl aus und gibt seine Ausgabe zurück (Builder der
+    Domain oder eigener Container), wirft docker.errors.ContainerError bei Fehlern
+    """
+    if builder_pool_enabled(run_kwargs.get('image')):
+        try:
+            with lease_builder(run_kwargs['image'], domain) as builder:
+                exec_id, output = _builder_exec(builder, **run_kwargs)
+                data = b''.join(output)
+                with docker_api('inspect'):
+                    exit_code = docker_client.api.exec_inspect(exec_id).get('ExitCode')
+                if exit_code != 0:
+                    raise docker.errors.ContainerError(builder['container'], exit_code, run_kwargs.get('command'),
+                                                       run_kwargs.get('image'), data.decode('utf-8', 'replace'))
+                return data
+        except BuilderUnavailable as e:
+            logger.warning(f"{e}, Befehl läuft in eigenem Container")
+    return docker_client.containers.run(remove=True, detach=False, stdout=True, stderr=True,
+                                        **{**run_kwargs, 'image': pinned_image(run_kwargs['image'])})
+
+def maintain_builder_pool():
+    """
+    Entfernt Builder im Leerlauf (bis auf die zuletzt genutzten BUILDER_WARM
+    pro Image) sowie Builder veralteter Images und entfernter Domains
+    """
+    images = builder_images()
+    with docker_api('list'):
+        containers = docker_client.containers.list(all=True, filters={'label': 'statichub.builder'})
+    builders = []
+    for container in containers:
+        key = container.labels.get('statichub.builder')
+        slot = int(container.labels.get('statichub.slot', 0))
+        state = read_json(builder_state_path(key, slot), {})
+        builders.append((state.get('last_used', 0), key, slot, container))
+
+    warm = {}
+    for last_used, key, slot, container in sorted(builders, key=lambda item: item[0], reverse=True):
+        image = container.labels.get('statichub.image')
+        domain = container.labels.get('statichub.domain')
+        # Builder alter Images (z.B. nach Wechsel des Hugo Images), überzähliger
+        # Slots und Builder ohne Domain aus älteren Versionen
+        if image not in images or not domain or slot >= builder_pool_size() or key != builder_key(image, domain):
+            reason = "veraltet"
+        elif not (Path(PAGES_ROOT) / domain).is_dir():
+            reason = "Domain entfernt"
+        elif warm.get(image, 0) < BUILDER_POOL_CONFIG['warm']:
+            warm[image] = warm.get(image, 0) + 1
+            continue
+        elif time.time() - last_used > BUILDER_POOL_CONFIG['idle_timeout']:
+            reason = "Leerlauf"
+        else:
+            continue
+        lock_file = try_lock(builder_lock_path(key, slot))
+        if lock_file is None:
+            continue
+        try:
+            logger.info(f"Entferne Builder {container.name} ({reason})")
+            remove_builder(key, slot)
+        finally:
+            release_lock(lock_file)
+
+def _builder_maintenance():
+    # Builder erst mit den festgeschriebenen Images starten
+    wait_for_images()
+    while True:
+        try:
+            maintain_builder_pool()
+        except Exception as e:
+            logger.warning(f"Fehler bei der Pflege des Builder-Pools: {e}")
+        time.sleep(BUILDER_POOL_CONFIG['check_interval'])
+
+# ---------------------------------------------------------------------------
+# Step-Images
+# ---------------------------------------------------------------------------
+#
+# Nach jedem Start (erkannt an der Boot-ID, die der Gunicorn Master in
+# on_starting setzt) holt ein Worker die Step-Images im Hintergrund und
+# schreibt ihre Digests in images.json.
+# Container und Builder werden danach mit image@sha256:... gestartet, ein
+# :latest Tag wird also nur beim nächsten Start neu aufgelöst. Deploys
+# warten, bis die Images bereitstehen. Fehlt ein festgeschriebenes Image
+# später lokal (z.B. nach docker image prune), wird es neu geholt.
+
+_image_state_cache = {'mtime_ns': None, 'state': {}}
+
+# Ohne Gunicorn (python app.py) gilt jeder Prozessstart als neuer Start
+_PROCESS_BOOT_ID = uuid.uuid4().hex
+
+# Ergebnis der letzten Prüfung, ob die festgeschriebenen Images lokal vorhanden sind
+PINNED_IMAGE_CACHE = {'checked': None, 'refs': None, 'present': False}
+
+def image_state_path():
+    return data_path("images.json")
+
+def step_images():
+    return builder_images()
+
+def _boot_id():
+    # Unter Gunicorn pro Start vom Master gesetzt, gleich für alle Worker
+    return os.environ.get('DEPLOYER_BOOT_ID') or _PROCESS_BOOT_ID
+
+def load_image_state():
+    """
+    Zustand der Step-Images (Cache pro Prozess bis sich die Datei ändert)
+    """
+    try:
+        mtime_ns = os.stat(image_state_path()).st_mtime_ns
+    except OSError:
+        return {}
+    if _image_state_cache['mtime_ns'] != mtime_ns:
+        _image_state_cache['state'] = read_json(image_state_path(), {})
+        _image_state_cache['mtime_ns'] = mtime_ns
+    return _image_state_cache['state']
+
+def pinned_image(image):
+    """
+    Gibt die per Digest festgeschriebene Referenz eines Step-Images zurück
+    """
+    entry = (load_image_state().get('images') or {}).get(image) or {}
+    return entry.get('ref') or image
+
+def _image_present(ref):
+    try:
+        with docker_api('inspect'):
+            docker_client.images.get(ref)
+        return True
+    except docker.errors.ImageNotFound:
+        return False
+
+def pinned_images_present(refs):
+    """
+    Prüft ob die festgeschriebenen Images lokal vorhanden sind
+    Das Ergebnis gilt pro Worker HEALTH_PING_TTL Sekunden
+    """
+    now = time.monotonic()
+    checked = PINNED_IMAGE_CACHE['checked']
+    if PINNED_IMAGE_CACHE['refs'] != refs or checked is None or now - checked > IMAGE_CONFIG['ping_ttl']:
+        try:
+            present = all(_image_present(ref) for ref in refs)
+        except Exception as e:
+            logger.warning(f"Festgeschriebene Images konnten nicht geprüft werden: {e}")
+            present = False
+        PINNED_IMAGE_CACHE.update(checked=now, refs=refs, present=present)
+    return PINNED_IMAGE_CACHE['present']
+
+def images_ready():
+    state = load_image_state()
+    images = state.get('images') or {}
+    entries = [images.get(image) or {} for image in step_images()]
+    if state.get('boot') != _boot_id() or any(entry.get('status') != 'ready' for entry in entries):
+        return False
+    return pinned_images_present(tuple(entry['ref'] for entry in entries))
+
+def _split_image(image):
+    repository, _, tag = image.rpartition(':')
+    if not repository or '/' in tag:
+        return image, 'latest'
+    return repository, tag
+
+def _image_digest_ref(image_obj, repository):
+    for digest in image_obj.attrs.get('RepoDigests') or []:
+        if digest.split('@')[0] == repository:
+            return digest
+    return None
+
+def _prepare_image(image):
+    """
+    Holt ein Step-Image und gibt seinen Eintrag für images.json zurück
+    Schlägt der Pull fehl, wird ein lokal vorhandenes Image verwendet
+    """
+    repository, tag = _split_image(image)
+    image_obj = None
+    error = None
+    if not IMAGE_CONFIG['pull_on_start']:
+        try:
+            with docker_api('inspect'):
+                image_obj = docker_client.images.get(image)
+        except docker.errors.ImageNotFound:
+            pass
+    if image_obj is None:
+        start = time.monotonic()
+        try:
+            with docker_api('pull'):
+                image_obj = docker_client.images.pull(repository, tag=tag)
+            logger.info(f"Image {image} in {time.monotonic() - start:.1f}s geholt")
+        except Exception as e:
+            error = str(e)
+            logger.warning(f"Pull von {image} fehlgeschlagen: {e}")
+            try:
+                with docker_api('inspect'):
+                    image_obj = docker_client.images.get(image)
+            except docker.errors.ImageNotFound:
+                return {'status': 'error', 'ref': None, 'error': error,
+                        'updated': datetime.now().isoformat()}
+
+    # Lokal gebaute Images haben keinen Digest, dann über die Image-ID festschreiben
+    ref = _image_digest_ref(image_obj, repository) or image_obj.id
+    return {'status': 'ready', 'ref': ref, 'id': image_obj.id, 'error': error,
+            'updated': datetime.now().isoformat()}
+
+def prepare_images():
+    """
+    Holt alle Step-Images für diesen Start, gibt True zurück wenn alle bereit sind
+    Aufruf nur mit gehaltenem Image-Lock
+    """
+    boot = _boot_id()
+    state = read_json(image_state_path(), {})
+    if state.get('boot') != boot:
+        # Einträge des letzten Starts behalten, bis die Images neu geholt sind
+        state = {'boot': boot, 'started': datetime.now().isoformat(), 'images': {
+            image: {**entry, 'status': 'pending'} for image, entry in (state.get('images') or {}).items()
+        }}
+    for image in step_images():
+        entry = state['images'].get(image) or {}
+        if entry.get('status') == 'ready' and _image_present(entry['ref']):
+            continue
+        state['images'][image] = {**(state['images'].get(image) or {}), 'status': 'pulling'}
+        write_json_atomic(image_state_path(), state)
+        state['images'][image] = _prepare_image(image)
+        write_json_atomic(image_state_path(), state)
+    PINNED_IMAGE_CACHE['checked'] = None
+    return all(state['images'][image]['status'] == 'ready' for image in step_images())
+
+def _image_preparer():
+    """
+    Läuft in jedem Worker, genau einer holt die Images, die anderen warten
+    Nach dem Start wird regelmäßig geprüft, ob die Images noch vorhanden sind
+    """
+    while True:
+        if images_ready():
+            time.sleep(IMAGE_CONFIG['retry_interval'])
+            continue
+        lock_file = try_lock(data_path("locks", "images.lock"))
+        if lock_file is None:
+            time.sleep(2)
+            continue
+        try:
+            ready = images_ready() or prepare_images()
+        except Exception as e:
+            logger.error(f"Fehler beim Vorbereiten der Images: {e}")
+            ready = False
+        finally:
+            release_lock(lock_file)
+        if not ready:
+            time.sleep(IMAGE_CONFIG['retry_interval'])
+
+def wait_for_images(timeout=None):
+    """
+    Wartet bis die Step-Images bereit sind, gibt False nach Ablauf des Timeouts zurück
+    """
+    deadline = time.monotonic() + timeout if timeout else None
+    while not images_ready():
+        if deadline and time.monotonic() > deadline:
+            return False
+        time.sleep(1.0)
+    return True
+
+class DeployError(Exception):
+    """
+    Fehler in einem Deploy-Schritt, bricht den Deploy ab
+    """
+    def __init__(self, message, step=None, hint=None):
+        super().__init__(message)
+        self.step = step
+        self.hint = hint
+
+# ---------------------------------------------------------------------------
+# Deploy-Jobs
+# ---------------------------------------------------------------------------
+#
+# Der Deploy-Endpunkt reiht Jobs nur noch ein und antwortet sofort mit 202.
+# Jeder Gunicorn Worker startet beim ersten Job eigene Worker-Greenlets, die
+# Jobs aus seiner Queue abarbeiten. Die globale Obergrenze gleichzeitiger
+# Deploys wird über Slot-Lockfiles im Datenverzeichnis durchgesetzt, der
+# Job-Status liegt als JSON auf der Platte und ist damit von jedem Worker
+# aus abrufbar.
+
+JOB_RUNTIME = {
+    'pid': None,
+    'queue': None,
+    'owner': None,
+    'owner_lock': None
+}
+_queue_sequence = itertools.count()
+
+def queue_job(job):
+    """
+    Reiht einen Job in die Queue dieses Workers ein
+    Höhere Priorität zuerst, bei gleicher Priorität einzelne Deploys vor
+    Batch-Deploys, sonst in Reihenfolge des Einreihens
+    """
+    JOB_RUNTIME['queue'].put((-job.get('priority', 0), 1 if job.get('batch_id') else 0,
+                              next(_queue_sequence), job['job_id']))
+
+def _queue_job_later(job):
+    time.sleep(JOB_CONFIG['poll_interval'])
+    queue_job(job)
+
+def job_path(job_id):
+    return data_path("jobs", f"{job_id}.json")
+
+def save_job(job):
+    job['updated'] = datetime.now().isoformat()
+    write_json_atomic(job_path(job['job_id']), job)
+
+def load_job(job_id):
+    # Nur Hex-IDs zulassen, damit keine Pfade außerhalb von jobs/ gelesen werden
+    if not job_id or not all(c in '0123456789abcdef' for c in job_id):
+        return None
+    return read_json(job_path(job_id))
+
+def _owner_alive(owner):
+    """
+    Prüft ob der Prozess, der einen Job besitzt, noch lebt
+    Jeder Prozess hält sein Owner-Lockfile bis zum Ende gesperrt
+    """
+    if not owner:
+        return False
+    if owner == JOB_RUNTIME['owner']:
+        return True
+    lock_path = data_path("owners", f"{owner}.lock")
+    lock_file = try_lock(lock_path)
+    if lock_file is None:
+        return True
+    release_lock(lock_file)
+    try:
+        lock_path.unlink()
+    except OSError:
+        pass
+    return False
+
+def _recover_jobs():
+    """
+    Übernimmt Jobs von beendeten Workern (z.B. nach einem Absturz)
+    und entfernt abgeschlossene Jobs und Batches nach Ablauf der Aufbewahrungszeit
+    """
+    cutoff = datetime.now() - timedelta(days=JOB_CONFIG['retention_days'])
+    batches_dir = data_path("batches")
+    if batches_dir.exists():
+        for path in batches_dir.glob("*.json"):
+            batch = read_json(path)
+            if batch and datetime.fromisoformat(batch['created']) < cutoff:
+                path.unlink(missing_ok=True)
+
+    jobs_dir = data_path("jobs")
+    if not jobs_dir.exists():
+        return
+    for path in sorted(jobs_dir.glob("*.json")):
+        job = read_json(path)
+        if not job:
+            continue
+        if job['status'] in ('success', 'failed'):
+            if datetime.fromisoformat(job.get('finished') or job['created']) < cutoff:
+                path.unlink(missing_ok=True)
+            continue
+        if _owner_alive(job.get('owner')):
+            continue
+        with domain_state_lock(job['domain']):
+            # Erneut lesen, ein anderer Worker könnte den Job bereits übernommen haben
+            job = read_json(path)
+            if not job or _owner_alive(job.get('owner')):
+                continue
+            if job['status'] == 'queued':
+                logger.info(f"Übernehme verwaisten Job {job['job_id']} ({job['domain']})")
+                job['owner'] = JOB_RUNTIME['owner']
+                save_job(job)
+                queue_job(job)
+            elif job['status'] == 'running':
+                job['status'] = 'failed'
+                job['error'] = 'Worker wurde während des Deploys beendet'
+                job['finished'] = datetime.now().isoformat()
+                save_job(job)
+
+def ensure_job_workers():
+    """
+    Startet die Worker-Greenlets im aktuellen Prozess (einmal pro Prozess)
+    Lazy, weil Gunicorn mit preload_app vor dem Fork importiert
+    Kein Lock: ein vor dem Monkey-Patching angelegter threading.Lock würde den
+    ganzen gevent Worker blockieren. Prüfen und Setzen der PID geschieht ohne
+    Wechsel zu einem anderen Greenlet, spätere Aufrufe kehren sofort zurück
+    """
+    if JOB_RUNTIME['pid'] == os.getpid():
+        return
+    JOB_RUNTIME['pid'] = os.getpid()
+    JOB_RUNTIME['queue'] = queue.PriorityQueue()
+    JOB_RUNTIME['owner'] = uuid.uuid4().hex
+    JOB_RUNTIME['owner_lock'] = try_lock(data_path("owners", f"{JOB_RUNTIME['owner']}.lock"))
+    for i in range(job_worker_count()):
+        worker = threading.Thread(target=_job_worker, name=f"deploy-worker-{i}", daemon=True)
+        worker.start()
+    if docker_client:
+        threading.Thread(target=_image_preparer, name="image-preparer", daemon=True).start()
+    if BUILDER_POOL_CONFIG['enabled'] and docker_client:
+        threading.Thread(target=_builder_maintenance, name="builder-pool", daemon=True).start()
+    threading.Thread(target=_history_backfill, name="history-backfill", daemon=True).start()
+    try:
+        _recover_jobs()
+    except Exception as e:
+        logger.error(f"Fehler beim Übernehmen verwaister Jobs: {e}")
+
+def available_cpus():
+    """
+    Anzahl nutzbarer CPU-Kerne, berücksichtigt CPU-Affinität und cgroup-Limits
+    """
+    try:
+        cpus = len(os.sched_getaffinity(0))
+    except AttributeError:
+        cpus = os.cpu_count() or 1
+    try:
+        quota, period = Path("/sys/fs/cgroup/cpu.max").read_text().split()
+        if quota != 'max':
+            cpus = min(cpus, max(1, int(quota) // int(period)))
+    except (OSError, ValueError):
+        pass
+    return cpus
+
+def _meminfo_mb(field):
+    try:
+        with open("/proc/meminfo") as f:
+            for line in f:
+                if line.startswith(f"{field}:"):
+                    return int(line.split()[1]) // 1024
+    except (OSError, ValueError):
+        pass
+    return None
+
+def _cgroup_memory_limit_mb():
+    try:
+        limit = Path("/sys/fs/cgroup/memory.max").read_text().strip()
+        if limit != 'max':
+            return int(limit) // (1024 * 1024)
+    except (OSError, ValueError):
+        pass
+    return None
+
+def memory_total_mb():
+    """
+    Arbeitsspeicher des Hosts bzw. das cgroup-Limit des Containers
+    """
+    totals = [m for m in (_meminfo_mb('MemTotal'), _cgroup_memory_limit_mb()) if m]
+    return min(totals) if totals else None
+
+def memory_available_mb():
+    """
+    Aktuell verfügbarer Arbeitsspeicher (Host bzw. cgroup)
+    """
+    available = [_meminfo_mb('MemAvailable')]
+    limit = _cgroup_memory_limit_mb()
+    if limit:
+        try:
+            used = int(Path("/sys/fs/cgroup/memory.current").read_text()) // (1024 * 1024)
+            available.append(limit - used)
+        except (OSError, ValueError):
+            pass
+    available = [m for m in available if m is not None]
+    return min(available) if available else None
+
+_deploy_slot_count = None
+
+def deploy_slot_count():
+    """
+    Anzahl der globalen Deploy-Slots
+
+    Mit DEPLOY_MAX_CONCURRENT=auto aus CPU-Kernen und Gesamtspeicher: so viele
+    Builds, wie nach DEPLOY_BUILD_CPUS und DEPLOY_BUILD_MEMORY_MB hineinpassen.
+    Berechnet aus festen Größen, damit alle Gunicorn Worker denselben Wert haben.
+    """
+    global _deploy_slot_count
+    if _deploy_slot_count is None:
+        if JOB_CONFIG['max_concurrent'] != 'auto':
+            _deploy_slot_count = max(1, int(JOB_CONFIG['max_concurrent']))
+        else:
+            slots = int(available_cpus() // max(JOB_CONFIG['build_cpus'], 0.1))
+            total_memory = memory_total_mb()
+            if total_memory:
+                slots = min(slots, total_memory // max(JOB_CONFIG['build_memory_mb'], 1))
+            _deploy_slot_count = max(1, slots)
+    return _deploy_slot_count
+
+def job_worker_count():
+    if JOB_CONFIG['workers'] != 'auto':
+        return max(1, int(JOB_CONFIG['workers']))
+    return deploy_slot_count()
+
+@contextmanager
+def deploy_slot():
+    """
+    Belegt einen der globalen Deploy-Slots (prozessübergreifend)
+
+    Laufen bereits andere Builds, wird zusätzlich gewartet, bis genug
+    Arbeitsspeicher für einen weiteren Build frei ist
+    """
+    slots = deploy_slot_count()
+    while True:
+        for i in range(slots):
+            lock_file = try_lock(data_path("slots", f"slot_{i}.lock"))
+            if lock_file is None:
+                continue
+            # Slots werden der Reihe nach belegt: ab Slot 1 läuft mindestens ein anderer Build
+            available = memory_available_mb() if i > 0 else None
+            if available is not None and available < JOB_CONFIG['build_memory_mb']:
+                release_lock(lock_file)
+                log_rate_limited('deploy_slot_memory', logging.INFO,
+                                 f"Nur {available} MB Arbeitsspeicher frei, weiterer Build wartet",
+                                 60.0)
+                break
+            try:
+                yield i
+            finally:
+                release_lock(lock_file)
+            return
+        time.sleep(JOB_CONFIG['poll_interval'])
+
+def new_deploy_id():
+    """
+    Erzeugt eine Deploy-ID, sortierbar nach Zeit und eindeutig auch bei
+    mehreren Requests in derselben Sekunde
+    """
+    return f"{datetime.now().strftime('%Y%m%d_%H%M%S')}_{uuid.uuid4().hex[:6]}"
+
+def domain_state_lock(domain):
+    """
+    Kurze Sperre für den Queue-Zustand einer Domain (Einreihen, Zusammenfassen, Starten)
+    """
+    return file_lock(data_path("locks", f"{domain}.state.lock"), poll_interval=0.05)
+
+def domain_build_lock_path(domain):
+    """
+    Sperre, die während eines kompletten Deploys einer Domain gehalten wird
+    """
+    return data_path("locks", f"{domain}.build.lock")
+
+def enqueue_deploy(domain, deploy_id, force=False, priority=None, batch_id=None):
+    """
+    Legt einen Deploy-Job an und reiht ihn in die Queue dieses Workers ein
+
+    Wartet für die Domain bereits ein noch nicht gestarteter Job, wird der
+    Trigger in diesen Job zusammengefasst. Gibt (job, coalesced) zurück.
+    Ohne Priorität gilt der Wert aus der Domain-Konfiguration (Abschnitt "deploy").
+    """
+    if priority is None:
+        priority = domain_config(domain, 'deploy', DEPLOY_DEFAULTS)['priority']
+    ensure_job_workers()
+    pending_path = data_path("domains", domain, "pending.json")
+    with domain_state_lock(domain):
+        pending = read_json(pending_path, {})
+        job = load_job(pending.get('job_id'))
+        if job and job['status'] == 'queued':
+            job['triggers'] += 1
+            job['force'] = job.get('force', False) or force
+            if not _owner_alive(job.get('owner')):
+                # Besitzer des wartenden Jobs ist beendet, Job hier übernehmen
+                job['owner'] = JOB_RUNTIME['owner']
+                queue_job(job)
+            save_job(job)
+            return job, True
+
+        job = {
+            'job_id': uuid.uuid4().hex,
+            'type': 'deploy',
+            'domain': domain,
+            'deploy_id': deploy_id,
+            'status': 'queued',
+            'triggers': 1,
+            'force': force,
+            'priority': priority,
+            'batch_id': batch_id,
+            'created': datetime.now().isoformat(),
+            'started': None,
+            'finished': None,
+            'duration': None,
+            'steps': [],
+            'result': None,
+            'error': None,
+            'owner': JOB_RUNTIME['owner']
+        }
+        save_job(job)
+        write_json_atomic(pending_path, {'job_id': job['job_id']})
+    queue_job(job)
+    return job, False
+
+def running_marker_path(domain):
+    return data_path("domains", domain, "running.json")
+
+def deploy_in_progress(domain, deploy_id):
+    """
+    Prüft ob ein Deploy noch wartet oder läuft (für das Log-Streaming)
+    """
+    for marker in (running_marker_path(domain), data_path("domains", domain, "pending.json")):
+        job = load_job(read_json(marker, {}).get('job_id'))
+        if job and job['deploy_id'] == deploy_id and job['status'] in ('queued', 'running'):
+            return True
+    return False
+
+def claim_job(job_id):
+    """
+    Markiert einen Job als laufend, ab jetzt eintreffende Trigger erzeugen einen Folge-Job
+    """
+    job = load_job(job_id)
+    if not job:
+        return None
+    with domain_state_lock(job['domain']):
+        job = load_job(job_id)
+        if not job or job['status'] != 'queued':
+            return None
+        pending_path = data_path("domains", job['domain'], "pending.json")
+        if read_json(pending_path, {}).get('job_id') == job_id:
+            pending_path.unlink(missing_ok=True)
+        job['status'] = 'running'
+        job['started'] = datetime.now().isoformat()
+        save_job(job)
+        write_json_atomic(running_marker_path(job['domain']), {
+            'job_id': job_id,
+            'deploy_id': job['deploy_id'],
+            'started': job['started']
+        })
+    return job
+
+def _job_worker():
+    while True:
+        job_id = JOB_RUNTIME['queue'].get()[-1]
+        try:
+            job = load_job(job_id)
+            if not job or job['status'] != 'queued':
+                continue
+            # Deploys einer Domain laufen nacheinander, auch über Gunicorn Worker hinweg.
+            # Ist die Domain belegt, kommt der Job zurück in die Queue, damit andere
+            # Domains nicht warten müssen.
+            build_lock = try_lock(domain_build_lock_path(job['domain']))
+            if build_lock is None:
+                # Verzögert zurück in die Queue, sonst würde ein Job mit hoher
+                # Priorität sofort wieder gezogen und andere Domains blockieren
+                threading.Thread(target=_queue_job_later, args=(job,), daemon=True).start()
+                continue
+            try:
+                with deploy_slot():
+                    job = claim_job(job_id)
+                    if job:
+                        run_job(job)
+            finally:
+                release_lock(build_lock)
+        except Exception as e:
+            logger.error(f"Fehler im Deploy-Worker für Job {job_id}: {e}")
+
+def run_job(job):
+    """
+    Führt einen Job aus und hält den Status in der Job-Datei aktuell
+    """
+    start = time.monotonic()
+    try:
+        if not images_ready():
+            write_deploy_log(job['domain'], job['deploy_id'], "images", "Warte auf Step-Images")
+            if not wait_for_images(IMAGE_CONFIG['wait_timeout']):
+                raise DeployError('Step-Images nicht verfügbar', step='images',
+                                  hint='Status der Images unter /health prüfen')
+        job['result'] = run_deploy(job)
+        job['status'] = 'success'
+    except DeployError as e:
+        job['status'] = 'failed'
+        job['error'] = str(e)
+        job['result'] = {
+            'error': str(e),
+            'domain': job['domain'],
+            'deploy_id': job['deploy_id'],
+            'step': e.step
+        }
+        if e.hint:
+            job['result']['hint'] = e.hint
+    except Exception as e:
+        error_msg = str(e)
+        write_deploy_log(job['domain'], job['deploy_id'], "deploy_error", "", error_msg)
+        logger.error(f"Unerwarteter Fehler beim Deployment: {e}")
+        job['status'] = 'failed'
+        job['error'] = f'Unerwarteter Fehler: {error_msg}'
+    finally:
+        job['finished'] = datetime.now().isoformat()
+        job['duration'] = round(time.monotonic() - start, 3)
+        save_job(job)
+        running_marker_path(job['domain']).unlink(missing_ok=True)
+        DEPLOYS_TOTAL.labels(job['domain'], deploy_outcome(job)).inc()
+        DEPLOY_DURATION.labels(job['domain']).observe(job['duration'])
+        try:
+            record_deploy_metadata(job)
+        except Exception as e:
+            logger.error(f"Fehler beim Schreiben der Deploy-Metadaten: {e}")
+
+def deploy_outcome(job):
+    """
+    Ergebnis eines Jobs: erfolgreiche Deploys ohne Build werden als cache_hit
+    (Build-Key unverändert) oder skipped (keine relevanten Änderungen) gezählt
+    """
+    result = job.get('result') or {}
+    if job['status'] == 'success' and result.get('cache_hit'):
+        return 'cache_hit'
+    if job['status'] == 'success' and result.get('skipped'):
+        return 'skipped'
+    return job['status']
+
+def deploy_metadata_path(domain):
+    return data_path("domains", domain, "deploy.json")
+
+def load_deploy_metadata(domain):
+    metadata = read_json(deploy_metadata_path(domain), {})
+    metadata['domain'] = domain
+    return metadata
+
+def record_deploy_metadata(job):
+    """
+    Hält das Ergebnis eines Deploys in den Metadaten der Domain fest,
+    daraus beantwortet /status Anfragen ohne Container und Verzeichnis-Scans
+    """
+    domain = job['domain']
+    entry = {
+        'deploy_id': job['deploy_id'],
+        'job_id': job['job_id'],
+        'status': job['status'],
+        'started': job['started'],
+        'finished': job['finished'],
+        'duration': job['duration'],
+        'steps': [
+            {'name': step['name'], 'status': step['status'], 'duration': step['duration']}
+            for step in job['steps']
+        ],
+        'cache_hit': (job.get('result') or {}).get('cache_hit', False),
+        'skipped': (job.get('result') or {}).get('skipped', False),
+        'error': job.get('error')
+    }
+    if job['status'] == 'success':
+        try:
+            entry['commit'] = git_commit_info(Path(PAGES_ROOT) / domain / "repository")
+        except Exception as e:
+            logger.warning(f"Commit Informationen für {domain} nicht verfügbar: {e}")
+            entry['commit'] = None
+
+    try:
+        record_history({**entry, 'domain': domain, 'batch_id': job.get('batch_id'),
+                        'steps': job['steps']}, source='job')
+    except sqlite3.Error as e:
+        logger.error(f"Fehler beim Schreiben der Deploy-Historie: {e}")
+
+    path = deploy_metadata_path(domain)
+    metadata = load_deploy_metadata(domain)
+    metadata['deploy_count'] = metadata.get('deploy_count', 0) + 1
+    metadata['last_deploy'] = entry
+    if job['status'] == 'success':
+        metadata['last_success'] = entry
+    write_json_atomic(path, metadata)
+
+@contextmanager
+def job_step(job, name):
+    """
+    Misst einen Deploy-Schritt und hält ihn im Job fest
+    """
+    step = {
+        'name': name,
+        'status': 'running',
+        'started': datetime.now().isoformat(),
+        'finished': None,
+        'duration': None
+    }
+    job['steps'].append(step)
+    save_job(job)
+    start = time.monotonic()
+    try:
+        yield step
+    except Exception:
+        step['status'] = 'failed'
+        raise
+    else:
+        if step['status'] == 'running':
+            step['status'] = 'success'
+    finally:
+        step['finished'] = datetime.now().isoformat()
+        step['duration'] = round(time.monotonic() - start, 3)
+        save_job(job)
+        DEPLOY_STEP_DURATION.labels(job['domain'], name, step['status']).observe(step['duration'])
+
+# ---------------------------------------------------------------------------
+# Deploy-Historie
+# ---------------------------------------------------------------------------
+#
+# Jeder abgeschlossene Deploy wird mit Commit, Schritten, Laufzeiten, Ergebnis
+# und Cache-Hit in einer SQLite Datenbank im Datenverzeichnis festgehalten.
+# Historie und Trends kommen damit aus indizierten Abfragen statt aus
+# Verzeichnis-Scans. Jede Abfrage öffnet eine eigene Verbindung, WAL erlaubt
+# paralleles Lesen aus allen Gunicorn Workern. Bestehende Logs und Job-Dateien
+# werden beim ersten Start einmalig übernommen.
+
+HISTORY_SCHEMA = """
+CREATE TABLE IF NOT EXISTS deploys (
+    domain TEXT NOT NULL,
+    deploy_id TEXT NOT NULL,
+    job_id TEXT,
+    batch_id TEXT,
+    status TEXT NOT NULL,
+    started TEXT,
+    finished TEXT,
+    duration REAL,
+    cache_hit INTEGER NOT NULL DEFAULT 0,
+    skipped INTEGER NOT NULL DEFAULT 0,
+    commit_hash TEXT,
+    commit_author TEXT,
+    commit_date TEXT,
+    error TEXT,
+    source TEXT NOT NULL,
+    PRIMARY KEY (domain, deploy_id)
+);
+CREATE INDEX IF NOT EXISTS deploys_domain_finished ON deploys (domain, finished);
+CREATE INDEX IF NOT EXISTS deploys_finished ON deploys (finished);
+CREATE TABLE IF NOT EXISTS deploy_steps (
+    domain TEXT NOT NULL,
+    deploy_id TEXT NOT NULL,
+    position INTEGER NOT NULL,
+    name TEXT NOT NULL,
+    status TEXT,
+    started TEXT,
+    finished TEXT,
+    duration REAL,
+    PRIMARY KEY (domain, deploy_id, position)
+);
+CREATE TABLE IF NOT EXISTS history_meta (
+    key TEXT PRIMARY KEY,
+    value TEXT
+);
+"""
+
+HISTORY_STEPS = ('git_pull', 'hugo_compile', 'publish', 'rsync')
+_history_schema_pid = None
+
+def history_db_path():
+    return data_path("history.db")
+
+@contextmanager
+def history_db():
+    """
+    Verbindung zur Deploy-Historie, legt das Schema einmal pro Prozess an
+    Schreibzugriffe werden am Ende des Blocks committet
+    """
+    global _history_schema_pid
+    path = history_db_path()
+    path.parent.mkdir(parents=True, exist_ok=True)
+    conn = sqlite3.connect(str(path), timeout=HISTORY_CONFIG['busy_timeout'])
+    conn.row_factory = sqlite3.Row
+    try:
+        if _history_schema_pid != os.getpid():
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.executescript(HISTORY_SCHEMA)
+            # Datenbanken von vor der Spalte skipped nachrüsten
+            columns = {row['name'] for row in conn.execute("PRAGMA table_info(deploys)")}
+            if 'skipped' not in columns:
+                conn.execute("ALTER TABLE deploys ADD COLUMN skipped INTEGER NOT NULL DEFAULT 0")
+            _history_schema_pid = os.getpid()
+        with conn:
+            yield conn
+    finally:
+        conn.close()
+
+def _insert_history(conn, entry, source):
+    commit = entry.get('commit') or {}
+    if isinstance(commit, str):
+        commit = {'hash': commit}
+    # Einträge aus dem Backfill überschreiben keine Einträge aus Jobs
+    verb = "INSERT OR REPLACE" if source == 'job' else "INSERT OR IGNORE"
+    cursor = conn.execute(
+        f"{verb} INTO deploys (domain, deploy_id, job_id, batch_id, status, started, finished, duration, "
+        "cache_hit, skipped, commit_hash, commit_author, commit_date, error, source) "
+        "VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)",
+        (entry['domain'], entry['deploy_id'], entry.get('job_id'), entry.get('batch_id'), entry['status'],
+         entry.get('started'), entry.get('finished'), entry.get('duration'), int(bool(entry.get('cache_hit'))),
+         int(bool(entry.get('skipped'))), commit.get('hash'), commit.get('author'), commit.get('date'), entry.get('error'), source)
+    )
+    if not cursor.rowcount:
+        return False
+    conn.execute("DELETE FROM deploy_steps WHERE domain = ? AND deploy_id = ?",
+                 (entry['domain'], entry['deploy_id']))
+    conn.executemany(
+        "INSERT INTO deploy_steps (domain, deploy_id, position, name, status, started, finished, duration) "
+        "VALUES (?, ?, ?, ?, ?, ?, ?, ?)",
+        [(entry['domain'], entry['deploy_id'], i, step['name'], step.get('status'), step.get('started'),
+          step.get('finished'), step.get('duration')) for i, step in enumerate(entry.get('steps') or [])]
+    )
+    return True
+
+def history_write(write):
+    """
+    Führt write(conn) in einer eigenen Transaktion aus und gibt das Ergebnis zurück
+    Ist die Datenbank gesperrt, wird kooperativ gewartet und neu versucht
+    """
+    for attempt in range(HISTORY_CONFIG['busy_retries']):
+        try:
+            with history_db() as conn:
+                return write(conn)
+        except sqlite3.OperationalError as e:
+            busy = 'locked' in str(e) or 'busy' in str(e)
+            if not busy or attempt == HISTORY_CONFIG['busy_retries'] - 1:
+                raise
+        time.sleep(HISTORY_CONFIG['busy_retry_interval'])
+
+def record_history(entry, source='job'):
+    history_write(lambda conn: _insert_history(conn, entry, source))
+
+def _history_from_log(domain, deploy_id, log_file):
+    """
+    Rekonstruiert einen Eintrag aus einem Deploy-Log (Backfill)
+    Die Zeitstempel der Abschnitte ergeben Start, Ende und Schrittdauern
+    """
+    opener = gzip.open if log_file.suffix == '.gz' else open
+    sections = []
+    with opener(log_file, 'rt', encoding='utf-8', errors='replace') as f:
+        for line in f:
+            match = re.match(r'^=== ([A-Z0-9_]+) - (\d{4}-\d{2}-\d{2} \d{2}:\d{2}:\d{2}) ===$', line.rstrip())
+            if match:
+                sections.append((match.group(1).lower(), datetime.strptime(match.group(2), "%Y-%m-%d %H:%M:%S")))
+    if not sections:
+        return None
+    names = [name for name, _ in sections]
+    if 'deploy_success' in names:
+        status = 'success'
+    elif any(name == 'error' or name.endswith('_error') for name in names):
+        status = 'failed'
+    else:
+        status = 'unknown'
+    error = next((name for name in names if name == 'error' or name.endswith('_error')), None)
+
+    steps = []
+    previous = sections[0][1]
+    for i, (name, timestamp) in enumerate(sections):
+        failed = name.endswith('_error')
+        step_name = name[:-len('_error')] if failed else name
+        if step_name in HISTORY_STEPS:
+            if failed and steps and steps[-1]['name'] == step_name:
+                steps[-1]['status'] = 'failed'
+            else:
+                # Gestreamte Steps: Abschnitt beim Start, <step>_resources am Ende
+                end = next((t for n, t in sections[i + 1:] if n == f"{step_name}_resources"), None)
+                step_start, step_end = (timestamp, end) if end else (previous, timestamp)
+                steps.append({
+                    'name': step_name,
+                    'status': 'failed' if failed else 'success',
+                    'started': step_start.isoformat(),
+                    'finished': step_end.isoformat(),
+                    'duration': (step_end - step_start).total_seconds()
+                })
+        previous = timestamp
+    started, finished = sections[0][1], sections[-1][1]
+    return {
+        'domain': domain,
+        'deploy_id': deploy_id,
+        'status': status,
+        'started': started.isoformat(),
+        'finished': finished.isoformat(),
+        'duration': (finished - started).total_seconds(),
+        'cache_hit': 'build_cache_hit' in names,
+        # Änderungsprüfung ohne anschließenden Build: keine relevanten Änderungen
+        'skipped': (status == 'success' and 'changes' in names and 'hugo_compile' not in names
+                    and 'build_cache_hit' not in names),
+        'error': f"Abschnitt {error.upper()} im Log" if error else None,
+        'steps': steps
+    }
+
+def backfill_history():
+    """
+    Übernimmt Job-Dateien und bestehende Deploy-Logs in die Historie
+    Committet in kleinen Batches, damit Deploys anderer Worker nicht lange
+    auf die Schreibsperre warten. Gibt die Anzahl neuer Einträge zurück
+    """
+    added = 0
+    batch = []
+
+    def flush():
+        nonlocal added
+        if batch:
+            added += history_write(lambda conn: sum(_insert_history(conn, entry, 'backfill') for entry in batch))
+            batch.clear()
+
+    def add(entry):
+        batch.append(entry)
+        if len(batch) >= HISTORY_CONFIG['backfill_batch']:
+            flush()
+
+    jobs_dir = data_path("jobs")
+    if jobs_dir.exists():
+        for path in jobs_dir.glob("*.json"):
+            job = read_json(path)
+            if not job or job.get('status') not in ('success', 'failed'):
+                continue
+            result = job.get('result') or {}
+            add({**job, 'cache_hit': result.get('cache_hit', False), 'skipped': result.get('skipped', False),
+                 'commit': result.get('commit')})
+
+    base_path = Path(PAGES_ROOT)
+    domains = sorted(entry.name for entry in base_path.iterdir()
+                     if is_valid_domain(entry.name) and (entry / "logs").is_dir()) if base_path.exists() else []
+    for domain in domains:
+        with history_db() as conn:
+            known = {row['deploy_id'] for row in conn.execute(
+                "SELECT deploy_id FROM deploys WHERE domain = ?", (domain,))}
+        for log_entry in load_log_index(domain)['entries']:
+            if log_entry['deploy_id'] in known:
+                continue
+            log_file = find_deploy_log(domain, log_entry['deploy_id'])
+            if not log_file:
+                continue
+            try:
+                entry = _history_from_log(domain, log_entry['deploy_id'], log_file)
+            except (OSError, ValueError) as e:
+                logger.warning(f"Log {log_file} nicht übernommen: {e}")
+                continue
+            if entry:
+                add(entry)
+    flush()
+    history_write(lambda conn: conn.execute(
+        "INSERT OR REPLACE INTO history_meta (key, value) VALUES ('backfilled', ?)", (datetime.now().isoformat(),)))
+    return added
+
+def _history_backfill():
+    """
+    Läuft in jedem Worker, genau einer übernimmt die bestehenden Logs
+    """
+    lock_file = try_lock(data_path("locks", "history.lock"))
+    if lock_file is None:
+        return
+    try:
+        with history_db() as conn:
+            row = conn.execute("SELECT value FROM history_meta WHERE key = 'backfilled'").fetchone()
+        if row is None:
+            start = time.monotonic()
+            added = backfill_history()
+            logger.info(f"Deploy-Historie: {added} Einträge in {time.monotonic() - start:.1f}s übernommen")
+    except Exception as e:
+        logger.error(f"Fehler beim Übernehmen der Deploy-Historie: {e}")
+    finally:
+        release_lock(lock_file)
+
+def _history_row(row, steps):
+    return {
+        'domain': row['domain'],
+        'deploy_id': row['deploy_id'],
+        'job_id': row['job_id'],
+        'batch_id': row['batch_id'],
+        'status': row['status'],
+        'started': row['started'],
+        'finished': row['finished'],
+        'duration': row['duration'],
+        'cache_hit': bool(row['cache_hit']),
+        'skipped': bool(row['skipped']),
+        'commit': {
+            'hash': row['commit_hash'],
+            'author': row['commit_author'],
+            'date': row['commit_date']
+        } if row['commit_hash'] else None,
+        'error': row['error'],
+        'source': row['source'],
+        'steps': steps
+    }
+
+def query_history(domain, page=1, per_page=50, status=None):
+    """
+    Eine Seite der Historie einer Domain, neueste zuerst
+    """
+    where, params = "domain = ?", [domain]
+    if status:
+        where += " AND status = ?"
+        params.append(status)
+    with history_db() as conn:
+        total = conn.execute(f"SELECT COUNT(*) FROM deploys WHERE {where}", params).fetchone()[0]
+        rows = conn.execute(
+            f"SELECT * FROM deploys WHERE {where} ORDER BY finished DESC, deploy_id DESC LIMIT ? OFFSET ?",
+            params + [per_page, (page - 1) * per_page]
+        ).fetchall()
+        steps = {}
+        if rows:
+            placeholders = ", ".join("?" for _ in rows)
+            for step in conn.execute(
+                    f"SELECT * FROM deploy_steps WHERE domain = ? AND deploy_id IN ({placeholders}) "
+                    "ORDER BY position", [domain] + [row['deploy_id'] for row in rows]):
+                steps.setdefault(step['deploy_id'], []).append({
+                    'name': step['name'],
+                    'status': step['status'],
+                    'started': step['started'],
+                    'finished': step['finished'],
+                    'duration': step['duration']
+                })
+    return total, [_history_row(row, steps.get(row['deploy_id'], [])) for row in rows]
+
+def _percentile(values, fraction):
+    """
+    Perzentil nach Nearest-Rank, values muss sortiert sein
+    """
+    if not values:
+        return None
+    index = max(0, min(len(values) - 1, math.ceil(fraction * len(values)) - 1))
+    return round(values[index], 3)
+
+def _duration_summary(rows):
+    durations = sorted(row['duration'] for row in rows if row['duration'] is not None
+                       and row['status'] == 'success' and not row['cache_hit'] and not row['skipped'])
+    failed = sum(1 for row in rows if row['status'] == 'failed')
+    return {
+        'deploys': len(rows),
+        'failed': failed,
+        'failure_rate': round(failed / len(rows), 3) if rows else None,
+        'cache_hits': sum(1 for row in rows if row['cache_hit']),
+        'skipped': sum(1 for row in rows if row['skipped']),
+        'builds': len(durations),
+        'avg_duration': round(sum(durations) / len(durations), 3) if durations else None,
+        'p50_duration': _percentile(durations, 0.50),
+        'p95_duration': _percentile(durations, 0.95),
+        'max_duration': durations[-1] if durations else None
+    }
+
+def history_trends(days, domain=None):
+    """
+    Kennzahlen pro Domain und Tag für die letzten days Tage
+    Build-Dauern nur aus erfolgreichen Builds ohne Cache-Hit und ohne übersprungenen Build
+    """
+    since = (datetime.now() - timedelta(days=days)).isoformat()
+    where, params = "finished >= ?", [since]
+    if domain:
+        where += " AND domain = ?"
+        params.append(domain)
+    with history_db() as conn:
+        rows = conn.execute(
+            f"SELECT domain, finished, status, duration, cache_hit, skipped FROM deploys WHERE {where} "
+            "ORDER BY domain, finished", params
+        ).fetchall()
+
+    by_domain = {}
+    for row in rows:
+        by_domain.setdefault(row['domain'], []).append(row)
+    domains = {}
+    for name, domain_rows in by_domain.items():
+        by_day = {}
+        for row in domain_rows:
+            by_day.setdefault(row['finished'][:10], []).append(row)
+        domains[name] = {
+            **_duration_summary(domain_rows),
+            'daily': [{'date': day, **_duration_summary(day_rows)} for day, day_rows in sorted(by_day.items())]
+        }
+    return {
+        'days': days,
+        'since': since,
+        'total': _duration_summary(rows),
+        'domains': domains
+    }
+
+# ---------------------------------------------------------------------------
+# Batch-Deploys
+# ---------------------------------------------------------------------------
+#
+# Ein Batch reiht für jede Domain einen normalen Deploy-Job ein, sortiert
+# nach Priorität und bei gleicher Priorität die zuletzt langsamsten Builds
+# zuerst. Die Deploy-Slots begrenzen die Parallelität wie bei einzelnen
+# Deploys. Die Batch-Datei enthält nur die Job-IDs, Fortschritt und
+# Zusammenfassung werden aus den Job-Dateien gelesen.
+
+BATCH_STREAM_INTERVAL = 1.0
+
+def batch_path(batch_id):
+    return data_path("batches", f"{batch_id}.json")
+
+def load_batch(batch_id):
+    if not batch_id or not all(c in '0123456789abcdef' for c in batch_id):
+        return None
+    return read_json(batch_path(batch_id))
+
+def discover_domains():
+    """
+    Alle Domains unter PAGES_ROOT mit einem Repository
+    """
+    base_path = Path(PAGES_ROOT)
+    if not base_path.exists():
+        return []
+    return sorted(
+        entry.name for entry in base_path.iterdir()
+        if is_valid_domain(entry.name) and (entry / "repository").is_dir()
+    )
+
+def create_batch(domains, force=False, priorities=None):
+    """
+    Reiht die Deploys eines Batches ein und legt die Batch-Datei an
+    """
+    priorities = priorities or {}
+    batch_id = uuid.uuid4().hex
+    entries = []
+    for domain in domains:
+        priority = priorities.get(domain)
+        if priority is None:
+            priority = domain_config(domain, 'deploy', DEPLOY_DEFAULTS)['priority']
+        last_deploy = load_deploy_metadata(domain).get('last_deploy') or {}
+        entries.append({
+            'domain': domain,
+            'priority': int(priority),
+            'last_duration': last_deploy.get('duration') or 0
+        })
+    # Lange Builds zuerst starten, damit sie nicht am Ende allein laufen
+    entries.sort(key=lambda entry: (-entry['priority'], -entry['last_duration'], entry['domain']))
+
+    batch = {
+        'batch_id': batch_id,
+        'created': datetime.now().isoformat(),
+        'force': force,
+        'domains': []
+    }
+    for entry in entries:
+        job, coalesced = enqueue_deploy(entry['domain'], new_deploy_id(), force=force,
+                                        priority=entry['priority'], batch_id=batch_id)
+        batch['domains'].append({
+            'domain': entry['domain'],
+            'priority': entry['priority'],
+            'job_id': job['job_id'],
+            'deploy_id': job['deploy_id'],
+            'coalesced': coalesced
+        })
+    write_json_atomic(batch_path(batch_id), batch)
+    return batch
+
+def batch_summary(batch):
+    """
+    Stellt Fortschritt und Ergebnis eines Batches aus den Job-Dateien zusammen
+    """
+    counts = {'queued': 0, 'running': 0, 'success': 0, 'cache_hit': 0, 'skipped': 0, 'failed': 0}
+    results = []
+    finished = None
+    for entry in batch['domains']:
+        job = load_job(entry['job_id']) or {'status': 'failed', 'error': 'Job nicht gefunden'}
+        status = deploy_outcome(job)
+        counts[status] += 1
+        if job.get('finished') and (finished is None or job['finished'] > finished):
+            finished = job['finished']
+        results.append({
+            **entry,
+            'status': status,
+            'started': job.get('started'),
+            'finished': job.get('finished'),
+            'duration': job.get('duration'),
+            'error': job.get('error')
+        })
+    done = counts['queued'] == 0 and counts['running'] == 0
+    summary = {
+        'batch_id': batch['batch_id'],
+        'status': 'finished' if done else 'running',
+        'created': batch['created'],
+        'finished': finished if done else None,
+        'total': len(results),
+        'counts': counts,
+        'domains': results
+    }
+    if done and finished:
+        summary['duration'] = round(
+            (datetime.fromisoformat(finished) - datetime.fromisoformat(batch['created'])).total_seconds(), 3)
+    return summary
+
+# ---------------------------------------------------------------------------
+# Log-Store
+# ---------------------------------------------------------------------------
+#
+# Pro Domain führt ein Index die Deploy-Logs in Erstellungsreihenfolge, der
+# neueste Log ist damit ohne Verzeichnis-Scan bekannt. Beim Anlegen eines
+# neuen Logs werden ältere Logs komprimiert und nach Anzahl und Alter
+# entfernt. Komprimierte Logs werden beim Abruf transparent entpackt.
+
+def log_index_path(domain):
+    return data_path("domains", domain, "logs.json")
+
+def log_index_lock_path(domain):
+    return data_path("locks", f"{domain}.logs.lock")
+
+def find_deploy_log(domain, deploy_id):
+    """
+    Gibt den Pfad des Logs zurück (unkomprimiert oder .gz), None falls nicht vorhanden
+    """
+    log_file = deploy_log_path(domain, deploy_id)
+    if log_file.exists():
+        return log_file
+    compressed = log_file.with_name(log_file.name + ".gz")
+    if compressed.exists():
+        return compressed
+    return None
+
+def _scan_log_index(domain):
+    """
+    Baut den Log-Index aus den vorhandenen Dateien auf (einmalig für bestehende Logs)
+    """
+    log_dir = Path(PAGES_ROOT) / domain / "logs"
+    entries = []
+    for log_file in log_dir.glob("deploy_*.log*"):
+        if log_file.suffix not in ('.log', '.gz'):
+            continue
+        stat = log_file.stat()
+        entries.append({
+            'deploy_id': log_file.name[len("deploy_"):].split('.log')[0],
+            'created': datetime.fromtimestamp(stat.st_mtime).isoformat(),
+            'compressed': log_file.suffix == '.gz'
+        })
+    entries.sort(key=lambda entry: entry['created'])
+    return {'entries': entries}
+
+def load_log_index(domain):
+    """
+    Liest den Log-Index einer Domain, bestehende Log-Verzeichnisse werden einmalig übernommen
+    """
+    index = read_json(log_index_path(domain))
+    if index is not None:
+        return index
+    if not (Path(PAGES_ROOT) / domain / "logs").exists():
+        return {'entries': []}
+    with file_lock(log_index_lock_path(domain), poll_interval=0.05):
+        index = read_json(log_index_path(domain))
+        if index is None:
+            index = _scan_log_index(domain)
+            write_json_atomic(log_index_path(domain), index)
+    return index
+
+def compress_deploy_log(domain, deploy_id):
+    log_file = deploy_log_path(domain, deploy_id)
+    compressed = log_file.with_name(log_file.name + ".gz")
+    tmp_path = compressed.with_name(f".{compressed.name}.tmp")
+    with open(log_file, 'rb') as src, gzip.open(tmp_path, 'wb') as dst:
+        shutil.copyfileobj(src, dst)
+    os.replace(tmp_path, compressed)
+    log_file.unlink()
+
+def register_deploy_log(domain, deploy_id):
+    """
+    Trägt einen neuen Log im Index ein und setzt Kompression und Aufbewahrung durch
+    """
+    load_log_index(domain)
+    with file_lock(log_index_lock_path(domain), poll_interval=0.05):
+        index = read_json(log_index_path(domain), {'entries': []})
+        entries = index['entries']
+        if any(entry['deploy_id'] == deploy_id for entry in entries):
+            return
+        entries.append({
+            'deploy_id': deploy_id,
+            'created': datetime.now().isoformat(),
+            'compressed': False
+        })
+
+        # Alte Logs entfernen (Anzahl und Alter)
+        cutoff = (datetime.now() - timedelta(days=LOG_CONFIG['max_age_days'])).isoformat()
+        keep = max(1, LOG_CONFIG['keep'])
+        expired = [entry for i, entry in enumerate(entries)
+                   if i < len(entries) - keep or entry['created'] < cutoff]
+        for entry in expired:
+            log_file = find_deploy_log(domain, entry['deploy_id'])
+            if log_file:
+                log_file.unlink(missing_ok=True)
+        entries = [entry for entry in entries if entry not in expired]
+
+        # Ältere Logs komprimieren
+        for entry in entries[:-LOG_CONFIG['compress_after']]:
+            if entry['compressed']:
+                continue
+            try:
+                if deploy_log_path(domain, entry['deploy_id']).exists():
+                    compress_deploy_log(domain, entry['deploy_id'])
+                entry['compressed'] = True
+            except OSError as e:
+                logger.warning(f"Log {entry['deploy_id']} konnte nicht komprimiert werden: {e}")
+
+        index['entries'] = entries
+        write_json_atomic(log_index_path(domain), index)
+
+def gzip_uncompressed_size(path):
+    """
+    Liest die unkomprimierte Größe aus dem gzip Trailer (modulo 4 GiB)
+    """
+    with open(path, 'rb') as f:
+        f.seek(-4, os.SEEK_END)
+        return int.from_bytes(f.read(4), 'little')
+
+def read_tail_lines(log_file, count):
+    """
+    Gibt die letzten count Zeilen eines Logs zurück, ohne ihn vollständig zu laden
+    """
+    if log_file.suffix == '.gz':
+        with gzip.open(log_file, 'rt', encoding='utf-8', errors='replace') as f:
+            return list(deque(f, maxlen=count))
+
+    with open(log_file, 'rb') as f:
+        f.seek(0, os.SEEK_END)
+        position = f.tell()
+        data = b''
+        while position > 0 and data.count(b'\n') <= count:
+            block = min(8192, position)
+            position -= block
+            f.seek(position)
+            data = f.read(block) + data
+    lines = data.splitlines(keepends=True)[-count:]
+    return [line.decode('utf-8', errors='replace') for line in lines]
+
+def serve_deploy_log(log_file):
+    """
+    Liefert einen Log als Plain Text aus, mit Unterstützung für HTTP Range
+    und ?tail=N, ohne die Datei komplett in den Speicher zu laden
+    """
+    mimetype = 'text/plain; charset=utf-8'
+
+    if 'tail' in request.args:
+        tail = request.args.get('tail', type=int)
+        if tail is None or tail <= 0:
+            return "tail muss eine positive ganze Zahl sein", 400
+        return ''.join(read_tail_lines(log_file, tail)), 200, {'Content-Type': mimetype}
+
+    if log_file.suffix != '.gz':
+        return send_file(log_file, mimetype=mimetype, conditional=True, max_age=0)
+
+    # Komprimierter Log: beim Lesen entpacken, Range über die unkomprimierten Bytes
+    size = gzip_uncompressed_size(log_file)
+    start, stop, status = 0, size, 200
+    headers = {'Accept-Ranges': 'bytes'}
+    if request.range:
+        byte_range = request.range.range_for_length(size)
+        if byte_range is None:
+            return "", 416, {'Content-Range': f"bytes */{size}"}
+        start, stop = byte_range
+        status = 206
+        headers['Content-Range'] = f"bytes {start}-{stop - 1}/{size}"
+    headers['Content-Length'] = str(stop - start)
+
+    def generate():
+        with gzip.open(log_file, 'rb') as f:
+            f.seek(start)
+            remaining = stop - start
+            while remaining > 0:
+                chunk = f.read(min(64 * 1024, remaining))
+                if not chunk:
+                    break
+                remaining -= len(chunk)
+                yield chunk
+
+    return Response(generate(), status=status, mimetype=mimetype, headers=headers)
+
+# ---------------------------------------------------------------------------
+# Domain-Index
+# ---------------------------------------------------------------------------
+#
+# /caddy-check wird bei jedem TLS Handshake aufgerufen. Jeder Worker hält
+# deshalb die Menge der Domains mit public Verzeichnis im Speicher. Nach
+# einem Publish wird eine Generationsdatei geschrieben, die alle Worker
+# höchstens einmal pro check_interval prüfen. Unbekannte Domains werden mit
+# einer TTL negativ gecacht, damit Scans keinen Dateisystem-Zugriff erzeugen.
+
+DOMAIN_INDEX = {
+    'domains': frozenset(),
+    'negative': OrderedDict(),
+    'generation': None,
+    'loaded_at': None,
+    'checked_at': 0.0
+}
+
+def domain_index_generation_path():
+    return data_path("domain_index.gen")
+
+def _domain_index_generation():
+    try:
+        return os.stat(domain_index_generation_path()).st_mtime_ns
+    except OSError:
+        return None
+
+def rebuild_domain_index():
+    """
+    Baut den Domain-Index aus PAGES_ROOT neu auf
+    """
+    generation = _domain_index_generation()
+    domains = set()
+    try:
+        with os.scandir(PAGES_ROOT) as entries:
+            for entry in entries:
+                if entry.is_dir() and os.path.isdir(os.path.join(entry.path, "public")):
+                    domains.add(entry.name)
+    except OSError as e:
+        logger.warning(f"Domain-Index konnte nicht aufgebaut werden: {e}")
+    now = time.monotonic()
+    DOMAIN_INDEX.update(
+        domains=frozenset(domains),
+        negative=OrderedDict(),
+        generation=generation,
+        loaded_at=now,
+        checked_at=now
+    )
+    logger.info(f"Domain-Index aufgebaut: {len(domains)} Domains")
+
+def _refresh_domain_index():
+    now = time.monotonic()
+    if DOMAIN_INDEX['loaded_at'] is None or now - DOMAIN_INDEX['loaded_at'] > DOMAIN_INDEX_CONFIG['rescan_interval']:
+        rebuild_domain_index()
+        return
+    if now - DOMAIN_INDEX['checked_at'] < DOMAIN_INDEX_CONFIG['check_interval']:
+        return
+    DOMAIN_INDEX['checked_at'] = now
+    if _domain_index_generation() != DOMAIN_INDEX['generation']:
+        rebuild_domain_index()
+
+def notify_domain_published(domain):
+    """
+    Trägt eine veröffentlichte Domain ein und informiert die anderen Worker
+    """
+    DOMAIN_INDEX['domains'] = DOMAIN_INDEX['domains'] | {domain}
+    DOMAIN_INDEX['negative'].pop(domain, None)
+    path = domain_index_generation_path()
+    path.parent.mkdir(parents=True, exist_ok=True)
+    path.write_text(uuid.uuid4().hex)
+
+def domain_is_published(domain):
+    """
+    Prüft ob für eine Domain ein public Verzeichnis existiert
+    """
+    if not is_valid_domain(domain):
+        return False
+
+    if not DOMAIN_INDEX_CONFIG['enabled']:
+        public_path = Path(PAGES_ROOT) / domain / "public"
+        return public_path.is_dir()
+
+    _refresh_domain_index()
+    if domain in DOMAIN_INDEX['domains']:
+        return True
+
+    negative = DOMAIN_INDEX['negative']
+    now = time.monotonic()
+    expires = negative.get(domain)
+    if expires is not None and expires > now:
+        return False
+
+    # Unbekannt oder abgelaufen: einmal im Dateisystem nachsehen
+    if (Path(PAGES_ROOT) / domain / "public").is_dir():
+        DOMAIN_INDEX['domains'] = DOMAIN_INDEX['domains'] | {domain}
+        negative.pop(domain, None)
+        return True
+
+    negative[domain] = now + DOMAIN_INDEX_CONFIG['negative_ttl']
+    negative.move_to_end(domain)
+    while len(negative) > DOMAIN_INDEX_CONFIG['negative_max']:
+        negative.popitem(last=False)
+    return False
+
+# ---------------------------------------------------------------------------
+# Hugo Caches
+# ---------------------------------------------------------------------------
+#
+# Jede Domain bekommt ein eigenes, persistentes Hugo cacheDir (inklusive
+# Bildverarbeitung). Hugo Module werden in einem gemeinsamen Cache abgelegt,
+# der nach Modulpfad und Version adressiert ist und damit von allen Domains
+# genutzt werden kann. Beide Caches sind in der Größe begrenzt, bei
+# Überschreitung werden die am längsten ungenutzten Einträge entfernt.
+
+def hugo_cache_path(domain):
+    return data_path("cache", "hugo", domain)
+
+def hugo_cache_meta_path(domain):
+    return data_path("cache", "hugo", f"{domain}.json")
+
+def module_cache_path():
+    return data_path("cache", "modules")
+
+def module_cache_lock_path():
+    return data_path("locks", "modules.lock")
+
+def walk_file_stats(path):
+    """
+    lstat aller Dateien unterhalb von path
+    Große Caches nicht am Stück durchlaufen, andere Greenlets sollen weiterlaufen
+    """
+    count = 0
+    for dirpath, dirnames, filenames in os.walk(path):
+        for filename in filenames:
+            try:
+                yield os.lstat(os.path.join(dirpath, filename))
+            except OSError:
+                continue
+            count += 1
+            if count % 200 == 0:
+                time.sleep(0)
+
+def dir_size(path):
+    return sum(stat.st_size for stat in walk_file_stats(path))
+
+def remove_tree(path):
+    """
+    Löscht ein Verzeichnis inklusive schreibgeschützter Einträge (Go Modul-Cache)
+    """
+    for count, (dirpath, dirnames, filenames) in enumerate(os.walk(path), 1):
+        try:
+            os.chmod(dirpath, 0o755)
+        except OSError:
+            pass
+        if count % 200 == 0:
+            time.sleep(0)
+    shutil.rmtree(path, ignore_errors=True)
+
+def hugo_cache_volumes(domain):
+    """
+    Volumes und Umgebungsvariablen für die Hugo Caches eines Builds
+    """
+    if not HUGO_CACHE_CONFIG['enabled']:
+        return {}, {}
+    cache_path = hugo_cache_path(domain)
+    modules_path = module_cache_path()
+    cache_path.mkdir(parents=True, exist_ok=True)
+    modules_path.mkdir(parents=True, exist_ok=True)
+    volumes = {
+        str(cache_path): {
+            'bind': '/cache',
+            'mode': 'rw'
+        },
+        str(modules_path): {
+            'bind': '/modcache',
+            'mode': 'rw'
+        }
+    }
+    environment = {
+        'HUGO_CACHEDIR': '/cache',
+        'HUGO_CACHES_IMAGES_DIR': ':cacheDir/images',
+        'HUGO_CACHES_MODULES_DIR': '/modcache'
+    }
+    return volumes, environment
+
+def _module_cache_entries(root):
+    """
+    Einträge des Modul-Caches: Verzeichnisse mit Version im Namen (modul@version, @v)
+    """
+    entries = []
+    for dirpath, dirnames, filenames in os.walk(root):
+        time.sleep(0)
+        for dirname in list(dirnames):
+            if '@' in dirname:
+                path = Path(dirpath) / dirname
+                stat = path.stat()
+                entries.append({
+                    'path': path,
+                    'size': dir_size(path),
+                    'last_used': max(stat.st_atime, stat.st_mtime)
+                })
+                dirnames.remove(dirname)
+    return entries
+
+def evict_hugo_caches():
+    """
+    Setzt die Größenlimits der Hugo Caches durch (LRU)
+    Gibt die entfernten Einträge zurück
+    """
+    evicted = []
+
+    # Domain-Caches: Größe und letzte Nutzung stehen in den Metadaten
+    metas = []
+    for meta_file in data_path("cache", "hugo").glob("*.json"):
+        meta = read_json(meta_file)
+        if meta:
+            metas.append(meta)
+    total = sum(meta.get('size', 0) for meta in metas)
+    limit = HUGO_CACHE_CONFIG['max_mb'] * 1024 * 1024
+    for meta in sorted(metas, key=lambda m: m.get('last_used', '')):
+        if total <= limit:
+            break
+        # Caches von Domains mit laufendem Build nicht anfassen
+        build_lock = try_lock(domain_build_lock_path(meta['domain']))
+        if build_lock is None:
+            continue
+        try:
+            remove_tree(hugo_cache_path(meta['domain']))
+            hugo_cache_meta_path(meta['domain']).unlink(missing_ok=True)
+            total -= meta.get('size', 0)
+            evicted.append(f"hugo/{meta['domain']}")
+        finally:
+            release_lock(build_lock)
+
+    # Modul-Cache: nur wenn gerade kein Build die Module nutzt
+    modules_meta = read_json(data_path("cache", "modules.json"), {})
+    limit = HUGO_CACHE_CONFIG['modules_max_mb'] * 1024 * 1024
+    if modules_meta.get('size', 0) > limit:
+        modules_lock = try_lock(module_cache_lock_path())
+        if modules_lock is not None:
+            try:
+                entries = _module_cache_entries(module_cache_path())
+                total = sum(entry['size'] for entry in entries)
+                for entry in sorted(entries, key=lambda e: e['last_used']):
+                    if total <= limit:
+                        break
+                    remove_tree(entry['path'])
+                    total -= entry['size']
+                    evicted.append(f"modules/{entry['path'].relative_to(module_cache_path()).as_posix()}")
+                write_json_atomic(data_path("cache", "modules.json"), {
+                    'size': dir_size(module_cache_path()),
+                    'last_used': modules_meta.get('last_used')
+                })
+            finally:
+                release_lock(modules_lock)
+    return evicted
+
+def record_hugo_cache_usage(domain, since):
+    """
+    Misst die Caches nach einem Build: Bytes in Dateien, die der Build seit
+    since (Unix-Zeit) geschrieben hat, und Bytes, die unverändert blieben
+    """
+    now = datetime.now().isoformat()
+    usage = {}
+    for name, path, meta_path, extra in (
+        ('hugo', hugo_cache_path(domain), hugo_cache_meta_path(domain), {'domain': domain}),
+        ('modules', module_cache_path(), data_path("cache", "modules.json"), {})
+    ):
+        size = written = 0
+        for stat in walk_file_stats(path):
+            size += stat.st_size
+            if stat.st_mtime >= since:
+                written += stat.st_size
+        usage[name] = {
+            'kept_bytes': size - written,
+            'written_bytes': written,
+            'size': size
+        }
+        write_json_atomic(meta_path, dict(extra, size=size, last_used=now))
+    return usage
+
+def format_cache_usage(usage):
+    mb = 1024 * 1024
+    return "\n".join(
+        f"{label}: {usage[name]['kept_bytes'] / mb:.1f} MB unverändert, "
+        f"{usage[name]['written_bytes'] / mb:.1f} MB neu geschrieben, {usage[name]['size'] / mb:.1f} MB gesamt"
+        for name, label in (('hugo', 'Hugo Cache'), ('modules', 'Modul-Cache'))
+    )
+
+# ---------------------------------------------------------------------------
+# Releases
+# ---------------------------------------------------------------------------
+#
+# Im Release-Modus liegt jede Build-Ausgabe in <domain>/releases/<deploy_id>/
+# und <domain>/public ist ein relativer Symlink auf das aktive Release. Das
+# Umschalten erfolgt per rename() und ist damit atomar, Caddy sieht nie einen
+# halb synchronisierten Stand.
+
+def is_valid_release_id(release_id):
+    return bool(release_id) and release_id.replace('_', '').isalnum()
+
+def release_meta_path(domain, release_id):
+    return data_path("domains", domain, "releases", f"{release_id}.json")
+
+def current_release(domain):
+    """
+    Gibt die ID des aktiven Releases zurück, None falls public kein Symlink ist
+    """
+    public_path = Path(PAGES_ROOT) / domain / "public"
+    try:
+        return Path(os.readlink(public_path)).name
+    except OSError:
+        return None
+
+def release_created(domain, release_path):
+    """
+    Erstellungszeit eines Releases (Unix-Zeit) laut Release-Metadaten,
+    ohne Metadaten (übernommenes public Verzeichnis) die mtime des Verzeichnisses
+    """
+    created = read_json(release_meta_path(domain, release_path.name), {}).get('created')
+    if created:
+        try:
+            return datetime.fromisoformat(created).timestamp()
+        except ValueError:
+            pass
+    return release_path.stat().st_mtime
+
+def list_releases(domain):
+    """
+    Gibt die vorhandenen Release-IDs zurück (neueste zuerst)
+    Sortiert nach Erstellungszeit: Deploy-IDs aus derselben Sekunde
+    unterscheiden sich nur im zufälligen Suffix
+    """
+    releases_path = Path(PAGES_ROOT) / domain / "releases"
+    try:
+        releases = [(release_created(domain, p), p.name) for p in releases_path.iterdir() if p.is_dir()]
+    except OSError:
+        return []
+    return [name for _, name in sorted(releases, reverse=True)]
+
+def activate_release(domain, release_id):
+    """
+    Schaltet public atomar auf das angegebene Release um
+    """
+    domain_path = Path(PAGES_ROOT) / domain
+    public_path = domain_path / "public"
+    releases_path = domain_path / "releases"
+    releases_path.mkdir(parents=True, exist_ok=True)
+
+    if public_path.is_dir() and not public_path.is_symlink():
+        # Einmalige Umstellung: bisheriges public Verzeichnis als ältestes Release übernehmen
+        mtime = datetime.fromtimestamp(public_path.stat().st_mtime)
+        legacy_id = f"{mtime.strftime('%Y%m%d_%H%M%S')}_legacy"
+        os.rename(public_path, releases_path / legacy_id)
+        logger.info(f"Bisheriges public Verzeichnis von {domain} als Release {legacy_id} übernommen")
+
+    tmp_link = domain_path / f".public.{uuid.uuid4().hex[:8]}.tmp"
+    os.symlink(f"releases/{release_id}", tmp_link)
+    os.replace(tmp_link, public_path)
+
+def prune_releases(domain):
+    """
+    Entfernt alte Releases, das aktive Release bleibt immer erhalten
+    """
+    keep = max(1, PUBLISH_CONFIG['keep_releases'])
+    active = current_release(domain)
+    removed = []
+    # Das aktive Release zählt immer zu den behaltenen, auch nach einem Rollback
+    candidates = [release_id for release_id in list_releases(domain) if release_id != active]
+    for release_id in candidates[keep - 1:]:
+        shutil.rmtree(Path(PAGES_ROOT) / domain / "releases" / release_id, ignore_errors=True)
+        release_meta_path(domain, release_id).unlink(missing_ok=True)
+        manifest_path(domain, release_id).unlink(missing_ok=True)
+        removed.append(release_id)
+    return removed
+
+def manifest_path(domain, release_id):
+    return data_path("domains", domain, "releases", f"{release_id}.manifest.json")
+
+def published_id(domain):
+    """
+    Gibt die Deploy-ID des veröffentlichten Stands zurück
+    """
+    if PUBLISH_CONFIG['mode'] == 'release':
+        return current_release(domain)
+    return read_json(data_path("domains", domain, "publish.json"), {}).get('deploy_id')
+
+def file_sha256(path):
+    with open(path, 'rb') as f:
+        return hashlib.file_digest(f, 'sha256').hexdigest()
+
+def build_manifest(root):
+    """
+    Erstellt ein Manifest aller Dateien unterhalb von root:
+    relativer Pfad -> Größe und SHA-256 des Inhalts
+    """
+    root = Path(root)
+    files = {}
+    for dirpath, dirnames, filenames in os.walk(root):
+        dirnames.sort()
+        names = set(filenames)
+        for filename in sorted(filenames):
+            path = Path(dirpath) / filename
+            if path.is_symlink() or is_precompressed_sidecar(filename, names):
+                continue
+            files[path.relative_to(root).as_posix()] = {
+                'size': path.stat().st_size,
+                'sha256': file_sha256(path)
+            }
+            # Große Sites nicht am Stück hashen, andere Greenlets sollen weiterlaufen
+            if len(files) % 200 == 0:
+                time.sleep(0)
+    return files
+
+def diff_manifests(previous, current):
+    """
+    Vergleicht zwei Manifeste und gibt die Pfade und Statistiken
+    für neue, geänderte, entfernte und unveränderte Dateien zurück
+    """
+    diff = {'added': [], 'changed': [], 'removed': [], 'reused': []}
+    for path, entry in current.items():
+        old = previous.get(path)
+        if old is None:
+            diff['added'].append(path)
+        elif old['sha256'] != entry['sha256'] or old['size'] != entry['size']:
+            diff['changed'].append(path)
+        else:
+            diff['reused'].append(path)
+    diff['removed'] = [path for path in previous if path not in current]
+
+    stats = {}
+    for kind, paths in diff.items():
+        source = previous if kind == 'removed' else current
+        stats[kind] = {
+            'files': len(paths),
+            'bytes': sum(source[path]['size'] for path in paths)
+        }
+    return diff, stats
+
+def link_unchanged_files(release_path, previous_path, paths):
+    """
+    Ersetzt unveränderte Dateien im neuen Release durch Hardlinks auf das
+    vorherige Release, damit sie nur einmal auf der Platte und im Page Cache liegen
+    """
+    linked = 0
+    for count, rel_path in enumerate(paths, 1):
+        source = previous_path / rel_path
+        target = release_path / rel_path
+        tmp_path = target.with_name(f".{target.name}.link.tmp")
+        try:
+            if source.stat().st_size != target.stat().st_size:
+                continue
+            os.link(source, tmp_path)
+            os.replace(tmp_path, target)
+            linked += 1
+        except OSError:
+            tmp_path.unlink(missing_ok=True)
+        if count % 500 == 0:
+            time.sleep(0)
+    return linked
+
+def record_manifest(domain, deploy_id, root):
+    """
+    Schreibt das Manifest der Build-Ausgabe und vergleicht es mit dem
+    veröffentlichten Stand. Gibt (files, diff, stats) zurück.
+    """
+    previous_id = published_id(domain)
+    previous = {}
+    if previous_id:
+        previous = read_json(manifest_path(domain, previous_id), {}).get('files', {})
+
+    files = build_manifest(root)
+    diff, stats = diff_manifests(previous, files)
+    stats['previous_deploy_id'] = previous_id
+    stats['total'] = {
+        'files': len(files),
+        'bytes': sum(entry['size'] for entry in files.values())
+    }
+    write_json_atomic(manifest_path(domain, deploy_id), {
+        'deploy_id': deploy_id,
+        'created': datetime.now().isoformat(),
+        'files': files
+    }, indent=None)
+    return files, diff, stats
+
+def format_publish_stats(stats):
+    lines = [f"Manifest: {stats['total']['files']} Dateien, {stats['total']['bytes']} Bytes "
+             f"(Vergleich mit {stats['previous_deploy_id'] or '-'})"]
+    for kind, label in (('added', 'Neu'), ('changed', 'Geändert'), ('removed', 'Entfernt'), ('reused', 'Wiederverwendet')):
+        lines.append(f"{label}: {stats[kind]['files']} Dateien, {stats[kind]['bytes']} Bytes")
+    if 'linked' in stats:
+        lines.append(f"Hardlinks auf vorheriges Release: {stats['linked']}")
+    if stats.get('precompress'):
+        lines.append(format_precompress_stats(stats['precompress']))
+    if stats.get('store'):
+        lines.append(format_store_stats(stats['store']))
+    return "\n".join(lines)
+
+# ---------------------------------------------------------------------------
+# Vorkomprimierte Assets
+# ---------------------------------------------------------------------------
+#
+# Für komprimierbare Dateien werden .gz, .br und .zst Dateien neben das
+# Original geschrieben, Caddy liefert sie mit "precompressed" ohne eigene
+# Kompression pro Request aus. Die Kompression läuft in eigenen Prozessen
+# (precompress.py), unveränderte Dateien übernehmen die Sidecars des
+# vorherigen Releases.
+
+def is_precompressed_sidecar(filename, names):
+    for suffix in PRECOMPRESS_SUFFIXES.values():
+        if filename.endswith(suffix) and filename[:-len(suffix)] in names:
+            return True
+    return False
+
+def run_compress_workers(paths, formats, levels, workers):
+    """
+    Verteilt die Dateien auf eigene Prozesse mit precompress.py
+    Kein ProcessPoolExecutor: dessen Verwaltungs-Thread blockiert im gevent
+    Worker, wenn die App vor dem Monkey-Patching geladen wurde (preload_app)
+    """
+    script = str(Path(__file__).resolve().with_name('precompress.py'))
+    with tempfile.TemporaryDirectory(prefix='precompress-') as tmp_dir:
+        processes = []
+        for i in range(workers):
+            job_path = Path(tmp_dir) / f"job_{i}.json"
+            result_path = Path(tmp_dir) / f"result_{i}.json"
+            job_path.write_text(json.dumps({'paths': paths[i::workers], 'formats': formats, 'levels': levels}))
+            stderr = open(Path(tmp_dir) / f"stderr_{i}.log", 'w+')
+            processes.append((subprocess.Popen([sys.executable, script, str(job_path), str(result_path)],
+                                               stdout=subprocess.DEVNULL, stderr=stderr), result_path, stderr))
+        results = []
+        errors = []
+        for process, result_path, stderr in processes:
+            with stderr:
+                if process.wait() != 0:
+                    stderr.seek(0)
+                    lines = stderr.read().strip().splitlines()
+                    errors.append(lines[-1] if lines else f"Exit-Code {process.returncode}")
+                    continue
+            results.extend(json.loads(result_path.read_text()))
+        if errors:
+            raise RuntimeError("; ".join(errors))
+        return results
+
+def precompress_assets(domain, root, files, diff, previous_root=None, previous_signature=None):
+    """
+    Erzeugt die Sidecars für die Build-Ausgabe unter root
+    Gibt die Statistik und die Signatur der verwendeten Konfiguration zurück
+    """
+    config = domain_config(domain, 'precompress', PRECOMPRESS_CONFIG)
+    formats = available_formats(config['formats']) if config['enabled'] else []
+    if not formats:
+        if previous_signature and previous_root == Path(root):
+            # rsync Modus: Sidecars des letzten Laufs nicht weiter ausliefern
+            for rel_path in files:
+                remove_sidecars(str(Path(root) / rel_path))
+        return None, None
+    signature = hashlib.sha256(json.dumps({
+        'formats': formats,
+        'levels': {fmt: config['levels'][fmt] for fmt in formats}
+    }, sort_keys=True).encode('utf-8')).hexdigest()
+
+    start = time.monotonic()
+    root = Path(root)
+    reusable = set()
+    if previous_root and previous_signature == signature:
+        reusable = set(diff['reused'])
+    extensions = {ext.lower() for ext in config['extensions']}
+
+    stats = {'formats': formats, 'compressed': 0, 'reused': 0, 'original_bytes': 0,
+             'compressed_bytes': {fmt: 0 for fmt in formats}}
+    to_compress = []
+    for rel_path, entry in files.items():
+        if Path(rel_path).suffix.lower() not in extensions:
+            continue
+        if not config['min_size'] <= entry['size'] <= config['max_size']:
+            continue
+        if rel_path in reusable:
+            linked = False
+            for fmt in formats:
+                source = previous_root / (rel_path + PRECOMPRESS_SUFFIXES[fmt])
+                target = root / (rel_path + PRECOMPRESS_SUFFIXES[fmt])
+                try:
+                    if source.exists():
+                        if source.resolve() != target.resolve():
+                            target.unlink(missing_ok=True)
+                            os.link(source, target)
+                        stats['compressed_bytes'][fmt] += source.stat().st_size
+                        linked = True
+                except OSError:
+                    pass
+            if linked:
+                stats['reused'] += 1
+                stats['original_bytes'] += entry['size']
+                continue
+        to_compress.append(str(root / rel_path))
+
+    if to_compress:
+        workers = max(1, min(config['workers'], len(to_compress)))
+        try:
+            for original_size, written in run_compress_workers(to_compress, formats, config['levels'], workers):
+                stats['compressed'] += 1
+                stats['original_bytes'] += original_size
+                for fmt, size in written.items():
+                    stats['compressed_bytes'][fmt] += size
+        except Exception as e:
+            # Ohne Sidecars liefert Caddy unkomprimiert bzw. dynamisch komprimiert aus,
+            # der Deploy selbst schlägt deshalb nicht fehl
+            logger.warning(f"Vorkomprimierung für {domain} fehlgeschlagen: {e}")
+            for path in to_compress:
+                remove_sidecars(path)
+            stats['error'] = str(e)
+            signature = None
+
+    stats['duration'] = round(time.monotonic() - start, 3)
+    return stats, signature
+
+def format_precompress_stats(stats):
+    if stats.get('error'):
+        return f"Vorkomprimierung fehlgeschlagen: {stats['error']}"
+    sizes = ", ".join(f"{fmt} {size} Bytes" for fmt, size in stats['compressed_bytes'].items())
+    return (f"Vorkomprimiert: {stats['compressed']} Dateien neu, {stats['reused']} übernommen "
+            f"({stats['original_bytes']} Bytes -> {sizes}) in {stats['duration']}s")
+
+# ---------------------------------------------------------------------------
+# Asset-Store
+# ---------------------------------------------------------------------------
+#
+# Optionaler content-addressed Store unter PAGES_ROOT/_objects/<ab>/<sha256>.
+# Beim Publish wird jede Datei des Releases (samt Sidecars) durch einen
+# Hardlink auf das Objekt mit ihrem Inhalt ersetzt. Gleiche Themes, Fonts und
+# Bilder mehrerer Domains liegen so nur einmal auf der Platte und im Page
+# Cache. Die Referenzen zählt das Dateisystem: ein Objekt mit Linkanzahl 1
+# wird von keinem Release mehr genutzt und von der Garbage Collection
+# entfernt. Nur Releases und das rsync Ziel werden übernommen, nie die
+# Build-Ausgabe in repository/public, die Hugo beim nächsten Build
+# überschreibt. Publish hält die Store-Sperre geteilt, die Garbage Collection
+# exklusiv, damit kein gerade angelegtes Objekt entfernt wird.
+
+def asset_store_path(*parts):
+    return Path(PAGES_ROOT).joinpath("_objects", *parts)
+
+def asset_object_path(sha256):
+    return asset_store_path(sha256[:2], sha256)
+
+def asset_store_lock_path():
+    return data_path("locks", "asset_store.lock")
+
+def asset_store_stats_path():
+    return data_path("asset_store.json")
+
+def _intern_file(path, sha256, stats):
+    """
+    Ersetzt eine Datei durch einen Hardlink auf ihr Objekt im Store
+    Existiert das Objekt noch nicht, wird die Datei selbst zum Objekt
+    """
+    target_stat = path.stat()
+    if target_stat.st_size < ASSET_STORE_CONFIG['min_size']:
+        return
+    obj = asset_object_path(sha256)
+    try:
+        obj_stat = obj.stat()
+    except FileNotFoundError:
+        obj.parent.mkdir(parents=True, exist_ok=True)
+        try:
+            os.link(path, obj)
+            stats['new'] += 1
+            stats['files'] += 1
+            return
+        except FileExistsError:
+            obj_stat = obj.stat()
+    if (obj_stat.st_dev, obj_stat.st_ino) != (target_stat.st_dev, target_stat.st_ino):
+        if obj_stat.st_size != target_stat.st_size:
+            logger.warning(f"Objekt {sha256} hat eine abweichende Größe, {path} wird nicht verlinkt")
+            return
+        tmp_path = path.with_name(f".{path.name}.store.tmp")
+        try:
+            os.link(obj, tmp_path)
+            os.replace(tmp_path, path)
+        except OSError:
+            tmp_path.unlink(missing_ok=True)
+            raise
+        stats['linked'] += 1
+    stats['files'] += 1
+    # Links außer dem Store und dieser Datei: Inhalt wird mit anderen Releases geteilt
+    same_inode = (obj_stat.st_dev, obj_stat.st_ino) == (target_stat.st_dev, target_stat.st_ino)
+    if obj_stat.st_nlink - 1 - same_inode > 0:
+        stats['shared_files'] += 1
+        stats['shared_bytes'] += target_stat.st_size
+
+def unshare_tree(root):
+    """
+    Ersetzt mehrfach verlinkte Dateien unter root durch eigene Kopien
+    rsync darf danach Rechte und Zeiten in place setzen, ohne geteilte Objekte zu ändern
+    """
+    count = 0
+    for dirpath, dirnames, filenames in os.walk(root):
+        for filename in filenames:
+            path = Path(dirpath) / filename
+            try:
+                if path.lstat().st_nlink < 2 or path.is_symlink():
+                    continue
+                tmp_path = path.with_name(f".{path.name}.unshare.tmp")
+                shutil.copy2(path, tmp_path)
+                os.replace(tmp_path, path)
+            except OSError as e:
+                logger.warning(f"Konnte {path} nicht entkoppeln: {e}")
+                continue
+            count += 1
+            if count % 200 == 0:
+                time.sleep(0)
+    return count
+
+def intern_release(root, files):
+    """
+    Übernimmt die Dateien unter root (Manifest plus Sidecars) in den Store
+    Gibt die Statistik zurück, bei Fehlern mit 'error'
+    """
+    root = Path(root)
+    stats = {'files': 0, 'new': 0, 'linked': 0, 'shared_files': 0, 'shared_bytes': 0}
+    start = time.monotonic()
+    try:
+        with file_lock(asset_store_lock_path(), shared=True):
+            for count, (rel_path, entry) in enumerate(files.items(), 1):
+                path = root / rel_path
+                _intern_file(path, entry['sha256'], stats)
+                for suffix in PRECOMPRESS_SUFFIXES.values():
+                    sidecar = path.with_name(path.name + suffix)
+                    if sidecar.exists():
+                        _intern_file(sidecar, file_sha256(sidecar), stats)
+                if count % 200 == 0:
+                    time.sleep(0)
+    except OSError as e:
+        # z.B. EXDEV: Store und Releases liegen auf verschiedenen Dateisystemen
+        logger.warning(f"Asset-Store für {root} nicht nutzbar: {e}")
+        stats['error'] = str(e)
+    stats['duration'] = round(time.monotonic() - start, 3)
+    if time.time() - (read_json(asset_store_stats_path(), {}).get('updated_ts') or 0) > \
+            ASSET_STORE_CONFIG['stats_max_age']:
+        try:
+            scan_asset_store()
+        except OSError as e:
+            logger.warning(f"Store-Statistik nicht aktualisiert: {e}")
+    return stats
+
+def format_store_stats(stats):
+    if stats.get('error'):
+        return f"Asset-Store nicht genutzt: {stats['error']}"
+    return (f"Asset-Store: {stats['files']} Dateien, {stats['new']} neue Objekte, {stats['linked']} verlinkt, "
+            f"{stats['shared_files']} mit anderen Releases geteilt ({stats['shared_bytes']} Bytes) "
+            f"in {stats['duration']}s")
+
+def scan_asset_store(collect=False):
+    """
+    Zählt Objekte, Links und eingesparte Bytes, entfernt mit collect=True
+    Objekte ohne Referenz (Linkanzahl 1) und liegengebliebene Temp-Dateien
+    """
+    result = {'objects': 0, 'bytes': 0, 'references': 0, 'logical_bytes': 0,
+              'removed_objects': 0, 'removed_bytes': 0}
+    root = asset_store_path()
+    if root.exists():
+        for count, path in enumerate(root.glob("*/*"), 1):
+            try:
+                st = path.stat()
+            except FileNotFoundError:
+                continue
+            references = st.st_nlink - 1
+            if collect and references == 0:
+                path.unlink(missing_ok=True)
+                result['removed_objects'] += 1
+                result['removed_bytes'] += st.st_size
+                continue
+            result['objects'] += 1
+            result['bytes'] += st.st_size
+            result['references'] += references
+            result['logical_bytes'] += st.st_size * max(references, 1)
+            if count % 500 == 0:
+                time.sleep(0)
+    result['saved_bytes'] = result['logical_bytes'] - result['bytes']
+    result['updated'] = datetime.now().isoformat()
+    result['updated_ts'] = time.time()
+    stored = {key: value for key, value in result.items() if not key.startswith('removed_')}
+    if collect:
+        stored['last_gc'] = result['updated']
+    else:
+        stored['last_gc'] = read_json(asset_store_stats_path(), {}).get('last_gc')
+    write_json_atomic(asset_store_stats_path(), stored)
+    return result
+
+def gc_asset_store():
+    """
+    Garbage Collection des Stores, wartet auf laufende Publishes
+    """
+    start = time.monotonic()
+    with file_lock(asset_store_lock_path()):
+        result = scan_asset_store(collect=True)
+    result['duration'] = round(time.monotonic() - start, 3)
+    logger.info(f"Asset-Store GC: {result['removed_objects']} Objekte ({result['removed_bytes']} Bytes) entfernt")
+    return result
+
+def asset_store_status():
+    stats = read_json(asset_store_stats_path(), {})
+    stats.pop('updated_ts', None)
+    return {'enabled': ASSET_STORE_CONFIG['enabled'], **stats}
+
+# ---------------------------------------------------------------------------
+# Cache-Header und Cache-Warming
+# ---------------------------------------------------------------------------
+#
+# Nach dem Publish wird aus dem Manifest <domain>/cache-manifest.json
+# geschrieben: starke ETags aus dem Inhalts-Hash und die Cache-Control Werte,
+# Dateien mit Fingerprint im Namen sind als immutable markiert. Caddy kann
+# die Header nicht pro Datei aus einer JSON-Datei lesen, das Beispiel im
+# README setzt sie über dieselben Muster; das Manifest dient vorgelagerten
+# Caches und Tools als Referenz. Das optionale Warming liest danach die
+# meistbesuchten Dateien aus dem Access-Log von Caddy in den Page Cache oder
+# ruft sie über einen lokalen HTTP Front ab.
+
+def cache_manifest_path(domain):
+    return Path(PAGES_ROOT) / domain / "cache-manifest.json"
+
+def write_cache_manifest(domain, deploy_id, files=None):
+    """
+    Schreibt das Cache-Header Manifest für den veröffentlichten Stand
+    Gibt die Anzahl der Dateien und der immutable Dateien zurück
+    """
+    config = domain_config(domain, 'cache', CACHE_HEADERS_CONFIG)
+    if not config['enabled']:
+        cache_manifest_path(domain).unlink(missing_ok=True)
+        return None
+    if files is None:
+        files = read_json(manifest_path(domain, deploy_id), {}).get('files', {})
+    patterns = [re.compile(pattern) for pattern in config['immutable_patterns']]
+    entries = {}
+    immutable_count = 0
+    for rel_path, entry in files.items():
+        immutable = any(pattern.search(rel_path) for pattern in patterns)
+        immutable_count += immutable
+        entries['/' + rel_path] = {
+            'etag': f'"{entry["sha256"][:32]}"',
+            'size': entry['size'],
+            'immutable': immutable,
+            'cache_control': config['immutable_cache_control'] if immutable else config['cache_control']
+        }
+    write_json_atomic(cache_manifest_path(domain), {
+        'domain': domain,
+        'deploy_id': deploy_id,
+        'generated': datetime.now().isoformat(),
+        'immutable_patterns': config['immutable_patterns'],
+        'files': entries
+    }, indent=None)
+    return {'files': len(entries), 'immutable': immutable_count}
+
+# Pro Prozess ausgewertete Zugriffsstatistik. Kein Lock: die Datei wird mit
+# Pausen für andere Greenlets gelesen, das Ergebnis am Ende nur ersetzt
+_access_log_stats = {'key': None, 'loaded_at': 0.0, 'hosts': {}}
+
+def access_log_hits():
+    """
+    Zählt erfolgreiche GET Anfragen pro Host und Pfad im Ende des Access-Logs
+    (JSON Format von Caddy), wird pro Prozess zwischengespeichert
+    """
+    path = Path(CACHE_WARM_CONFIG['access_log'])
+    try:
+        st = path.stat()
+    except OSError:
+        return {}
+    key = (st.st_ino, st.st_size)
+    cached = _access_log_stats
+    # Unverändertes Log oder kürzlich ausgewertet: Statistik wiederverwenden
+    if cached['key'] is not None and (
+            cached['key'] == key or time.monotonic() - cached['loaded_at'] < CACHE_WARM_CONFIG['log_max_age']):
+        return cached['hosts']
+    hosts = {}
+    limit = CACHE_WARM_CONFIG['max_log_mb'] * 1024 * 1024
+    with open(path, 'rb') as f:
+        if st.st_size > limit:
+            f.seek(st.st_size - limit)
+            f.readline()
+        for count, line in enumerate(f, 1):
+            try:
+                record = json.loads(line)
+                req = record['request']
+            except (ValueError, KeyError, TypeError):
+                continue
+            if req.get('method') != 'GET' or record.get('status') not in (200, 304):
+                continue
+            host = (req.get('host') or '').split(':')[0].lower()
+            uri = (req.get('uri') or '').split('?', 1)[0]
+            if host and uri.startswith('/'):
+                counts = hosts.setdefault(host, {})
+                counts[uri] = counts.get(uri, 0) + 1
+            if count % 5000 == 0:
+                time.sleep(0)
+    _access_log_stats.update(key=key, loaded_at=time.monotonic(), hosts=hosts)
+    return hosts
+
+def _uri_to_file(uri, files):
+    rel_path = urllib.parse.unquote(uri).lstrip('/')
+    for candidate in (rel_path, rel_path.rstrip('/') + '/index.html' if rel_path else 'index.html'):
+        if candidate in files:
+            return candidate
+    return None
+
+def warm_cache(domain, deploy_id):
+    """
+    Liest die meistbesuchten Dateien des neuen Stands (samt Sidecars) in den
+    Page Cache oder ruft sie über den HTTP Front ab, schreibt das Ergebnis in den Log
+    """
+    start = time.monotonic()
+    files = read_json(manifest_path(domain, deploy_id), {}).get('files', {})
+    counts = access_log_hits().get(domain, {})
+    top = sorted(counts.items(), key=lambda item: -item[1])
+    uris = []
+    for uri, _ in top:
+        if _uri_to_file(uri, files):
+            uris.append(uri)
+        if len(uris) >= CACHE_WARM_CONFIG['top']:
+            break
+
+    warmed, failed, read_bytes = 0, 0, 0
+    root = (Path(PAGES_ROOT) / domain / "public").resolve()
+    for uri in uris:
+        try:
+            if CACHE_WARM_CONFIG['url']:
+                req = urllib.request.Request(CACHE_WARM_CONFIG['url'].rstrip('/') + uri, headers={
+                    'Host': domain,
+                    'Accept-Encoding': 'zstd, br, gzip'
+                })
+                with urllib.request.urlopen(req, timeout=10) as response:
+                    read_bytes += len(response.read())
+            else:
+                path = root / _uri_to_file(uri, files)
+                for variant in [path] + [path.with_name(path.name + suffix) for suffix in PRECOMPRESS_SUFFIXES.values()]:
+                    if variant.exists():
+                        with open(variant, 'rb') as f:
+                            while chunk := f.read(1024 * 1024):
+                                read_bytes += len(chunk)
+            warmed += 1
+        except (OSError, ValueError) as e:
+            failed += 1
+            logger.debug(f"Warming von {uri} für {domain} fehlgeschlagen: {e}")
+        time.sleep(0)
+
+    target = CACHE_WARM_CONFIG['url'] or 'Page Cache'
+    write_deploy_log(domain, deploy_id, "cache_warm",
+                     f"{warmed} von {len(uris)} meistbesuchten Pfaden vorgewärmt ({target}), "
+                     f"{read_bytes} Bytes, {failed} Fehler, {len(counts)} Pfade im Access-Log, "
+                     f"{time.monotonic() - start:.2f}s")
+    return {'warmed': warmed, 'failed': failed, 'bytes': read_bytes}
+
+def _warm_cache_background(domain, deploy_id):
+    try:
+        warm_cache(domain, deploy_id)
+    except Exception as e:
+        logger.warning(f"Cache-Warming für {domain} fehlgeschlagen: {e}")
+
+def after_publish(domain, deploy_id):
+    """
+    Cache-Header Manifest schreiben und Warming im Hintergrund starten
+    """
+    try:
+        result = write_cache_manifest(domain, deploy_id)
+        if result:
+            write_deploy_log(domain, deploy_id, "cache_manifest",
+                             f"Cache-Manifest: {result['files']} Dateien, {result['immutable']} immutable")
+    except Exception as e:
+        logger.warning(f"Cache-Manifest für {domain} nicht geschrieben: {e}")
+    if CACHE_WARM_CONFIG['enabled']:
+        threading.Thread(target=_warm_cache_background, args=(domain, deploy_id),
+                         name=f"cache-warm-{domain}", daemon=True).start()
+
+def publish_release(domain, deploy_id, public_source, build_key=None, commit=None):
+    """
+    Veröffentlicht die Build-Ausgabe als neues Release
+
+    Neue und geänderte Dateien werden aus der Build-Ausgabe übernommen,
+    unveränderte Dateien als Hardlink auf das vorherige Release gesetzt.
+    Gibt die Publish-Statistik zurück.
+    """
+    releases_path = Path(PAGES_ROOT) / domain / "releases"
+    release_path = releases_path / deploy_id
+    try:
+        release_path.parent.mkdir(parents=True, exist_ok=True)
+        previous_id = current_release(domain)
+        # Build-Ausgabe verschieben statt kopieren (gleiches Dateisystem, unabhängig von der Größe)
+        os.rename(public_source, release_path)
+
+        files, diff, stats = record_manifest(domain, deploy_id, release_path)
+        stats['linked'] = 0
+        previous_path = None
+        if previous_id and (releases_path / previous_id).is_dir():
+            previous_path = releases_path / previous_id
+            stats['linked'] = link_unchanged_files(release_path, previous_path, diff['reused'])
+
+        previous_meta = read_json(release_meta_path(domain, previous_id), {}) if previous_id else {}
+        stats['precompress'], precompress_signature = precompress_assets(
+            domain, release_path, files, diff, previous_path, previous_meta.get('precompress_signature'))
+        if ASSET_STORE_CONFIG['enabled']:
+            stats['store'] = intern_release(release_path, files)
+
+        write_json_atomic(release_meta_path(domain, deploy_id), {
+            'deploy_id': deploy_id,
+            'key': build_key,
+            'commit': commit,
+            'created': datetime.now().isoformat(),
+            'publish_stats': stats,
+            'precompress_signature': precompress_signature
+        })
+        activate_release(domain, deploy_id)
+        removed = prune_releases(domain)
+    except Exception as e:
+        error_msg = str(e)
+        write_deploy_log(domain, deploy_id, "publish_error", "", error_msg)
+        logger.error(f"Fehler beim Veröffentlichen des Releases: {e}")
+        raise DeployError(f'Publish Fehler: {error_msg}', step='publish')
+
+    output = f"Release {deploy_id} aktiviert: {release_path}\n{format_publish_stats(stats)}"
+    if removed:
+        output += f"\nAlte Releases entfernt: {', '.join(removed)}"
+    write_deploy_log(domain, deploy_id, "publish", output)
+    logger.info(f"Release {deploy_id} für {domain} aktiviert")
+    return stats
+
+def publish_rsync(domain, deploy_id, public_source, public_dest, build_key=None, commit=None):
+    """
+    Synchronisiert die Build-Ausgabe per rsync Container in das public Verzeichnis
+    Gibt die Publish-Statistik zurück
+    """
+    try:
+        previous_id = published_id(domain)
+        files, diff, stats = record_manifest(domain, deploy_id, public_source)
+        # Die Build-Ausgabe bleibt zwischen den Deploys bestehen, Sidecars
+        # unveränderter Dateien liegen dort schon vom letzten Lauf
+        previous_meta = read_json(release_meta_path(domain, previous_id), {}) if previous_id else {}
+        stats['precompress'], precompress_signature = precompress_assets(
+            domain, public_source, files, diff, Path(public_source), previous_meta.get('precompress_signature'))
+    except Exception as e:
+        error_msg = str(e)
+        write_deploy_log(domain, deploy_id, "rsync_error", "", error_msg)
+        logger.error(f"Fehler beim Erstellen des Manifests: {e}")
+        raise DeployError(f'Manifest Fehler: {error_msg}', step='rsync')
+
+    if public_dest.is_symlink():
+        # Wechsel vom Release-Modus: Symlink durch ein echtes Verzeichnis ersetzen
+        public_dest.unlink()
+
+    # Zielverzeichnis erstellen falls es nicht existiert
+    public_dest.mkdir(parents=True, exist_ok=True)
+    # Von älteren Versionen in den Store verlinkte Dateien vorher entkoppeln
+    unshare_tree(public_dest)
+
+    try:
+        # rsync Container für Dateiübertragung
+        run_step_container(
+            domain, deploy_id, "rsync",
+            image=STEP_IMAGES['rsync'],
+            command='rsync -a --delete /source/ /destination/',
+            volumes={
+                str(public_source): {
+                    'bind': '/source',
+                    'mode': 'ro'
+                },
+                str(public_dest): {
+                    'bind': '/destination',
+                    'mode': 'rw'
+                }
+            },
+            user='1000'
+        )
+        # Kein Asset Store im rsync Modus: rsync -a ändert Rechte und Zeiten
+        # identischer Dateien in place und damit das Objekt aller Domains
+        write_deploy_log(domain, deploy_id, "manifest", format_publish_stats(stats))
+
+        logger.info(f"Rsync erfolgreich: {public_source} -> {public_dest}")
+
+    except docker.errors.ContainerError as e:
+        error_msg = str(e)
+        write_deploy_log(domain, deploy_id, "rsync_error", "", error_msg)
+        logger.error(f"Rsync Container Fehler: {e}")
+        raise DeployError(f'Rsync Fehler: {error_msg}', step='rsync')
+    except Exception as e:
+        error_msg = str(e)
+        write_deploy_log(domain, deploy_id, "rsync_error", "", error_msg)
+        logger.error(f"Unerwarteter Rsync Fehler: {e}")
+        raise DeployError(f'Rsync Fehler: {error_msg}', step='rsync')
+
+    # Veröffentlichten Stand merken, nur das aktuelle Manifest aufbewahren
+    write_json_atomic(release_meta_path(domain, deploy_id), {
+        'deploy_id': deploy_id,
+        'key': build_key,
+        'commit': commit,
+        'created': datetime.now().isoformat(),
+        'publish_stats': stats,
+        'precompress_signature': precompress_signature
+    })
+    write_json_atomic(data_path("domains", domain, "publish.json"), {'deploy_id': deploy_id})
+    if previous_id and previous_id != deploy_id:
+        release_meta_path(domain, previous_id).unlink(missing_ok=True)
+        manifest_path(domain, previous_id).unlink(missing_ok=True)
+    return stats
+
+@app.route('/deploy/<domain>', methods=['POST'])
+def deploy_static_site(domain):
+    """
+    Reiht einen Deploy für die angegebene Domain ein
+    Antwortet sofort mit 202 und der Job-ID, der Status ist unter /jobs/<job_id> abrufbar
+    """
+    # Eindeutige Deploy-ID generieren
+    deploy_id = new_deploy_id()
+    secret = request.args.get('secret')
+
+    if secret != os.getenv("SECRET_KEY"):
+        return "Access Forbidden", 401
+
+    try:
+        # Validierung der Domain (einfache Überprüfung)
+        if not is_valid_domain(domain):
+            return jsonify({
+                'error': 'Ungültige Domain',
+                'domain': domain
+            }), 400
+
+        # Überprüfen ob Docker Client verfügbar ist
+        if not docker_client:
+            write_deploy_log(domain, deploy_id, "error", "Docker Client nicht verfügbar")
+            return jsonify({
+                'error': 'Docker Client nicht verfügbar'
+            }), 500
+
+        # force=1 umgeht den Build-Cache
+        force = request.args.get('force') in ('1', 'true', 'yes')
+
+        job, coalesced = enqueue_deploy(domain, deploy_id, force=force)
+        if coalesced:
+            logger.info(f"Deploy-Trigger für {domain} in wartenden Job {job['job_id']} zusammengefasst")
+            message = f'Deployment für {domain} bereits eingereiht, Trigger zusammengefasst'
+        else:
+            logger.info(f"Deploy-Job {job['job_id']} eingereiht für Domain: {domain} (Deploy-ID: {deploy_id})")
+            message = f'Deployment für {domain} eingereiht'
+
+        return jsonify({
+            'success': True,
+            'message': message,
+            'domain': domain,
+            'job_id': job['job_id'],
+            'deploy_id': job['deploy_id'],
+            'status': job['status'],
+            'coalesced': coalesced,
+            'triggers': job['triggers'],
+            'status_url': f"/jobs/{job['job_id']}"
+        }), 202
+
+    except Exception as e:
+        error_msg = str(e)
+        logger.error(f"Fehler beim Einreihen des Deployments: {e}")
+        return jsonify({
+            'error': f'Unerwarteter Fehler: {error_msg}',
+            'domain': domain,
+            'deploy_id': deploy_id
+        }), 500
+
+class GitSyncError(Exception):
+    """
+    Der git Befehl des Repository-Syncs ist fehlgeschlagen
+    """
+
+def git_sync_script(config):
+    """
+    Shell-Skript für den Sync auf den Stand von origin/<branch>
+    Läuft lokal oder im alpine/git Container, jeweils im Repository
+    """
+    branch = shlex.quote(config['branch'])
+    remote_ref = f"refs/remotes/origin/{config['branch']}"
+    fetch_spec = f"+refs/heads/{config['branch']}:{remote_ref}"
+    commands = [
+        'set -e',
+        # Kein übergeordnetes Repository verwenden, falls repository/ kein Clone ist
+        '[ -e .git ] || { echo "Kein Git Repository"; exit 1; }',
+    ]
+    fetch = ['git', 'fetch', '--prune', '--no-tags']
+    if config['depth']:
+        # Ein vollständiger Clone bleibt vollständig, nur flache Clones werden begrenzt
+        commands.append('depth=""')
+        commands.append(f'if [ "$(git rev-parse --is-shallow-repository)" = "true" ]; '
+                        f'then depth="--depth={int(config["depth"])}"; fi')
+    if config['filter']:
+        # Bestehenden vollständigen Clone als partiellen Clone kennzeichnen,
+        # damit fehlende Inhalte beim Checkout nachgeladen werden
+        commands.append("git config remote.origin.promisor true")
+        commands.append(f"git config remote.origin.partialclonefilter {shlex.quote(config['filter'])}")
+        fetch.append(f"--filter={config['filter']}")
+    # Nur den Release-Branch holen, der Refspec bleibt auf der Kommandozeile und
+    # die Fetch-Konfiguration des Clones unverändert
+    commands.append(" ".join(shlex.quote(arg) for arg in fetch) + (" $depth" if config['depth'] else "")
+                    + f" origin {shlex.quote(fetch_spec)}")
+
+    sparse = config['sparse']
+    if sparse:
+        paths = HUGO_SPARSE_PATHS if sparse is True else list(sparse)
+        commands.append("git sparse-checkout set --cone " + " ".join(shlex.quote(path) for path in paths))
+    else:
+        commands.append('if [ "$(git config --get core.sparseCheckout)" = "true" ]; then git sparse-checkout disable; fi')
+
+    # Lokale Änderungen und abweichende Commits verwerfen, der Branch zeigt danach auf origin
+    commands.append(f"git checkout -f -B {branch} {shlex.quote(remote_ref)}")
+    commands.append(f"git reset --hard {shlex.quote(remote_ref)}")
+    if config['clean']:
+        commands.append("git clean -fd" + "".join(f" -e {shlex.quote(path)}" for path in config['clean_exclude']))
+    commands.append("git log -1 --format='HEAD %H %s'")
+    return "\n".join(commands)
+
+def run_local_step(domain, deploy_id, step, command, cwd):
+    """
+    Führt einen Step als lokalen Prozess aus (wie run_step_container)
+    Ausgabe wird live in den Log geschrieben, nur das Zeitlimit gilt
+    """
+    tail = deque(maxlen=STEP_OUTPUT_TAIL_LINES)
+    _, timeout = step_limits(domain, step)
+    timed_out = threading.Event()
+    start = time.monotonic()
+    # Keine Rückfragen nach Zugangsdaten, keine Repository-Suche oberhalb von cwd
+    env = {**os.environ, 'GIT_TERMINAL_PROMPT': '0', 'GIT_CEILING_DIRECTORIES': str(Path(cwd).resolve().parent)}
+    process = subprocess.Popen(command, cwd=str(cwd), env=env, stdout=subprocess.PIPE, stderr=subprocess.STDOUT)
+
+    def kill():
+        timed_out.set()
+        process.kill()
+
+    watchdog = threading.Timer(timeout, kill) if timeout else None
+    if watchdog:
+        watchdog.daemon = True
+        watchdog.start()
+    try:
+        _stream_step_output(domain, deploy_id, step, iter(process.stdout.readline, b''), tail)
+        exit_code = process.wait()
+    finally:
+        if watchdog:
+            watchdog.cancel()
+        process.stdout.close()
+        write_deploy_log(domain, deploy_id, f"{step}_resources",
+                         f"Lokal ausgeführt, Zeitlimit {timeout or '-'}s\n"
+                         f"Dauer: {time.monotonic() - start:.1f}s")
+    if timed_out.is_set():
+        raise StepLimitError(f"{step} nach {timeout}s abgebrochen (Zeitlimit)", step, 'timeout')
+    if exit_code != 0:
+        raise GitSyncError(f"{step} fehlgeschlagen (Exit-Code {exit_code}): {' | '.join(list(tail)[-5:])}")
+    return "\n".join(tail)
+
+def sync_repository(domain, deploy_id, repo_path):
+    """
+    Bringt das Repository auf den Stand des Release-Branches
+    Wirft GitSyncError bzw. docker.errors.ContainerError, wenn git fehlschlägt
+    """
+    config = domain_config(domain, 'repository', REPO_SYNC_CONFIG)
+    if config['mode'] == 'pull':
+        command = ['pull', 'origin', config['branch']]
+        entrypoint = None
+    else:
+        command = ['-c', git_sync_script(config)]
+        entrypoint = '/bin/sh'
+
+    local = str(config['local']).lower()
+    if use_local_git(local):
+        run_local_step(domain, deploy_id, "git_pull",
+                       (['git'] + command) if entrypoint is None else ['/bin/sh'] + command, repo_path)
+        return 'local'
+
+    run_kwargs = {'entrypoint': entrypoint} if entrypoint else {}
+    run_step_container(
+        domain, deploy_id, "git_pull",
+        image=STEP_IMAGES['git'],
+        command=command,
+        volumes={
+            str(repo_path): {
+                'bind': '/repo',
+                'mode': 'rw'
+            }
+        },
+        user='1000',
+        working_dir="/repo",
+        **run_kwargs
+    )
+    return 'container'
+
+def change_filter(job, repo_path, public_dest, commit, last_build):
+    """
+    Vergleicht den neuen HEAD mit dem Commit des letzten Builds und schreibt
+    die Entscheidung in den Deploy-Log
+    Gibt die Änderungen zurück, wenn der Build entfallen kann, sonst None
+    """
+    domain = job['domain']
+    deploy_id = job['deploy_id']
+    config = domain_config(domain, 'changes', CHANGES_CONFIG)
+    last_commit = last_build.get('commit')
+    if not config['enabled'] or not commit or not last_commit or not public_dest.exists():
+        return None
+    if job.get('force'):
+        write_deploy_log(domain, deploy_id, "changes", "Änderungsprüfung umgangen (force=1)")
+        return None
+    # Geändertes Hugo Image oder geänderter Befehl: Ausgabe ändert sich auch ohne Commit
+    if compute_build_key(domain, last_commit) != last_build.get('key'):
+        write_deploy_log(domain, deploy_id, "changes",
+                         "Build-Konfiguration seit dem letzten Build geändert, Build nötig")
+        return None
+
+    changed = git_changed_paths(repo_path, last_commit, commit)
+    if changed is None:
+        write_deploy_log(domain, deploy_id, "changes",
+                         f"Commit des letzten Builds {last_commit[:12]} nicht im Repository, Build nötig")
+        return None
+    relevant = relevant_changes(domain, changed)
+    listing = "\n".join(f"{'*' if path in relevant else ' '} {path}" for path in changed)
+    summary = (f"Änderungen seit Build {last_build.get('deploy_id')} ({last_commit[:12]}..{commit[:12]}): "
+               f"{len(changed)} Dateien, {len(relevant)} relevant (*)")
+    if relevant:
+        write_deploy_log(domain, deploy_id, "changes", f"{summary}\nBuild nötig\n{listing}")
+        return None
+    write_deploy_log(domain, deploy_id, "changes",
+                     f"{summary}\nKeine relevanten Änderungen, Compile und Sync übersprungen\n{listing}")
+    return {'changed': changed, 'relevant': relevant}
+
+def run_deploy(job):
+    """
+    Deployed eine statische Website (Git Pull + Hugo Compiler + Publish/Rsync)
+    Läuft im Deploy-Worker, wirft DeployError bei Fehlern
+    """
+    domain = job['domain']
+    deploy_id = job['deploy_id']
+
+    # Pfade definieren
+    base_path = Path(PAGES_ROOT)
+    domain_path = base_path / domain
+    repo_path = domain_path / "repository"
+    public_source = repo_path / "public"
+    public_dest = domain_path / "public"
+
+    logger.info(f"Deployment für Domain: {domain} (Deploy-ID: {deploy_id})")
+    logger.info(f"Repository Pfad: {repo_path}")
+
+    # Deploy-Start in Log schreiben
+    write_deploy_log(domain, deploy_id, "deploy_start",
+                    f"Deploy gestartet für Domain: {domain}\nDeploy-ID: {deploy_id}\nJob-ID: {job['job_id']}\n"
+                    f"Zusammengefasste Trigger: {job['triggers']}\nRepository: {repo_path}")
+
+    # Verzeichnisse erstellen falls sie nicht existieren
+    repo_path.mkdir(parents=True, exist_ok=True)
+
+    # Schritt 1: Repository auf den Stand des Release-Branches bringen
+    with job_step(job, 'git_pull') as step:
+        try:
+            # Lokal oder im alpine/git Container, Ausgabe wird live in den Log geschrieben
+            runner = sync_repository(domain, deploy_id, repo_path)
+
+            logger.info(f"Repository-Sync erfolgreich für {domain} ({runner})")
+
+        except (docker.errors.ContainerError, GitSyncError) as e:
+            error_msg = str(e)
+            write_deploy_log(domain, deploy_id, "git_pull_warning",
+                           f"Git pull fehlgeschlagen (möglicherweise kein Git Repository)", error_msg)
+            logger.warning(f"Git pull fehlgeschlagen (möglicherweise kein Git Repository): {e}")
+            # Weitermachen, falls es kein Git Repository ist
+            step['status'] = 'warning'
+        except Exception as e:
+            error_msg = str(e)
+            write_deploy_log(domain, deploy_id, "git_pull_error", "", error_msg)
+            logger.error(f"Docker Container Fehler: {e}")
+            raise DeployError(f'Docker Container Fehler: {error_msg}', step='git_pull')
+
+    publish_step = 'publish' if PUBLISH_CONFIG['mode'] == 'release' else 'rsync'
+
+    # Build-Cache: Ist der Stand bereits veröffentlicht, entfallen Compile und Sync
+    commit = read_git_head(repo_path)
+    build_key = compute_build_key(domain, commit) if commit else None
+    build_state_path = data_path("domains", domain, "build.json")
+    last_build = read_json(build_state_path, {})
+
+    if build_key and build_key == last_build.get('key') and public_dest.exists():
+        if job.get('force'):
+            write_deploy_log(domain, deploy_id, "build_cache",
+                           f"Build-Cache umgangen (force=1)\nCommit: {commit}\nBuild-Key: {build_key}")
+        else:
+            for step_name in ('hugo_compile', publish_step):
+                job['steps'].append({'name': step_name, 'status': 'skipped', 'started': None,
+                                     'finished': None, 'duration': 0})
+            save_job(job)
+            write_deploy_log(domain, deploy_id, "build_cache_hit",
+                           f"Keine Änderung seit Deploy {last_build.get('deploy_id')}, Compile und Sync übersprungen\n"
+                           f"Commit: {commit}\nBuild-Key: {build_key}")
+            write_deploy_log(domain, deploy_id, "deploy_success",
+                           f"Deploy erfolgreich abgeschlossen (Cache-Treffer)\nPublic Path: {public_dest}")
+            logger.info(f"Build-Cache Treffer für {domain} (Commit {commit[:12]})")
+            return {
+                'success': True,
+                'message': f'Deployment für {domain} unverändert, Build übersprungen (Cache-Treffer)',
+                'domain': domain,
+                'deploy_id': deploy_id,
+                'repository_path': str(repo_path),
+                'public_path': str(public_dest),
+                'steps_completed': ['git_pull'],
+                'compiler_image': COMPILER_CONFIG['image'],
+                'commit': commit,
+                'cache_hit': True
+            }
+
+    # Änderungsabhängiger Deploy: Build entfällt, wenn seit dem letzten Build
+    # keine für die Website relevanten Dateien geändert wurden
+    skip = change_filter(job, repo_path, public_dest, commit, last_build)
+    if skip:
+        for step_name in ('hugo_compile', publish_step):
+            job['steps'].append({'name': step_name, 'status': 'skipped', 'started': None,
+                                 'finished': None, 'duration': 0})
+        save_job(job)
+        write_deploy_log(domain, deploy_id, "deploy_success",
+                       f"Deploy erfolgreich abgeschlossen (keine relevanten Änderungen)\nPublic Path: {public_dest}")
+        logger.info(f"Keine relevanten Änderungen für {domain}, Build übersprungen")
+        return {
+            'success': True,
+            'message': f'Deployment für {domain} ohne relevante Änderungen, Build übersprungen',
+            'domain': domain,
+            'deploy_id': deploy_id,
+            'repository_path': str(repo_path),
+            'public_path': str(public_dest),
+            'steps_completed': ['git_pull'],
+            'compiler_image': COMPILER_CONFIG['image'],
+            'commit': commit,
+            'cache_hit': False,
+            'skipped': True,
+            'skip_reason': 'no_relevant_changes',
+            'changed_paths': skip['changed']
+        }
+
+    # Schritt 2: Hugo Compiler ausführen
+    hugo_started = time.time()
+    with job_step(job, 'hugo_compile'):
+        try:
+            # Befehl für die spezifische Domain anpassen
+            hugo_command = COMPILER_CONFIG['command'].format(domain=domain)
+            cache_volumes, cache_environment = hugo_cache_volumes(domain)
+
+            # Gemeinsame Sperre: Modul-Cache darf während des Builds nicht bereinigt werden
+            with file_lock(module_cache_lock_path(), shared=True):
+                run_step_container(
+                    domain, deploy_id, "hugo_compile",
+                    image=COMPILER_CONFIG['image'],
+                    command=['-c', hugo_command],
+                    volumes={
+                        str(repo_path): {
+                            'bind': '/repo',
+                            'mode': 'rw'
+                        },
+                        **cache_volumes
+                    },
+                    environment=cache_environment,
+                    working_dir=COMPILER_CONFIG['working_dir'],
+                    entrypoint=COMPILER_CONFIG['entrypoint'],
+                    user='1000'
+                )
+
+            logger.info(f"Hugo Compiler erfolgreich ausgeführt für {domain}")
+
+        except StepLimitError as e:
+            error_msg = str(e)
+            write_deploy_log(domain, deploy_id, "hugo_compile_error", "", error_msg)
+            logger.error(f"Hugo Compiler abgebrochen: {e}")
+            raise DeployError(f'Hugo Compiler Fehler: {error_msg}', step='hugo_compile',
+                              hint='Limits im Abschnitt "limits" von <domain>/config.json anpassen')
+        except docker.errors.ContainerError as e:
+            error_msg = str(e)
+            write_deploy_log(domain, deploy_id, "hugo_compile_error", "", error_msg)
+            logger.error(f"Hugo Compiler fehlgeschlagen: {e}")
+            raise DeployError(f'Hugo Compiler Fehler: {error_msg}', step='hugo_compile')
+        except Exception as e:
+            error_msg = str(e)
+            write_deploy_log(domain, deploy_id, "hugo_compile_error", "", error_msg)
+            logger.error(f"Unerwarteter Compiler Fehler: {e}")
+            raise DeployError(f'Compiler Fehler: {error_msg}', step='hugo_compile')
+
+    # Cache-Nutzung protokollieren und Größenlimits durchsetzen
+    cache_usage = None
+    if HUGO_CACHE_CONFIG['enabled']:
+        try:
+            cache_usage = record_hugo_cache_usage(domain, hugo_started)
+            evicted = evict_hugo_caches()
+            output = format_cache_usage(cache_usage)
+            if evicted:
+                output += f"\nAus dem Cache entfernt (LRU): {', '.join(evicted)}"
+            write_deploy_log(domain, deploy_id, "hugo_cache", output)
+        except Exception as e:
+            logger.warning(f"Fehler beim Verwalten der Hugo Caches: {e}")
+
+    # Schritt 3: Build-Ausgabe veröffentlichen (Release-Symlink oder rsync)
+    if not public_source.exists():
+        error_msg = f"Public Verzeichnis nicht gefunden nach Hugo Compiler: {public_source}"
+        write_deploy_log(domain, deploy_id, "deploy_error", "", error_msg)
+        logger.warning(error_msg)
+        raise DeployError(
+            error_msg,
+            step='hugo_compile',
+            hint='Möglicherweise ist der Hugo Build fehlgeschlagen oder das Ausgabeverzeichnis ist anders konfiguriert'
+        )
+
+    with job_step(job, publish_step):
+        if publish_step == 'publish':
+            publish_stats = publish_release(domain, deploy_id, public_source, build_key, commit)
+        else:
+            publish_stats = publish_rsync(domain, deploy_id, public_source, public_dest, build_key, commit)
+    notify_domain_published(domain)
+    after_publish(domain, deploy_id)
+
+    # Build-Key des veröffentlichten Stands merken
+    if build_key:
+        write_json_atomic(build_state_path, {
+            'key': build_key,
+            'commit': commit,
+            'deploy_id': deploy_id,
+            'published': datetime.now().isoformat()
+        })
+
+    # Deploy erfolgreich abgeschlossen
+    write_deploy_log(domain, deploy_id, "deploy_success",
+                   f"Deploy erfolgreich abgeschlossen\nPublic Path: {public_dest}")
+
+    return {
+        'success': True,
+        'message': f'Deployment für {domain} erfolgreich (Git Pull + Hugo Compiler + {publish_step.capitalize()})',
+        'domain': domain,
+        'deploy_id': deploy_id,
+        'repository_path': str(repo_path),
+        'public_path': str(public_dest),
+        'steps_completed': ['git_pull', 'hugo_compile', publish_step],
+        'compiler_image': COMPILER_CONFIG['image'],
+        'commit': commit,
+        'cache_hit': False,
+        'publish_stats': publish_stats,
+        'hugo_cache': cache_usage
+    }
+
+@app.route('/deploy-batch', methods=['POST'])
+def deploy_batch():
+    """
+    Reiht Deploys für mehrere Domains ein
+    JSON Body: {"domains": [...] oder "all", "force": false, "priorities": {"<domain>": 10}}
+    Antwortet mit 202, Fortschritt unter /batches/<batch_id> und /batches/<batch_id>/stream
+    """
+    secret = request.args.get('secret')
+
+    if secret != os.getenv("SECRET_KEY"):
+        return "Access Forbidden", 401
+
+    body = request.get_json(silent=True) or {}
+    domains = body.get('domains')
+    if domains == 'all':
+        domains = discover_domains()
+    if not isinstance(domains, list) or not domains:
+        return jsonify({'error': 'domains muss eine Liste von Domains oder "all" sein'}), 400
+    domains = list(dict.fromkeys(domains))
+    invalid = [domain for domain in domains if not isinstance(domain, str) or not is_valid_domain(domain)]
+    if invalid:
+        return jsonify({'error': 'Ungültige Domains', 'domains': invalid}), 400
+    priorities = body.get('priorities') or {}
+    if not isinstance(priorities, dict) or not all(isinstance(p, int) for p in priorities.values()):
+        return jsonify({'error': 'priorities muss Domains auf ganze Zahlen abbilden'}), 400
+
+    if not docker_client:
+        return jsonify({
+            'error': 'Docker Client nicht verfügbar'
+        }), 500
+
+    try:
+        batch = create_batch(domains, force=bool(body.get('force')), priorities=priorities)
+    except Exception as e:
+        logger.error(f"Fehler beim Einreihen des Batches: {e}")
+        return jsonify({'error': f'Unerwarteter Fehler: {str(e)}'}), 500
+
+    logger.info(f"Batch {batch['batch_id']} mit {len(batch['domains'])} Domains eingereiht")
+    return jsonify({
+        'success': True,
+        'batch_id': batch['batch_id'],
+        'total': len(batch['domains']),
+        'concurrency': deploy_slot_count(),
+        'domains': batch['domains'],
+        'status_url': f"/batches/{batch['batch_id']}",
+        'stream_url': f"/batches/{batch['batch_id']}/stream"
+    }), 202
+
+@app.route('/batches/<batch_id>', methods=['GET'])
+def get_batch(batch_id):
+    """
+    Fortschritt und Zusammenfassung eines Batches
+    """
+    secret = request.args.get('secret')
+
+    if secret != os.getenv("SECRET_KEY"):
+        return "Access Forbidden", 401
+
+    batch = load_batch(batch_id)
+    if not batch:
+        return jsonify({'error': 'Batch nicht gefunden', 'batch_id': batch_id}), 404
+    return jsonify(batch_summary(batch)), 200
+
+@app.route('/batches/<batch_id>/stream', methods=['GET'])
+def stream_batch(batch_id):
+    """
+    Streamt den Fortschritt eines Batches, eine JSON-Zeile pro Statuswechsel
+    einer Domain und zum Schluss die Zusammenfassung
+    Als Server-Sent Events mit Accept: text/event-stream oder ?format=sse
+    """
+    secret = request.args.get('secret')
+
+    if secret != os.getenv("SECRET_KEY"):
+        return "Access Forbidden", 401
+
+    batch = load_batch(batch_id)
+    if not batch:
+        return jsonify({'error': 'Batch nicht gefunden', 'batch_id': batch_id}), 404
+
+    use_sse = (request.args.get('format') == 'sse'
+               or 'text/event-stream' in request.headers.get('Accept', ''))
+
+    def event(name, data):
+        if use_sse:
+            return f"event: {name}\ndata: {json.dumps(data)}\n\n"
+        return json.dumps({'event': name, **data}) + "\n"
+
+    def generate():
+        last_status = {}
+        while True:
+            summary = batch_summary(batch)
+            for entry in summary['domains']:
+                if last_status.get(entry['domain']) != entry['status']:
+                    last_status[entry['domain']] = entry['status']
+                    yield event('progress', {
+                        'domain': entry['domain'],
+                        'status': entry['status'],
+                        'duration': entry['duration'],
+                        'error': entry['error'],
+                        'counts': summary['counts']
+                    })
+            if summary['status'] == 'finished':
+                yield event('summary', summary)
+                return
+            time.sleep(BATCH_STREAM_INTERVAL)
+
+    headers = {
+        'Cache-Control': 'no-cache',
+        'X-Accel-Buffering': 'no'
+    }
+    mimetype = 'text/event-stream' if use_sse else 'application/x-ndjson'
+    return Response(stream_with_context(generate()), mimetype=mimetype, headers=headers)
+
+@app.route('/jobs/<job_id>', methods=['GET'])
+def get_job(job_id):
+    """
+    Gibt den Status eines Deploy-Jobs zurück (queued, running, success, failed)
+    inklusive der Laufzeiten der einzelnen Schritte
+    """
+    secret = request.args.get('secret')
+
+    if secret != os.getenv("SECRET_KEY"):
+        return "Access Forbidden", 401
+
+    job = load_job(job_id)
+    if not job:
+        return jsonify({
+            'error': f'Job {job_id} nicht gefunden',
+            'job_id': job_id
+        }), 404
+
+    job = dict(job)
+    job.pop('owner', None)
+    return jsonify(job), 200
+
+@app.route('/history/<domain>', methods=['GET'])
+def get_history(domain):
+    """
+    Gibt die Deploy-Historie einer Domain seitenweise zurück, neueste zuerst
+    Optional gefiltert mit ?status=success|failed
+    """
+    secret = request.args.get('secret')
+
+    if secret != os.getenv("SECRET_KEY"):
+        return "Access Forbidden", 401
+
+    if not is_valid_domain(domain):
+        return jsonify({
+            'error': 'Ungültige Domain',
+            'domain': domain
+        }), 400
+
+    page = max(1, request.args.get('page', 1, type=int))
+    per_page = min(max(1, request.args.get('per_page', HISTORY_CONFIG['page_size'], type=int)),
+                   HISTORY_CONFIG['max_page_size'])
+
+    try:
+        total, deploys = query_history(domain, page, per_page, request.args.get('status'))
+        return jsonify({
+            'domain': domain,
+            'page': page,
+            'per_page': per_page,
+            'total': total,
+            'pages': -(-total // per_page),
+            'deploys': deploys
+        }), 200
+
+    except Exception as e:
+        return jsonify({
+            'error': f'Fehler beim Abrufen der Historie: {str(e)}',
+            'domain': domain
+        }), 500
+
+@app.route('/trends', methods=['GET'])
+def get_trends():
+    """
+    Gibt Fehlerquote, Cache-Hits und Build-Dauern (Mittel, p50, p95) pro Domain
+    und Tag für die letzten ?days=N Tage zurück, optional nur für ?domain=
+    """
+    secret = request.args.get('secret')
+
+    if secret != os.getenv("SECRET_KEY"):
+        return "Access Forbidden", 401
+
+    days = max(1, request.args.get('days', HISTORY_CONFIG['trend_days'], type=int))
+    domain = request.args.get('domain')
+    if domain and not is_valid_domain(domain):
+        return jsonify({
+            'error': 'Ungültige Domain',
+            'domain': domain
+        }), 400
+
+    try:
+        return jsonify(history_trends(days, domain)), 200
+
+    except Exception as e:
+        return jsonify({
+            'error': f'Fehler beim Berechnen der Trends: {str(e)}'
+        }), 500
+
+@app.route('/rollback/<domain>/<deploy_id>', methods=['POST'])
+def rollback_release(domain, deploy_id):
+    """
+    Schaltet public auf ein früheres Release zurück (nur im Release-Modus)
+    """
+    secret = request.args.get('secret')
+
+    if secret != os.getenv("SECRET_KEY"):
+        return "Access Forbidden", 401
+
+    if not is_valid_domain(domain) or not is_valid_release_id(deploy_id):
+        return jsonify({
+            'error': 'Ungültige Domain oder Deploy-ID',
+            'domain': domain,
+            'deploy_id': deploy_id
+        }), 400
+
+    release_path = Path(PAGES_ROOT) / domain / "releases" / deploy_id
+    if not release_path.is_dir():
+        return jsonify({
+            'error': f'Release {deploy_id} nicht gefunden',
+            'domain': domain,
+            'deploy_id': deploy_id,
+            'releases': list_releases(domain)
+        }), 404
 
-# Konfiguration für den Compiler
-COMPILER_CONFIG = {
-    'image': 'hugomods/hugo:debian-ci-0.147.9',
-    'command': 'hugo --gc --minify --baseURL "https://{domain}/"',
-    'working_dir': '/repo',
-    'entrypoint': '/bin/sh'
-}
+    # Nicht gleichzeitig mit einem laufenden Deploy umschalten
+    build_lock = try_lock(domain_build_lock_path(domain))
+    if build_lock is None:
+        return jsonify({
+            'error': f'Für {domain} läuft gerade ein Deploy, bitte später erneut versuchen',
+            'domain': domain
+        }), 409
 
-PAGES_ROOT = "/statichosts/pages"
+    try:
+        previous = current_release(domain)
+        activate_release(domain, deploy_id)
 
-# Docker Client initialisieren
-try:
-    docker_client = docker.from_env()
-    logger.info("Docker Client erfolgreich initialisiert")
-except Exception as e:
-    logger.error(f"Fehler beim Initialisieren des Docker Clients: {e}")
-    docker_client = None
+        # Build-Cache auf den Stand des Releases setzen, sonst würde der
+        # nächste Deploy den zurückgerollten Stand als aktuell ansehen
+        build_state_path = data_path("domains", domain, "build.json")
+        meta = read_json(release_meta_path(domain, deploy_id), {})
+        if meta.get('key'):
+            write_json_atomic(build_state_path, {
+                'key': meta['key'],
+                'commit': meta.get('commit'),
+                'deploy_id': deploy_id,
+                'published': datetime.now().isoformat()
+            })
+        else:
+            build_state_path.unlink(missing_ok=True)
 
-def write_deploy_log(domain, deploy_id, step, output, error=None):
+        try:
+            write_cache_manifest(domain, deploy_id)
+        except Exception as e:
+            logger.warning(f"Cache-Manifest für {domain} nicht geschrieben: {e}")
+
+        rollback_id = new_deploy_id()
+        write_deploy_log(domain, rollback_id, "rollback",
+                        f"Rollback von Release {previous} auf {deploy_id}")
+
+        metadata = load_deploy_metadata(domain)
+        metadata['last_rollback'] = {
+            'rollback_id': rollback_id,
+            'previous_release': previous,
+            'current_release': deploy_id,
+            'timestamp': datetime.now().isoformat()
+        }
+        write_json_atomic(deploy_metadata_path(domain), metadata)
+        logger.info(f"Rollback für {domain}: {previous} -> {deploy_id}")
+
+        return jsonify({
+            'success': True,
+            'message': f'Rollback für {domain} auf Release {deploy_id} erfolgreich',
+            'domain': domain,
+            'previous_release': previous,
+            'current_release': deploy_id,
+            'rollback_id': rollback_id
+        }), 200
+
+    except Exception as e:
+        logger.error(f"Fehler beim Rollback für {domain}: {e}")
+        return jsonify({
+            'error': f'Rollback Fehler: {str(e)}',
+            'domain': domain,
+            'deploy_id': deploy_id
+        }), 500
+    finally:
+        release_lock(build_lock)
+
+@app.route('/caches', methods=['GET'])
+def get_caches():
     """
-    Schreibt Deploy-Logs in eine Datei
+    Gibt Größe und letzte Nutzung der Hugo Caches zurück
     """
+    secret = request.args.get('secret')
+
+    if secret != os.getenv("SECRET_KEY"):
+        return "Access Forbidden", 401
+
     try:
-        # Log-Verzeichnis erstellen
-        log_dir = Path(PAGES_ROOT) / domain / "logs"
-        log_dir.mkdir(parents=True, exist_ok=True)
-        
-        # Log-Datei für diesen Deploy-Vorgang
-        log_file = log_dir / f"deploy_{deploy_id}.log"
-        
-        timestamp = datetime.now().strftime("%Y-%m-%d %H:%M:%S")
-        
-        with open(log_file, 'a', encoding='utf-8') as f:
-            f.write(f"\n=== {step.upper()} - {timestamp} ===\n")
-            if output:
-                f.write(f"STDOUT:\n{output}\n")
-            if error:
-                f.write(f"STDERR:\n{error}\n")
-            f.write("=" * 50 + "\n")
-            
+        domain_caches = []
+        for meta_file in sorted(data_path("cache", "hugo").glob("*.json")):
+            meta = read_json(meta_file)
+            if meta:
+                domain_caches.append(meta)
+        modules = read_json(data_path("cache", "modules.json"), {})
+
+        return jsonify({
+            'enabled': HUGO_CACHE_CONFIG['enabled'],
+            'hugo': {
+                'size': sum(meta.get('size', 0) for meta in domain_caches),
+                'limit': HUGO_CACHE_CONFIG['max_mb'] * 1024 * 1024,
+                'domains': domain_caches
+            },
+            'modules': {
+                'size': modules.get('size', 0),
+                'limit': HUGO_CACHE_CONFIG['modules_max_mb'] * 1024 * 1024,
+                'last_used': modules.get('last_used')
+            }
+        }), 200
+
     except Exception as e:
-        logger.error(f"Fehler beim Schreiben des Deploy-Logs: {e}")
+        return jsonify({
+            'error': f'Fehler beim Abrufen der Caches: {str(e)}'
+        }), 500
 
-@app.route('/deploy/<domain>', methods=['POST'])
-def deploy_static_site(domain):
+@app.route('/caches/<name>', methods=['DELETE'])
+def purge_cache(name):
     """
-    Deployed eine statische Website für die angegebene Domain
+    Leert einen Cache: "modules" für den Modul-Cache, sonst der Hugo Cache der Domain
     """
-    # Eindeutige Deploy-ID generieren
-    deploy_id = datetime.now().strftime("%Y%m%d_%H%M%S")
     secret = request.args.get('secret')
 
     if secret != os.getenv("SECRET_KEY"):
         return "Access Forbidden", 401
 
+    if name == 'modules':
+        lock_path = module_cache_lock_path()
+        cache_path = module_cache_path()
+        meta_path = data_path("cache", "modules.json")
+    elif is_valid_domain(name):
+        lock_path = domain_build_lock_path(name)
+        cache_path = hugo_cache_path(name)
+        meta_path = hugo_cache_meta_path(name)
+    else:
+        return jsonify({
+            'error': 'Ungültiger Cache Name',
+            'cache': name
+        }), 400
+
+    lock_file = try_lock(lock_path)
+    if lock_file is None:
+        return jsonify({
+            'error': f'Cache {name} wird gerade von einem Build verwendet, bitte später erneut versuchen',
+            'cache': name
+        }), 409
+
     try:
-        # Validierung der Domain (einfache Überprüfung)
-        if not domain or not domain.replace('.', '').replace('-', '').isalnum():
-            return jsonify({
-                'error': 'Ungültige Domain',
-                'domain': domain
-            }), 400
-        
-        # Pfade definieren
-        base_path = Path(PAGES_ROOT)
-        domain_path = base_path / domain
-        repo_path = domain_path / "repository"
-        public_source = repo_path / "public"
-        public_dest = domain_path / "public"
-        
-        logger.info(f"Deployment für Domain: {domain} (Deploy-ID: {deploy_id})")
-        logger.info(f"Repository Pfad: {repo_path}")
-        
-        # Deploy-Start in Log schreiben
-        write_deploy_log(domain, deploy_id, "deploy_start", 
-                        f"Deploy gestartet für Domain: {domain}\nDeploy-ID: {deploy_id}\nRepository: {repo_path}")
-        
-        # Überprüfen ob Docker Client verfügbar ist
-        if not docker_client:
-            write_deploy_log(domain, deploy_id, "error", "Docker Client nicht verfügbar")
-            return jsonify({
-                'error': 'Docker Client nicht verfügbar'
-            }), 500
-        
-        # Verzeichnisse erstellen falls sie nicht existieren
-        repo_path.mkdir(parents=True, exist_ok=True)
+        size = dir_size(cache_path)
+        remove_tree(cache_path)
+        meta_path.unlink(missing_ok=True)
+        logger.info(f"Cache {name} geleert ({size} Bytes)")
+        return jsonify({
+            'success': True,
+            'message': f'Cache {name} geleert',
+            'cache': name,
+            'freed_bytes': size
+        }), 200
+    except Exception as e:
+        return jsonify({
+            'error': f'Fehler beim Leeren des Caches: {str(e)}',
+            'cache': name
+        }), 500
+    finally:
+        release_lock(lock_file)
+
+@app.route('/asset-store/gc', methods=['POST'])
+def collect_asset_store():
+    """
+    Entfernt Objekte des Asset-Stores, die kein Release mehr nutzt
+    """
+    secret = request.args.get('secret')
+
+    if secret != os.getenv("SECRET_KEY"):
+        return "Access Forbidden", 401
+
+    try:
+        result = gc_asset_store()
+        result.pop('updated_ts', None)
+        return jsonify({
+            'success': True,
+            **result
+        }), 200
 
-        # Schritt 1: Docker Container für Git Pull ausführen
-        try:
-            # Alpine Linux mit Git verwenden
-            container = docker_client.containers.run(
-                image='alpine/git:latest',
-                command='pull origin release',
-                volumes={
-                    str(repo_path): {
-                        'bind': '/repo',
-                        'mode': 'rw'
-                    }
-                },
-                user='1000', 
-                working_dir="/repo",
-                remove=True,  # Container nach Ausführung entfernen
-                detach=False,  # Warten bis Container fertig ist
-                stdout=True,
-                stderr=True
-            )
-            
-            # Container Output dekodieren
-            output = container.decode('utf-8') if container else ""
-            write_deploy_log(domain, deploy_id, "git_pull", output)
-            
-            logger.info(f"Git pull erfolgreich für {domain}")
-            
-        except docker.errors.ContainerError as e:
-            error_msg = str(e)
-            write_deploy_log(domain, deploy_id, "git_pull_warning", 
-                           f"Git pull fehlgeschlagen (möglicherweise kein Git Repository)", error_msg)
-            logger.warning(f"Git pull fehlgeschlagen (möglicherweise kein Git Repository): {e}")
-            # Weitermachen, falls es kein Git Repository ist
-        except Exception as e:
-            error_msg = str(e)
-            write_deploy_log(domain, deploy_id, "git_pull_error", "", error_msg)
-            logger.error(f"Docker Container Fehler: {e}")
-            return jsonify({
-                'error': f'Docker Container Fehler: {str(e)}',
-                'domain': domain,
-                'deploy_id': deploy_id
-            }), 500
-        
-        # Schritt 2: Hugo Compiler ausführen
-        try:
-            # Befehl für die spezifische Domain anpassen
-            hugo_command = COMPILER_CONFIG['command'].format(domain=domain)
-            
-            compiler_container = docker_client.containers.run(
-                image=COMPILER_CONFIG['image'],
-                command=['-c', hugo_command],
-                volumes={
-                    str(repo_path): {
-                        'bind': '/repo',
-                        'mode': 'rw'
-                    }
-                },
-                working_dir=COMPILER_CONFIG['working_dir'],
-                entrypoint=COMPILER_CONFIG['entrypoint'],
-                user='1000', 
-                remove=True,
-                detach=False,
-                stdout=True,
-                stderr=True
-            )
-            
-            # Container Output dekodieren
-            output = compiler_container.decode('utf-8') if compiler_container else ""
-            write_deploy_log(domain, deploy_id, "hugo_compile", output)
-            
-            logger.info(f"Hugo Compiler erfolgreich ausgeführt für {domain}")
-            
-        except docker.errors.ContainerError as e:
-            error_msg = str(e)
-            write_deploy_log(domain, deploy_id, "hugo_compile_error", "", error_msg)
-            logger.error(f"Hugo Compiler fehlgeschlagen: {e}")
-            return jsonify({
-                'error': f'Hugo Compiler Fehler: {str(e)}',
-                'domain': domain,
-                'deploy_id': deploy_id
-            }), 500
-        except Exception as e:
-            error_msg = str(e)
-            write_deploy_log(domain, deploy_id, "hugo_compile_error", "", error_msg)
-            logger.error(f"Unerwarteter Compiler Fehler: {e}")
-            return jsonify({
-                'error': f'Compiler Fehler: {str(e)}',
-                'domain': domain,
-                'deploy_id': deploy_id
-            }), 500
-        
-        # Schritt 3: Public Verzeichnis mit rsync synchronisieren
-        if public_source.exists():
-            # Zielverzeichnis erstellen falls es nicht existiert
-            public_dest.mkdir(parents=True, exist_ok=True)
-            
-            try:
-                # rsync Container für Dateiübertragung
-                rsync_container = docker_client.containers.run(
-                    image='secoresearch/rsync:latest',
-                    command='rsync -a --delete /source/ /destination/',
-                    volumes={
-                        str(public_source): {
-                            'bind': '/source',
-                            'mode': 'ro'
-                        },
-                        str(public_dest): {
-                            'bind': '/destination',
-                            'mode': 'rw'
-                        }
-                    },
-                    user='1000', 
-                    remove=True,
-                    detach=False,
-                    stdout=True,
-                    stderr=True
-                )
-                
-                # Container Output dekodieren
-                output = rsync_container.decode('utf-8') if rsync_container else ""
-                write_deploy_log(domain, deploy_id, "rsync", output)
-                
-                logger.info(f"Rsync erfolgreich: {public_source} -> {public_dest}")
-                
-                # Deploy erfolgreich abgeschlossen
-                write_deploy_log(domain, deploy_id, "deploy_success", 
-                               f"Deploy erfolgreich abgeschlossen\nPublic Path: {public_dest}")
-                
-                return jsonify({
-                    'success': True,
-                    'message': f'Deployment für {domain} erfolgreich (Git Pull + Hugo Compiler + Rsync)',
-                    'domain': domain,
-                    'deploy_id': deploy_id,
-                    'repository_path': str(repo_path),
-                    'public_path': str(public_dest),
-                    'steps_completed': ['git_pull', 'hugo_compile', 'rsync'],
-                    'compiler_image': COMPILER_CONFIG['image']
-                }), 200
-                
-            except docker.errors.ContainerError as e:
-                error_msg = str(e)
-                write_deploy_log(domain, deploy_id, "rsync_error", "", error_msg)
-                logger.error(f"Rsync Container Fehler: {e}")
-                return jsonify({
-                    'error': f'Rsync Fehler: {str(e)}',
-                    'domain': domain,
-                    'deploy_id': deploy_id
-                }), 500
-            except Exception as e:
-                error_msg = str(e)
-                write_deploy_log(domain, deploy_id, "rsync_error", "", error_msg)
-                logger.error(f"Unerwarteter Rsync Fehler: {e}")
-                return jsonify({
-                    'error': f'Rsync Fehler: {str(e)}',
-                    'domain': domain,
-                    'deploy_id': deploy_id
-                }), 500
-        else:
-            error_msg = f"Public Verzeichnis nicht gefunden nach Hugo Compiler: {public_source}"
-            write_deploy_log(domain, deploy_id, "deploy_error", "", error_msg)
-            logger.warning(error_msg)
-            return jsonify({
-                'error': error_msg,
-                'domain': domain,
-                'deploy_id': deploy_id,
-                'hint': 'Möglicherweise ist der Hugo Build fehlgeschlagen oder das Ausgabeverzeichnis ist anders konfiguriert'
-            }), 404
-            
     except Exception as e:
-        error_msg = str(e)
-        write_deploy_log(domain, deploy_id, "deploy_error", "", error_msg)
-        logger.error(f"Unerwarteter Fehler beim Deployment: {e}")
         return jsonify({
-            'error': f'Unerwarteter Fehler: {str(e)}',
-            'domain': domain,
-            'deploy_id': deploy_id
+            'error': f'Fehler bei der Garbage Collection: {str(e)}'
         }), 500
 
 @app.route('/logs/<domain>', methods=['GET'])
 def get_deploy_logs(domain):
     """
-    Gibt die Deploy-Logs für eine Domain zurück
+    Gibt den neuesten Deploy-Log für eine Domain zurück
+    Unterstützt HTTP Range und ?tail=N
     """
     secret = request.args.get('secret')
 
@@ -287,46 +4454,23 @@ def get_deploy_logs(domain):
         return "Access Forbidden", 401
 
     try:
-        log_dir = Path(PAGES_ROOT) / domain / "logs"
-        
-        if not log_dir.exists():
+        # Neuester Log aus dem Log-Index, ohne Verzeichnis-Scan
+        entries = load_log_index(domain)['entries']
+
+        if not entries:
             return jsonify({
                 'error': f'Keine Logs für Domain {domain} gefunden',
                 'domain': domain
             }), 404
-        
-        # Alle Log-Dateien auflisten
-        log_files = []
-        for log_file in log_dir.glob("deploy_*.log"):
-            try:
-                stat = log_file.stat()
-                log_files.append({
-                    'filename': log_file.name,
-                    'deploy_id': log_file.stem.replace('deploy_', ''),
-                    'size': stat.st_size,
-                    'created': datetime.fromtimestamp(stat.st_ctime).isoformat(),
-                    'modified': datetime.fromtimestamp(stat.st_mtime).isoformat()
-                })
-            except Exception as e:
-                logger.error(f"Fehler beim Lesen der Log-Datei {log_file}: {e}") 
-        
-        # Nach Erstellungsdatum sortieren (neueste zuerst)
-        latest_log = max(log_files, key=lambda x: x['created'])
-        
-        deploy_id = latest_log["deploy_id"]
 
-        log_file = Path(PAGES_ROOT) / domain / "logs" / f"deploy_{deploy_id}.log"
-        
-        if not log_file.exists():
+        deploy_id = entries[-1]['deploy_id']
+        log_file = find_deploy_log(domain, deploy_id)
+
+        if not log_file:
             return f"Log-Datei für Deploy-ID {deploy_id} nicht gefunden", 404
-        
-        # Log-Inhalt lesen und als Plain Text zurückgeben
-        with open(log_file, 'r', encoding='utf-8') as f:
-            content = f.read()
-        
-        return content, 200, {'Content-Type': 'text/plain; charset=utf-8'}
 
-        
+        return serve_deploy_log(log_file)
+
     except Exception as e:
         return jsonify({
             'error': f'Fehler beim Abrufen der Logs: {str(e)}',
@@ -337,6 +4481,7 @@ def get_deploy_logs(domain):
 def get_deploy_log_raw(domain, deploy_id):
     """
     Gibt den rohen Inhalt einer Deploy-Log-Datei zurück (als Plain Text)
+    Komprimierte Logs werden transparent entpackt, unterstützt HTTP Range und ?tail=N
     """
     secret = request.args.get('secret')
 
@@ -344,94 +4489,251 @@ def get_deploy_log_raw(domain, deploy_id):
         return "Access Forbidden", 401
 
     try:
-        log_file = Path(PAGES_ROOT) / domain / "logs" / f"deploy_{deploy_id}.log"
+        log_file = find_deploy_log(domain, deploy_id)
         
-        if not log_file.exists():
+        if not log_file:
             return f"Log-Datei für Deploy-ID {deploy_id} nicht gefunden", 404
         
-        # Log-Inhalt lesen und als Plain Text zurückgeben
-        with open(log_file, 'r', encoding='utf-8') as f:
-            content = f.read()
-        
-        return content, 200, {'Content-Type': 'text/plain; charset=utf-8'}
+        return serve_deploy_log(log_file)
         
     except Exception as e:
         return f"Fehler beim Lesen der Log-Datei: {str(e)}", 500
 
+LOG_STREAM_CONFIG = {
+    'poll_interval': 0.5,
+    'chunk_size': 64 * 1024,
+    # Stream beenden, wenn so lange weder neue Ausgabe kommt noch der Deploy läuft
+    'idle_timeout': 1800
+}
+
+@app.route('/logs/<domain>/<deploy_id>/stream', methods=['GET'])
+def stream_deploy_log(domain, deploy_id):
+    """
+    Streamt den Deploy-Log, solange der Deploy wartet oder läuft
+    Als Server-Sent Events mit Accept: text/event-stream oder ?format=sse,
+    sonst als chunked Plain Text
+    """
+    secret = request.args.get('secret')
+
+    if secret != os.getenv("SECRET_KEY"):
+        return "Access Forbidden", 401
+
+    if not is_valid_domain(domain) or not is_valid_release_id(deploy_id):
+        return "Ungültige Domain oder Deploy-ID", 400
+
+    log_file = deploy_log_path(domain, deploy_id)
+    if not log_file.exists() and not deploy_in_progress(domain, deploy_id):
+        # Abgeschlossene, bereits komprimierte Logs direkt ausliefern
+        archived_log = find_deploy_log(domain, deploy_id)
+        if archived_log:
+            return serve_deploy_log(archived_log)
+        return f"Log-Datei für Deploy-ID {deploy_id} nicht gefunden", 404
+
+    use_sse = (request.args.get('format') == 'sse'
+               or 'text/event-stream' in request.headers.get('Accept', ''))
+
+    def generate():
+        position = 0
+        pending = ''
+        idle_since = time.monotonic()
+        while True:
+            data = ''
+            if log_file.exists():
+                with open(log_file, 'r', encoding='utf-8', errors='replace') as f:
+                    f.seek(position)
+                    data = f.read(LOG_STREAM_CONFIG['chunk_size'])
+                    position = f.tell()
+            if data:
+                idle_since = time.monotonic()
+                if use_sse:
+                    # SSE überträgt nur vollständige Zeilen
+                    pending += data
+                    lines = pending.split('\n')
+                    pending = lines.pop()
+                    yield ''.join(f"data: {line}\n\n" for line in lines)
+                else:
+                    yield data
+                continue
+
+            if not deploy_in_progress(domain, deploy_id):
+                break
+            if time.monotonic() - idle_since > LOG_STREAM_CONFIG['idle_timeout']:
+                break
+            time.sleep(LOG_STREAM_CONFIG['poll_interval'])
+
+        if use_sse:
+            if pending:
+                yield f"data: {pending}\n\n"
+            yield "event: end\ndata: \n\n"
+
+    headers = {
+        'Cache-Control': 'no-cache',
+        # Proxy-Puffer deaktivieren, damit Zeilen sofort ankommen
+        'X-Accel-Buffering': 'no'
+    }
+    mimetype = 'text/event-stream' if use_sse else 'text/plain'
+    return Response(stream_with_context(generate()), mimetype=mimetype, headers=headers)
+
+# Status-Cache pro Worker (LRU): wird verworfen, sobald sich Deploy-Metadaten,
+# Log-Index, Releases oder der veröffentlichte Stand der Domain ändern
+# (Deploy, Rollback oder Bereinigung in irgendeinem Worker)
+STATUS_CACHE = OrderedDict()
+STATUS_CACHE_MAX_AGE = 300
+STATUS_CACHE_MAX_ENTRIES = 1000
+
+def _metadata_generation(domain):
+    domain_path = Path(PAGES_ROOT) / domain
+    generation = []
+    for path in (deploy_metadata_path(domain), log_index_path(domain), domain_path / "releases",
+                 domain_path / "public", data_path("domains", domain, "publish.json")):
+        try:
+            # lstat: ein Rollback ersetzt nur den public Symlink
+            generation.append(os.lstat(path).st_mtime_ns)
+        except OSError:
+            generation.append(None)
+    return tuple(generation)
+
+def build_status(domain):
+    """
+    Stellt den Status einer Domain zusammen (Dateisystem-Zugriffe, nur bei Cache-Fehlgriff)
+    """
+    base_path = Path(PAGES_ROOT)
+    domain_path = base_path / domain
+    repo_path = domain_path / "repository"
+    public_path = domain_path / "public"
+    log_path = domain_path / "logs"
+
+    status = {
+        'domain': domain,
+        'repository_exists': repo_path.exists(),
+        'public_exists': public_path.exists(),
+        'logs_exists': log_path.exists(),
+        'repository_path': str(repo_path),
+        'public_path': str(public_path),
+        'logs_path': str(log_path),
+        'compiler_config': COMPILER_CONFIG,
+        'publish_mode': PUBLISH_CONFIG['mode'],
+        'current_release': current_release(domain),
+        'releases': list_releases(domain)
+    }
+
+    # Manifest des veröffentlichten Stands (vollständig nur mit ?manifest=1)
+    release_id = published_id(domain)
+    if release_id:
+        meta = read_json(release_meta_path(domain, release_id), {})
+        status['manifest'] = {
+            'deploy_id': release_id,
+            'publish_stats': meta.get('publish_stats')
+        }
+
+    if ASSET_STORE_CONFIG['enabled']:
+        # Einsparung im ganzen Store (Stand der letzten Zählung) und Anteil dieser Domain
+        status['asset_store'] = asset_store_status()
+        store_stats = ((status.get('manifest') or {}).get('publish_stats') or {}).get('store') or {}
+        status['asset_store']['domain'] = {
+            'files': store_stats.get('files', 0),
+            'shared_files': store_stats.get('shared_files', 0),
+            'shared_bytes': store_stats.get('shared_bytes', 0)
+        }
+
+    log_entries = load_log_index(domain)['entries']
+    status['log_count'] = len(log_entries)
+
+    metadata = read_json(deploy_metadata_path(domain))
+    if metadata:
+        # Aus den Deploy-Metadaten, ohne Container und ohne Log-Scan
+        last_deploy = metadata.get('last_deploy') or {}
+        last_success = metadata.get('last_success') or {}
+        status['deploy_count'] = metadata.get('deploy_count', 0)
+        if last_deploy:
+            status['latest_deploy'] = {
+                'deploy_id': last_deploy['deploy_id'],
+                'timestamp': last_deploy['finished'],
+                'status': last_deploy['status'],
+                'duration': last_deploy['duration'],
+                'steps': last_deploy['steps'],
+                'cache_hit': last_deploy.get('cache_hit', False),
+                'skipped': last_deploy.get('skipped', False)
+            }
+        if last_success:
+            status['last_success'] = {
+                'deploy_id': last_success['deploy_id'],
+                'timestamp': last_success['finished']
+            }
+            if last_success.get('commit'):
+                status['last_commit'] = last_success['commit']
+        if metadata.get('last_rollback'):
+            status['last_rollback'] = metadata['last_rollback']
+    else:
+        # Domain wurde noch nicht mit Metadaten deployed: aus der Historie (Backfill
+        # der Logs), sonst neuesten Log aus dem Index
+        try:
+            total, latest = query_history(domain, per_page=1)
+        except sqlite3.Error:
+            total, latest = 0, []
+        if latest:
+            status['deploy_count'] = total
+            status['latest_deploy'] = {
+                'deploy_id': latest[0]['deploy_id'],
+                'timestamp': latest[0]['finished'],
+                'status': latest[0]['status'],
+                'duration': latest[0]['duration'],
+                'steps': latest[0]['steps'],
+                'cache_hit': latest[0]['cache_hit'],
+                'skipped': latest[0]['skipped']
+            }
+        elif log_entries:
+            status['latest_deploy'] = {
+                'deploy_id': log_entries[-1]['deploy_id'],
+                'timestamp': log_entries[-1]['created']
+            }
+        commit = read_git_head(repo_path)
+        if commit:
+            status['last_commit'] = {'hash': commit}
+
+    return status
+
 @app.route('/status/<domain>', methods=['GET'])
 def get_status(domain):
     """
     Gibt den Status einer Domain zurück
+    Antwortet aus dem Status-Cache, solange sich die Deploy-Metadaten nicht ändern
     """
     secret = request.args.get('secret')
 
     if secret != os.getenv("SECRET_KEY"):
         return "Access Forbidden", 401
 
+    if not is_valid_domain(domain):
+        return jsonify({
+            'error': 'Ungültige Domain',
+            'domain': domain
+        }), 400
+
     try:
-        base_path = Path(PAGES_ROOT)
-        domain_path = base_path / domain
-        repo_path = domain_path / "repository"
-        public_path = domain_path / "public"
-        log_path = domain_path / "logs"
-        
-        status = {
-            'domain': domain,
-            'repository_exists': repo_path.exists(),
-            'public_exists': public_path.exists(),
-            'logs_exists': log_path.exists(),
-            'repository_path': str(repo_path),
-            'public_path': str(public_path),
-            'logs_path': str(log_path),
-            'compiler_config': COMPILER_CONFIG
-        }
-        
-        # Log-Statistiken hinzufügen
-        if log_path.exists():
-            log_files = list(log_path.glob("deploy_*.log"))
-            status['log_count'] = len(log_files)
-            if log_files:
-                # Neueste Log-Datei finden
-                latest_log = max(log_files, key=lambda x: x.stat().st_mtime)
-                status['latest_deploy'] = {
-                    'deploy_id': latest_log.stem.replace('deploy_', ''),
-                    'timestamp': datetime.fromtimestamp(latest_log.stat().st_mtime).isoformat()
-                }
+        generation = _metadata_generation(domain)
+        cached = STATUS_CACHE.get(domain)
+        if (cached and cached['generation'] == generation
+                and time.monotonic() - cached['built_at'] < STATUS_CACHE_MAX_AGE):
+            STATUS_CACHE.move_to_end(domain)
+            status = cached['status']
         else:
-            status['log_count'] = 0
-        
-        if repo_path.exists():
-            # Git Repository Info hinzufügen
-            try:
-                container = docker_client.containers.run(
-                    image='alpine/git:latest',
-                    command='log -1 --pretty=format:"%H,%an,%ad" --date=iso',
-                    volumes={
-                        str(repo_path): {
-                            'bind': '/repo',
-                            'mode': 'ro'
-                        }
-                    },
-                    working_dir="/repo",
-                    user='1000',
-                    remove=True,
-                    detach=False,
-                    stdout=True,
-                    stderr=True
-                )
-                
-                if container:
-                    commit_info = container.decode('utf-8').strip().split(',')
-                    if len(commit_info) >= 3:
-                        status['last_commit'] = {
-                            'hash': commit_info[0],
-                            'author': commit_info[1],
-                            'date': commit_info[2]
-                        }
-            except Exception as e:
-                print(e)
-                pass  # Falls Git Infos nicht verfügbar sind
-        
+            status = build_status(domain)
+            STATUS_CACHE[domain] = {
+                'generation': generation,
+                'built_at': time.monotonic(),
+                'status': status
+            }
+            STATUS_CACHE.move_to_end(domain)
+            while len(STATUS_CACHE) > STATUS_CACHE_MAX_ENTRIES:
+                STATUS_CACHE.popitem(last=False)
+
+        if request.args.get('manifest') in ('1', 'true', 'yes') and status.get('manifest'):
+            status = dict(status)
+            status['manifest'] = dict(status['manifest'])
+            status['manifest']['files'] = read_json(
+                manifest_path(domain, status['manifest']['deploy_id']), {}).get('files')
+
         return jsonify(status), 200
         
     except Exception as e:
@@ -447,58 +4749,144 @@ def caddy_domain_check():
     Überprüft ob eine Domain/Subdomain existiert
     Entfernt www. Präfix falls vorhanden
     Domain wird als ?domain= Parameter übergeben
+    Antwortet aus dem Domain-Index im Speicher, Logs sind pro Intervall begrenzt
     """
+    domain = None
+    start = time.monotonic()
+    result = 'error'
     try:
         # Domain aus Query Parameter extrahieren
         domain = request.args.get('domain')
         
         if not domain:
-            logger.warning("Caddy Check: Keine Domain im Query Parameter")
+            result = 'invalid'
+            log_rate_limited('caddy_check_missing', logging.WARNING,
+                             "Caddy Check: Keine Domain im Query Parameter",
+                             DOMAIN_INDEX_CONFIG['log_interval'])
             return "", 400
         
         # www. Präfix entfernen falls vorhanden
         clean_domain = domain
         if domain.startswith('www.'):
             clean_domain = domain[4:]
-            logger.info(f"Entferne www. Präfix: {domain} -> {clean_domain}")
-        
-        # Pfad zur Domain überprüfen
-        base_path = Path(PAGES_ROOT)
-        domain_path = base_path / clean_domain
-        public_path = domain_path / "public"
         
-        logger.info(f"Caddy Check für Domain: {domain} (clean: {clean_domain})")
-        logger.info(f"Überprüfe Pfad: {public_path}")
-        
-        # Überprüfen ob das public Verzeichnis existiert
-        if public_path.exists() and public_path.is_dir():
-            logger.info(f"Domain {domain} gefunden - Caddy TLS erlaubt")
+        if domain_is_published(clean_domain):
+            result = 'hit'
+            logger.debug(f"Domain {domain} gefunden - Caddy TLS erlaubt")
             return "ok", 200
         else:
-            logger.info(f"Domain {domain} nicht gefunden - Caddy TLS verweigert")
+            result = 'miss'
+            log_rate_limited('caddy_check_denied', logging.INFO,
+                             f"Domain {domain} nicht gefunden - Caddy TLS verweigert",
+                             DOMAIN_INDEX_CONFIG['log_interval'])
             return "", 404
             
     except Exception as e:
-        logger.error(f"Fehler beim Caddy Domain Check für {domain}: {e}")
+        log_rate_limited('caddy_check_error', logging.ERROR,
+                         f"Fehler beim Caddy Domain Check für {domain}: {e}",
+                         DOMAIN_INDEX_CONFIG['log_interval'])
         return "", 404
+    finally:
+        CADDY_CHECKS_TOTAL.labels(result).inc()
+        CADDY_CHECK_DURATION.observe(time.monotonic() - start)
+
+# Ergebnis des letzten Docker Pings pro Worker
+DOCKER_PING_CACHE = {'checked': None, 'status': None}
+
+def docker_ping_status():
+    """
+    Docker Ping mit Cache, /health fragt den Daemon höchstens alle HEALTH_PING_TTL Sekunden an
+    """
+    now = time.monotonic()
+    checked = DOCKER_PING_CACHE['checked']
+    if checked is None or now - checked > IMAGE_CONFIG['ping_ttl']:
+        try:
+            with docker_api('ping'):
+                docker_client.ping()
+            DOCKER_PING_CACHE['status'] = "OK"
+        except Exception:
+            DOCKER_PING_CACHE['status'] = "ERROR"
+        DOCKER_PING_CACHE['checked'] = checked = now
+    return DOCKER_PING_CACHE['status'], round(now - checked, 1)
 
 @app.route('/health', methods=['GET'])
 def health_check():
     """
     Gesundheitscheck der Anwendung
+    Antwortet mit 503, bis alle Step-Images lokal vorhanden und festgeschrieben sind
     """
-    try:
-        # Docker Client testen
-        docker_client.ping()
-        docker_status = "OK"
-    except:
-        docker_status = "ERROR"
-    
+    # Startet bei Bedarf Image-Vorbereitung und Worker in diesem Prozess
+    ensure_job_workers()
+    docker_status, docker_age = docker_ping_status()
+    ready = images_ready()
+    images = load_image_state().get('images') or {}
+
     return jsonify({
-        'status': 'OK',
+        'status': 'OK' if ready else 'STARTING',
+        'ready': ready,
         'docker': docker_status,
+        'docker_checked_seconds_ago': docker_age,
+        'images': {
+            image: {
+                'status': (images.get(image) or {}).get('status', 'pending'),
+                'ref': (images.get(image) or {}).get('ref'),
+                'error': (images.get(image) or {}).get('error')
+            }
+            for image in step_images()
+        },
         'compiler_config': COMPILER_CONFIG
-    }), 200
+    }), 200 if ready else 503
+
+class DeployStateCollector:
+    """
+    Liefert Queue-Tiefe und laufende Builds beim Abruf von /metrics
+    Gelesen werden die pending.json und running.json Marker aller Domains,
+    die für alle Gunicorn Worker gemeinsam gelten
+    """
+    def collect(self):
+        queued = GaugeMetricFamily('deployer_queue_depth',
+                                   'Eingereihte, noch nicht gestartete Deploys', labels=['domain'])
+        running = GaugeMetricFamily('deployer_active_builds',
+                                    'Laufende Deploys', labels=['domain'])
+        total_queued = 0
+        total_running = 0
+        domains_dir = data_path("domains")
+        if domains_dir.exists():
+            for domain_dir in sorted(domains_dir.iterdir()):
+                for marker, status, family in (('pending.json', 'queued', queued),
+                                               ('running.json', 'running', running)):
+                    job = load_job(read_json(domain_dir / marker, {}).get('job_id'))
+                    if job and job['status'] == status:
+                        family.add_metric([domain_dir.name], 1)
+                        if status == 'queued':
+                            total_queued += 1
+                        else:
+                            total_running += 1
+        yield queued
+        yield running
+        yield GaugeMetricFamily('deployer_queue_depth_total', 'Eingereihte Deploys gesamt', value=total_queued)
+        yield GaugeMetricFamily('deployer_active_builds_total', 'Laufende Deploys gesamt', value=total_running)
+        yield GaugeMetricFamily('deployer_deploy_slots', 'Maximale Anzahl gleichzeitiger Deploys',
+                                value=deploy_slot_count())
+
+if os.getenv('PROMETHEUS_MULTIPROC_DIR'):
+    METRICS_REGISTRY = CollectorRegistry()
+    multiprocess.MultiProcessCollector(METRICS_REGISTRY)
+else:
+    METRICS_REGISTRY = REGISTRY
+METRICS_REGISTRY.register(DeployStateCollector())
+
+@app.route('/metrics', methods=['GET'])
+def metrics():
+    """
+    Prometheus Metriken aller Gunicorn Worker
+    """
+    secret = request.args.get('secret')
+
+    if secret != os.getenv("SECRET_KEY"):
+        return "Access Forbidden", 401
+
+    return Response(generate_latest(METRICS_REGISTRY), mimetype=CONTENT_TYPE_LATEST)
 
 @app.errorhandler(404)
 def not_found(error):
@@ -509,6 +4897,13 @@ def internal_error(error):
     return jsonify({'error': 'Interner Server Fehler'}), 500
 
 if __name__ == '__main__':
+    # python app.py gc: Garbage Collection des Asset-Stores (z.B. per Cron)
+    if sys.argv[1:2] == ['gc']:
+        result = gc_asset_store()
+        result.pop('updated_ts', None)
+        print(json.dumps(result, indent=2))
+        sys.exit(0)
+
     # Überprüfen ob /statichost Verzeichnis existiert
     statichost_path = Path(PAGES_ROOT)
     if not statichost_path.exists():
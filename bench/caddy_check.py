@@ -0,0 +1,86 @@
+"""
+Benchmark für /caddy-check
+
+Misst Checks pro Sekunde mit und ohne Domain-Index gegen ein temporäres
+PAGES_ROOT mit synthetischen Domains, einmal über den Flask Endpunkt und
+einmal nur die Domain-Prüfung. Die Hälfte der Anfragen nutzt bekannte
+Domains, die andere Hälfte zufällige Namen wie bei einem Scan.
+
+Aufruf:
+    python bench/caddy_check.py --domains 400 --requests 20000
+"""
+import argparse
+import json
+import logging
+import random
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+import app as deployer
+
+
+def seed_pages_root(root, count):
+    domains = [f"site{i}.example.com" for i in range(count)]
+    for domain in domains:
+        (Path(root) / domain / "public").mkdir(parents=True)
+    return domains
+
+
+def run_endpoint(client, names):
+    start = time.perf_counter()
+    for name in names:
+        client.get('/caddy-check', query_string={'domain': name})
+    return len(names) / (time.perf_counter() - start)
+
+
+def run_lookup(names):
+    start = time.perf_counter()
+    for name in names:
+        deployer.domain_is_published(name)
+    return len(names) / (time.perf_counter() - start)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--domains', type=int, default=400)
+    parser.add_argument('--requests', type=int, default=20000)
+    parser.add_argument('--unknown', type=int, default=500,
+                        help='Anzahl verschiedener unbekannter Namen')
+    args = parser.parse_args()
+
+    # Log-Ausgabe nicht mitmessen
+    logging.getLogger().setLevel(logging.WARNING)
+    deployer.logger.setLevel(logging.WARNING)
+
+    with tempfile.TemporaryDirectory() as root:
+        deployer.PAGES_ROOT = root
+        domains = seed_pages_root(root, args.domains)
+        unknown = [f"scan{i}.invalid-host.net" for i in range(args.unknown)]
+        rng = random.Random(1)
+        names = [rng.choice(domains) if i % 2 else rng.choice(unknown) for i in range(args.requests)]
+
+        client = deployer.app.test_client()
+        results = {'endpoint': {}, 'lookup': {}}
+        for label, enabled in (('filesystem', False), ('index', True)):
+            deployer.DOMAIN_INDEX_CONFIG['enabled'] = enabled
+            deployer.DOMAIN_INDEX['loaded_at'] = None
+            results['endpoint'][label] = round(run_endpoint(client, names), 1)
+            deployer.DOMAIN_INDEX['loaded_at'] = None
+            results['lookup'][label] = round(run_lookup(names), 1)
+
+    for mode in results.values():
+        mode['speedup'] = round(mode['index'] / mode['filesystem'], 2)
+    print(json.dumps({
+        'benchmark': 'caddy_check',
+        'domains': args.domains,
+        'requests': args.requests,
+        'checks_per_second': results
+    }, indent=2))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,16 @@
+"""
+WSGI Einstiegspunkt für Lasttests: die App mit FakeDockerClient
+
+Aufruf über bench/load_test.py oder direkt:
+    PAGES_ROOT=/tmp/pages gunicorn -c gunicorn_config.py bench.fake_app:app
+"""
+import sys
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+import app as deployer
+from bench.fake_docker import FakeDockerClient
+
+deployer.docker_client = FakeDockerClient()
+app = deployer.app
@@ -0,0 +1,240 @@
+"""
+Ersatz für den Docker Client in Benchmarks
+
+Simuliert die Step-Container (git, Hugo, rsync) mit einstellbarer Laufzeit
+und Ausgabe, sowohl als eigener Container (containers.run) als auch per exec
+in Builder-Containern. Hugo schreibt eine synthetische Build-Ausgabe nach
+<repo>/public, rsync kopiert tatsächlich. Die Werte kommen aus dem
+Konstruktor oder aus FAKE_DOCKER_* Umgebungsvariablen (für Gunicorn Worker).
+"""
+import hashlib
+import itertools
+import os
+import shlex
+import shutil
+import threading
+import time
+import types
+from pathlib import Path
+
+import docker
+
+
+def _env_float(name, default):
+    return float(os.getenv(name, default))
+
+
+class FakeDockerConfig:
+    def __init__(self, git_seconds=None, hugo_seconds=None, rsync_seconds=None, output_lines=None,
+                 files=None, file_kb=None, pull_seconds=None):
+        self.seconds = {
+            'git': git_seconds if git_seconds is not None else _env_float('FAKE_DOCKER_GIT_SECONDS', '0.2'),
+            'hugo': hugo_seconds if hugo_seconds is not None else _env_float('FAKE_DOCKER_HUGO_SECONDS', '1.0'),
+            'rsync': rsync_seconds if rsync_seconds is not None else _env_float('FAKE_DOCKER_RSYNC_SECONDS', '0.1'),
+        }
+        self.output_lines = output_lines if output_lines is not None else int(os.getenv('FAKE_DOCKER_OUTPUT_LINES', '50'))
+        self.files = files if files is not None else int(os.getenv('FAKE_DOCKER_FILES', '20'))
+        self.file_kb = file_kb if file_kb is not None else int(os.getenv('FAKE_DOCKER_FILE_KB', '8'))
+        self.pull_seconds = pull_seconds if pull_seconds is not None else _env_float('FAKE_DOCKER_PULL_SECONDS', '0')
+
+
+_ids = itertools.count(1)
+
+
+def _step_kind(image, cmd):
+    if cmd and cmd[0] == 'rsync':
+        return 'rsync'
+    if 'hugo' in image or (len(cmd) > 2 and cmd[:2] == ['/bin/sh', '-c'] and 'hugo' in cmd[2]):
+        return 'hugo'
+    if cmd and cmd[0] == 'log' or cmd[:2] == ['git', 'log']:
+        return 'git_log'
+    return 'git'
+
+
+def simulate_step(config, kind, workdir=None, source=None, destination=None, counter=[0]):
+    """
+    Führt die Nebenwirkungen eines Steps aus und gibt die Ausgabezeilen zurück
+    """
+    if kind == 'git_log':
+        return [f"{'0' * 40}\x1fBench\x1f2025-01-01 00:00:00 +0000"], 0.0
+    if kind == 'hugo' and workdir:
+        public = Path(workdir) / "public"
+        public.mkdir(parents=True, exist_ok=True)
+        counter[0] += 1
+        payload = ("<p>" + "lorem ipsum " * 8 + "</p>\n") * max(1, config.file_kb * 1024 // 100)
+        for i in range(config.files):
+            # Ein Teil der Dateien ändert sich bei jedem Build
+            content = payload + (f"<!-- build {counter[0]} -->" if i % 4 == 0 else "")
+            (public / f"page{i}.html").write_text(content)
+    if kind == 'rsync' and source and destination:
+        # rsync -a --delete
+        for entry in Path(destination).iterdir():
+            shutil.rmtree(entry) if entry.is_dir() and not entry.is_symlink() else entry.unlink()
+        shutil.copytree(source, destination, dirs_exist_ok=True, symlinks=True)
+    lines = [f"{kind} output line {i}" for i in range(config.output_lines)]
+    return lines, config.seconds['git' if kind == 'git' else kind]
+
+
+def _stream_lines(lines, seconds, stopped):
+    delay = seconds / max(len(lines), 1)
+    for line in lines:
+        if stopped():
+            return
+        if delay:
+            time.sleep(delay)
+        yield (line + "\n").encode()
+
+
+def _stats_sample():
+    return {
+        'memory_stats': {'usage': 128 * 1024 * 1024, 'stats': {'inactive_file': 0}},
+        'cpu_stats': {'cpu_usage': {'total_usage': 2}, 'system_cpu_usage': 4, 'online_cpus': 1},
+        'precpu_stats': {'cpu_usage': {'total_usage': 1}, 'system_cpu_usage': 2},
+        'pids_stats': {'current': 4}
+    }
+
+
+class FakeContainer:
+    def __init__(self, client, image, name=None, labels=None, lines=(), seconds=0.0):
+        self.client = client
+        self.id = f"fake{next(_ids):012d}"
+        self.image = image
+        self.name = name or self.id
+        self.labels = labels or {}
+        self.status = 'running'
+        self.attrs = {'State': {'OOMKilled': False}}
+        self.lines = list(lines)
+        self.seconds = seconds
+        self.killed = False
+
+    def logs(self, stream=False, follow=False, **kwargs):
+        output = _stream_lines(self.lines, self.seconds, lambda: self.killed)
+        return output if stream else b''.join(output)
+
+    def wait(self, **kwargs):
+        self.status = 'exited'
+        return {'StatusCode': 137 if self.killed else 0}
+
+    def stats(self, stream=False, decode=False, **kwargs):
+        if not stream:
+            return _stats_sample()
+
+        def generate():
+            while self.status == 'running' and self.name in self.client.containers.by_name:
+                yield _stats_sample()
+                time.sleep(1.0)
+        return generate()
+
+    def kill(self):
+        self.killed = True
+        self.status = 'exited'
+
+    def remove(self, force=False):
+        self.status = 'removed'
+        self.client.containers.by_name.pop(self.name, None)
+
+    def reload(self):
+        pass
+
+    def update(self, **kwargs):
+        pass
+
+
+class FakeContainers:
+    def __init__(self, client):
+        self.client = client
+        self.by_name = {}
+        self._lock = threading.Lock()
+
+    def run(self, image, command=None, volumes=None, detach=False, name=None, working_dir=None,
+            labels=None, **kwargs):
+        config = self.client.config
+        binds = {spec['bind']: host for host, spec in (volumes or {}).items()}
+        if name:
+            # Builder-Container, Befehle kommen per exec
+            container = FakeContainer(self.client, image, name=name, labels=labels)
+        else:
+            cmd = shlex.split(command) if isinstance(command, str) else list(command or [])
+            kind = _step_kind(image, cmd)
+            workdir = binds.get(working_dir, working_dir) if working_dir else None
+            lines, seconds = simulate_step(config, kind, workdir=workdir,
+                                           source=binds.get('/source'), destination=binds.get('/destination'))
+            if not detach:
+                time.sleep(seconds)
+                return "\n".join(lines).encode()
+            container = FakeContainer(self.client, image, lines=lines, seconds=seconds)
+        with self._lock:
+            self.by_name[container.name] = container
+        return container
+
+    def get(self, name):
+        container = self.by_name.get(name)
+        if container is None:
+            raise docker.errors.NotFound(f"No such container: {name}")
+        return container
+
+    def list(self, all=False, filters=None, **kwargs):
+        label = (filters or {}).get('label')
+        return [c for c in list(self.by_name.values()) if not label or label in c.labels]
+
+
+class FakeImages:
+    def __init__(self, client):
+        self.client = client
+
+    def _image(self, name):
+        repository = name.rsplit(':', 1)[0] if ':' in name.rsplit('/', 1)[-1] else name
+        digest = hashlib.sha256(name.encode('utf-8')).hexdigest()
+        entrypoint = ['git'] if 'git' in name else None
+        return types.SimpleNamespace(id=f"sha256:{digest}", attrs={
+            'RepoDigests': [f"{repository}@sha256:{digest}"],
+            'Config': {'Entrypoint': entrypoint}
+        })
+
+    def pull(self, repository, tag='latest', **kwargs):
+        time.sleep(self.client.config.pull_seconds)
+        return self._image(f"{repository}:{tag}")
+
+    def get(self, name):
+        return self._image(name)
+
+
+class FakeAPI:
+    def __init__(self, client):
+        self.client = client
+        self.execs = {}
+
+    def exec_create(self, container_id, cmd, user='', workdir=None, environment=None, **kwargs):
+        exec_id = f"exec{next(_ids)}"
+        self.execs[exec_id] = {'cmd': list(cmd), 'workdir': workdir, 'exit_code': None}
+        return {'Id': exec_id}
+
+    def exec_start(self, exec_id, stream=False, **kwargs):
+        entry = self.execs[exec_id]
+        cmd = entry['cmd']
+        kind = _step_kind('', cmd)
+        source = destination = None
+        if kind == 'rsync':
+            source, destination = cmd[-2], cmd[-1]
+        lines, seconds = simulate_step(self.client.config, kind, workdir=entry['workdir'],
+                                       source=source, destination=destination)
+        entry['exit_code'] = 0
+        output = _stream_lines(lines, seconds, lambda: False)
+        return output if stream else b''.join(output)
+
+    def exec_inspect(self, exec_id):
+        return {'ExitCode': self.execs.pop(exec_id, {}).get('exit_code', 0)}
+
+
+class FakeDockerClient:
+    """
+    Stand-in für docker.DockerClient mit den Aufrufen, die app.py nutzt
+    """
+    def __init__(self, config=None):
+        self.config = config or FakeDockerConfig()
+        self.containers = FakeContainers(self)
+        self.images = FakeImages(self)
+        self.api = FakeAPI(self)
+
+    def ping(self):
+        return True
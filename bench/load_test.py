@@ -0,0 +1,280 @@
+"""
+Lasttest der Endpunkte unter Gunicorn mit gevent
+
+Startet Gunicorn mit gunicorn_config.py und bench.fake_app (FakeDockerClient
+statt Docker) gegen ein temporäres PAGES_ROOT mit synthetischen Domains und
+Logs. Danach laufen nacheinander Lastszenarien für /caddy-check, /status,
+/logs und /deploy mit parallelen Keep-Alive Verbindungen. Das Ergebnis ist
+JSON mit Anfragen pro Sekunde und Latenzen (p50/p90/p99) je Szenario, beim
+Deploy-Szenario zusätzlich die Zeit bis die Warteschlange abgearbeitet ist.
+
+Aufruf:
+    python bench/load_test.py --domains 200 --duration 10 --concurrency 32
+    python bench/load_test.py --scenarios caddy_check,status --output result.json
+"""
+import argparse
+import http.client
+import json
+import logging
+import os
+import random
+import signal
+import socket
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+import app as deployer
+
+REPO_ROOT = Path(__file__).resolve().parent.parent
+SECRET = 'bench-secret'
+SCENARIOS = ('caddy_check', 'status', 'logs', 'deploy')
+
+
+def seed_pages_root(root, count, log_lines):
+    """
+    Legt Domains mit public Verzeichnis und einem Deploy-Log an
+    """
+    deployer.PAGES_ROOT = root
+    domains = [f"site{i}.example.com" for i in range(count)]
+    for domain in domains:
+        public = Path(root) / domain / "public"
+        public.mkdir(parents=True)
+        (public / "index.html").write_text(f"<h1>{domain}</h1>\n")
+        deploy_id = deployer.new_deploy_id()
+        deployer.write_deploy_log(domain, deploy_id, "hugo_compile",
+                                  "\n".join(f"line {i}" for i in range(log_lines)))
+    return domains
+
+
+def free_port():
+    with socket.socket() as sock:
+        sock.bind(('127.0.0.1', 0))
+        return sock.getsockname()[1]
+
+
+def start_server(root, port, workers, log_file, fake_env):
+    env = {
+        **os.environ,
+        **fake_env,
+        'PAGES_ROOT': root,
+        'DATA_ROOT': str(Path(root) / "_deployer"),
+        'PROMETHEUS_MULTIPROC_DIR': str(Path(root) / "_metrics"),
+        'SECRET_KEY': SECRET,
+        # git über den FakeDockerClient statt über ein lokales git Binary
+        'GIT_LOCAL': '0',
+        'PYTHONPATH': str(REPO_ROOT)
+    }
+    command = [sys.executable, '-m', 'gunicorn', '-c', 'gunicorn_config.py',
+               '-b', f'127.0.0.1:{port}', '--access-logfile', '/dev/null']
+    if workers:
+        command += ['-w', str(workers)]
+    return subprocess.Popen(command + ['bench.fake_app:app'], cwd=REPO_ROOT, env=env,
+                            stdout=log_file, stderr=subprocess.STDOUT)
+
+
+def request(conn, method, path):
+    conn.request(method, path)
+    response = conn.getresponse()
+    body = response.read()
+    return response.status, body
+
+
+def wait_ready(port, server, timeout):
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        if server.poll() is not None:
+            raise RuntimeError(f"Gunicorn beendet mit Code {server.returncode}")
+        try:
+            conn = http.client.HTTPConnection('127.0.0.1', port, timeout=5)
+            status, _ = request(conn, 'GET', '/health')
+            conn.close()
+            if status == 200:
+                return
+        except OSError:
+            pass
+        time.sleep(0.2)
+    raise RuntimeError("Gunicorn nicht bereit (/health)")
+
+
+def percentile(values, fraction):
+    if not values:
+        return None
+    index = min(len(values) - 1, int(round(fraction * (len(values) - 1))))
+    return values[index]
+
+
+def run_scenario(port, make_path, method, duration, concurrency, ok_status):
+    """
+    Schickt für duration Sekunden Anfragen über concurrency Verbindungen
+    """
+    latencies = []
+    errors = []
+    lock = threading.Lock()
+    stop_at = time.monotonic() + duration
+
+    def client(seed):
+        rng = random.Random(seed)
+        conn = None
+        local, failed = [], 0
+        while time.monotonic() < stop_at:
+            if conn is None:
+                conn = http.client.HTTPConnection('127.0.0.1', port, timeout=30)
+            start = time.perf_counter()
+            try:
+                status, _ = request(conn, method, make_path(rng))
+            except (OSError, http.client.HTTPException):
+                # Gunicorn schließt Keep-Alive Verbindungen nach dem keepalive Timeout
+                conn.close()
+                conn = None
+                failed += 1
+                continue
+            local.append(time.perf_counter() - start)
+            if status not in ok_status:
+                failed += 1
+        if conn:
+            conn.close()
+        with lock:
+            latencies.extend(local)
+            errors.append(failed)
+
+    start = time.monotonic()
+    threads = [threading.Thread(target=client, args=(i,)) for i in range(concurrency)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    elapsed = time.monotonic() - start
+
+    latencies.sort()
+    ms = lambda value: round(value * 1000, 2) if value is not None else None
+    return {
+        'requests': len(latencies),
+        'errors': sum(errors),
+        'rps': round(len(latencies) / elapsed, 1),
+        'latency_ms': {
+            'p50': ms(percentile(latencies, 0.50)),
+            'p90': ms(percentile(latencies, 0.90)),
+            'p99': ms(percentile(latencies, 0.99)),
+            'max': ms(latencies[-1] if latencies else None)
+        }
+    }
+
+
+def deploy_backlog(port):
+    """
+    Eingereihte plus laufende Deploys laut /metrics
+    """
+    conn = http.client.HTTPConnection('127.0.0.1', port, timeout=30)
+    _, body = request(conn, 'GET', f'/metrics?secret={SECRET}')
+    conn.close()
+    total = 0.0
+    for line in body.decode('utf-8').splitlines():
+        name = line.split(' ', 1)[0]
+        if name in ('deployer_queue_depth_total', 'deployer_active_builds_total'):
+            total += float(line.rsplit(' ', 1)[1])
+    return total
+
+
+def wait_drained(port, timeout):
+    start = time.monotonic()
+    while time.monotonic() - start < timeout:
+        if deploy_backlog(port) == 0:
+            return round(time.monotonic() - start, 2)
+        time.sleep(0.5)
+    return None
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--domains', type=int, default=200)
+    parser.add_argument('--duration', type=float, default=10.0,
+                        help='Sekunden pro Szenario')
+    parser.add_argument('--concurrency', type=int, default=32)
+    parser.add_argument('--workers', type=int, default=None,
+                        help='Gunicorn Worker (Standard: gunicorn_config.py)')
+    parser.add_argument('--scenarios', default=','.join(SCENARIOS))
+    parser.add_argument('--deploy-domains', type=int, default=20,
+                        help='Anzahl Domains, auf die sich die Deploys verteilen')
+    parser.add_argument('--log-lines', type=int, default=500)
+    parser.add_argument('--hugo-seconds', type=float, default=1.0)
+    parser.add_argument('--git-seconds', type=float, default=0.2)
+    parser.add_argument('--rsync-seconds', type=float, default=0.1)
+    parser.add_argument('--output-lines', type=int, default=50,
+                        help='Ausgabezeilen je simuliertem Step')
+    parser.add_argument('--files', type=int, default=20,
+                        help='Dateien je simuliertem Hugo Build')
+    parser.add_argument('--drain-timeout', type=float, default=600.0)
+    parser.add_argument('--output', help='Ergebnis zusätzlich in diese Datei schreiben')
+    args = parser.parse_args()
+
+    scenarios = [name for name in args.scenarios.split(',') if name]
+    unknown = set(scenarios) - set(SCENARIOS)
+    if unknown:
+        parser.error(f"Unbekannte Szenarien: {', '.join(sorted(unknown))}")
+
+    logging.getLogger().setLevel(logging.WARNING)
+    deployer.logger.setLevel(logging.WARNING)
+
+    fake_env = {
+        'FAKE_DOCKER_HUGO_SECONDS': str(args.hugo_seconds),
+        'FAKE_DOCKER_GIT_SECONDS': str(args.git_seconds),
+        'FAKE_DOCKER_RSYNC_SECONDS': str(args.rsync_seconds),
+        'FAKE_DOCKER_OUTPUT_LINES': str(args.output_lines),
+        'FAKE_DOCKER_FILES': str(args.files)
+    }
+
+    with tempfile.TemporaryDirectory() as root:
+        domains = seed_pages_root(root, args.domains, args.log_lines)
+        scan_names = [f"scan{i}.invalid-host.net" for i in range(500)]
+        deploy_targets = domains[:max(1, args.deploy_domains)]
+        port = free_port()
+
+        with open(Path(root) / "gunicorn.log", 'w') as log_file:
+            server = start_server(root, port, args.workers, log_file, fake_env)
+            try:
+                wait_ready(port, server, timeout=60)
+                plans = {
+                    'caddy_check': ('GET', {200, 404}, lambda rng: '/caddy-check?domain='
+                                    + (rng.choice(domains) if rng.random() < 0.5 else rng.choice(scan_names))),
+                    'status': ('GET', {200}, lambda rng: f'/status/{rng.choice(domains)}?secret={SECRET}'),
+                    'logs': ('GET', {200}, lambda rng: f'/logs/{rng.choice(domains)}?secret={SECRET}&tail=100'),
+                    'deploy': ('POST', {202}, lambda rng: f'/deploy/{rng.choice(deploy_targets)}?secret={SECRET}')
+                }
+                results = {}
+                for name in scenarios:
+                    method, ok_status, make_path = plans[name]
+                    results[name] = run_scenario(port, make_path, method, args.duration,
+                                                 args.concurrency, ok_status)
+                    if name == 'deploy':
+                        results[name]['drain_seconds'] = wait_drained(port, args.drain_timeout)
+            finally:
+                server.send_signal(signal.SIGTERM)
+                try:
+                    server.wait(timeout=60)
+                except subprocess.TimeoutExpired:
+                    server.kill()
+
+    report = {
+        'benchmark': 'load_test',
+        'timestamp': int(time.time()),
+        'domains': args.domains,
+        'duration': args.duration,
+        'concurrency': args.concurrency,
+        'workers': args.workers,
+        'fake_docker': fake_env,
+        'scenarios': results
+    }
+    output = json.dumps(report, indent=2)
+    if args.output:
+        Path(args.output).write_text(output + "\n")
+    print(output)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,87 @@
+"""
+Benchmark für die Step-Latenz: eigener Container pro Step gegen Builder-Pool
+
+Führt einen kurzen Step (git --version im alpine/git Image) wiederholt
+über run_step_container aus, einmal mit containers.run pro Step und einmal
+per exec in einem warmen Builder. Braucht einen erreichbaren Docker Daemon,
+PAGES_ROOT liegt in einem temporären Verzeichnis, das der Daemon einbinden
+können muss (Standard: unter /tmp auf dem Docker Host).
+
+Aufruf:
+    python bench/step_latency.py --runs 20
+"""
+import argparse
+import json
+import logging
+import statistics
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+import app as deployer
+
+DOMAIN = 'bench.example.com'
+
+
+def run_steps(runs, repo_path):
+    durations = []
+    for i in range(runs):
+        start = time.perf_counter()
+        deployer.run_step_container(
+            DOMAIN, f"bench_{i}", "git_pull",
+            image=deployer.STEP_IMAGES['git'],
+            command='--version',
+            volumes={str(repo_path): {'bind': '/repo', 'mode': 'rw'}},
+            working_dir='/repo',
+            user='1000'
+        )
+        durations.append(time.perf_counter() - start)
+    return {
+        'mean': round(statistics.mean(durations), 4),
+        'p50': round(statistics.median(durations), 4),
+        'max': round(max(durations), 4)
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--runs', type=int, default=20)
+    parser.add_argument('--root', default=None, help='Verzeichnis für das temporäre PAGES_ROOT')
+    args = parser.parse_args()
+
+    if not deployer.docker_client:
+        sys.exit("Docker Daemon nicht erreichbar")
+
+    logging.getLogger().setLevel(logging.WARNING)
+    deployer.logger.setLevel(logging.WARNING)
+
+    with tempfile.TemporaryDirectory(dir=args.root) as root:
+        deployer.PAGES_ROOT = root
+        repo_path = Path(root) / DOMAIN / "repository"
+        repo_path.mkdir(parents=True)
+
+        results = {}
+        deployer.BUILDER_POOL_CONFIG['enabled'] = False
+        results['container_per_step'] = run_steps(args.runs, repo_path)
+
+        deployer.BUILDER_POOL_CONFIG['enabled'] = True
+        # Erster Step erstellt den Builder der Domain
+        run_steps(1, repo_path)
+        results['builder_pool'] = run_steps(args.runs, repo_path)
+        for image in deployer.builder_images():
+            for slot in range(deployer.builder_pool_size()):
+                deployer.remove_builder(deployer.builder_key(image, DOMAIN), slot)
+
+    results['speedup'] = round(results['container_per_step']['p50'] / results['builder_pool']['p50'], 2)
+    print(json.dumps({
+        'benchmark': 'step_latency',
+        'runs': args.runs,
+        'seconds_per_step': results
+    }, indent=2))
+
+
+if __name__ == '__main__':
+    main()
@@ -1,6 +1,13 @@
 # Gunicorn configuration file
 import multiprocessing
 import os
+import shutil
+import uuid
+
+# Prometheus metrics of all workers are collected in this directory and
+# aggregated by /metrics. Must be set before the app is imported.
+os.environ.setdefault("PROMETHEUS_MULTIPROC_DIR", "/dev/shm/flask-hugo-deployer-metrics")
+os.makedirs(os.environ["PROMETHEUS_MULTIPROC_DIR"], exist_ok=True)
 
 # Server socket
 bind = "0.0.0.0:8080"
@@ -10,8 +17,9 @@ backlog = 2048
 workers = multiprocessing.cpu_count() * 2 + 1
 worker_class = "gevent"
 worker_connections = 1000
-max_requests = 1000
-max_requests_jitter = 100
+# No recycling after a number of requests: deploys run as background greenlets
+# inside the workers, a recycled worker would kill its running builds
+max_requests = 0
 
 # Timeout settings
 timeout = 300  # Increased for long-running Docker operations
@@ -52,3 +60,18 @@ def pre_fork(server, worker):
 
 def post_fork(server, worker):
     server.log.info("Worker spawned (pid: %s)", worker.pid)
+
+# Startup hooks for the deploy runtime (boot id, metrics, job workers)
+def on_starting(server):
+    # New boot id per start, the app pulls and pins the step images once per boot.
+    # The master pid cannot be used: it is always 1 in the container.
+    os.environ["DEPLOYER_BOOT_ID"] = uuid.uuid4().hex
+    # Start with empty metrics, counters of the previous run are not valid anymore
+    metrics_dir = os.environ["PROMETHEUS_MULTIPROC_DIR"]
+    shutil.rmtree(metrics_dir, ignore_errors=True)
+    os.makedirs(metrics_dir, exist_ok=True)
+
+def post_worker_init(worker):
+    # Start deploy workers and warm builder containers at boot instead of on the first deploy
+    import app
+    app.ensure_job_workers()
@@ -0,0 +1,81 @@
+"""
+Kompression der Sidecars für vorkomprimierte Assets
+
+Eigenes Modul, damit die Kompressions-Prozesse nur diese Datei laden und
+nicht die Flask-App samt Docker Client. Als Skript aufgerufen komprimiert es
+die Dateien einer Job-Datei:
+    python precompress.py <job.json> <result.json>
+"""
+import gzip
+import json
+import os
+import sys
+
+# Optionale Kompressionsverfahren
+try:
+    import brotli
+except ImportError:
+    brotli = None
+try:
+    import zstandard
+except ImportError:
+    zstandard = None
+
+PRECOMPRESS_SUFFIXES = {'gzip': '.gz', 'br': '.br', 'zstd': '.zst'}
+
+def available_formats(formats):
+    """
+    Filtert die Formate, deren Bibliothek installiert ist
+    """
+    available = {'gzip': True, 'br': brotli is not None, 'zstd': zstandard is not None}
+    return [fmt for fmt in formats if available.get(fmt)]
+
+def compress_asset(path, formats, levels):
+    """
+    Schreibt die Sidecars einer Datei (läuft im Kompressions-Prozess)
+    Sidecars, die nicht kleiner als das Original sind, werden nicht geschrieben
+    """
+    with open(path, 'rb') as f:
+        data = f.read()
+    # Sidecars nicht mehr gewünschter Formate entfernen
+    for fmt, suffix in PRECOMPRESS_SUFFIXES.items():
+        if fmt not in formats and os.path.exists(path + suffix):
+            os.unlink(path + suffix)
+    written = {}
+    for fmt in formats:
+        if fmt == 'gzip':
+            compressed = gzip.compress(data, compresslevel=levels['gzip'], mtime=0)
+        elif fmt == 'br':
+            compressed = brotli.compress(data, quality=levels['br'])
+        else:
+            compressed = zstandard.ZstdCompressor(level=levels['zstd']).compress(data)
+        sidecar = path + PRECOMPRESS_SUFFIXES[fmt]
+        if len(compressed) >= len(data) * 0.95:
+            # Alten Sidecar einer geänderten Datei nicht stehen lassen
+            if os.path.exists(sidecar):
+                os.unlink(sidecar)
+            continue
+        tmp_path = f"{sidecar}.tmp"
+        with open(tmp_path, 'wb') as f:
+            f.write(compressed)
+        os.replace(tmp_path, sidecar)
+        written[fmt] = len(compressed)
+    return len(data), written
+
+def remove_sidecars(path):
+    """
+    Entfernt alle Sidecars einer Datei
+    """
+    for suffix in PRECOMPRESS_SUFFIXES.values():
+        if os.path.exists(path + suffix):
+            os.unlink(path + suffix)
+
+def main(job_path, result_path):
+    with open(job_path) as f:
+        job = json.load(f)
+    results = [compress_asset(path, job['formats'], job['levels']) for path in job['paths']]
+    with open(result_path, 'w') as f:
+        json.dump(results, f)
+
+if __name__ == '__main__':
+    main(*sys.argv[1:3])
@@ -0,0 +1,27 @@
+import sys
+from pathlib import Path
+
+import pytest
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+import app as deployer
+
+SECRET = 'test-secret'
+
+
+@pytest.fixture
+def pages_root(tmp_path, monkeypatch):
+    """
+    PAGES_ROOT (und damit DATA_ROOT) in einem temporären Verzeichnis
+    """
+    monkeypatch.setattr(deployer, 'PAGES_ROOT', str(tmp_path))
+    monkeypatch.delenv('DATA_ROOT', raising=False)
+    monkeypatch.setenv('SECRET_KEY', SECRET)
+    monkeypatch.setattr(deployer, '_image_state_cache', {'mtime_ns': None, 'state': {}})
+    return tmp_path
+
+
+@pytest.fixture
+def client(pages_root):
+    return deployer.app.test_client()
@@ -0,0 +1,107 @@
+import json
+
+import pytest
+
+from conftest import deployer
+
+DOMAIN = 'example.com'
+OLD = 'a' * 40
+NEW = 'b' * 40
+
+
+def set_pinned_image(ref):
+    deployer.write_json_atomic(deployer.image_state_path(), {
+        'images': {deployer.COMPILER_CONFIG['image']: {'ref': ref}}
+    })
+    # Der Zustand wird pro Prozess nach mtime gecacht
+    deployer._image_state_cache['mtime_ns'] = None
+
+
+def test_build_key_is_stable(pages_root):
+    assert deployer.compute_build_key(DOMAIN, OLD) == deployer.compute_build_key(DOMAIN, OLD)
+
+
+def test_build_key_depends_on_commit_and_domain(pages_root):
+    key = deployer.compute_build_key(DOMAIN, OLD)
+    assert deployer.compute_build_key(DOMAIN, NEW) != key
+    assert deployer.compute_build_key('other.example.com', OLD) != key
+
+
+def test_build_key_depends_on_command(pages_root, monkeypatch):
+    key = deployer.compute_build_key(DOMAIN, OLD)
+    monkeypatch.setitem(deployer.COMPILER_CONFIG, 'command', 'hugo --minify')
+    assert deployer.compute_build_key(DOMAIN, OLD) != key
+
+
+def test_build_key_uses_pinned_image_digest(pages_root):
+    unpinned = deployer.compute_build_key(DOMAIN, OLD)
+    set_pinned_image('hugomods/hugo@sha256:' + '1' * 64)
+    first = deployer.compute_build_key(DOMAIN, OLD)
+    set_pinned_image('hugomods/hugo@sha256:' + '2' * 64)
+    second = deployer.compute_build_key(DOMAIN, OLD)
+    assert len({unpinned, first, second}) == 3
+
+
+def test_relevant_changes_defaults(pages_root):
+    paths = ['content/post.md', 'README.md', 'static/img/logo.png', '.github/workflows/ci.yml', 'hugo.toml']
+    assert deployer.relevant_changes(DOMAIN, paths) == ['content/post.md', 'static/img/logo.png', 'hugo.toml']
+
+
+def test_relevant_changes_domain_exclude(pages_root):
+    (pages_root / DOMAIN).mkdir()
+    (pages_root / DOMAIN / 'config.json').write_text(json.dumps({'changes': {'exclude': ['content/drafts/*']}}))
+    paths = ['content/drafts/wip.md', 'content/post.md']
+    assert deployer.relevant_changes(DOMAIN, paths) == ['content/post.md']
+
+
+@pytest.fixture
+def filter_setup(pages_root, monkeypatch):
+    public_dest = pages_root / DOMAIN / 'public'
+    public_dest.mkdir(parents=True)
+    changed = []
+    monkeypatch.setattr(deployer, 'git_changed_paths', lambda repo_path, old, new: changed)
+    job = {'domain': DOMAIN, 'deploy_id': '20260101_120000_abcdef'}
+    last_build = {'commit': OLD, 'key': deployer.compute_build_key(DOMAIN, OLD), 'deploy_id': '20260101_110000_fedcba'}
+    return job, public_dest, changed, last_build
+
+
+def run_filter(job, public_dest, last_build, commit=NEW):
+    return deployer.change_filter(job, public_dest.parent / 'repository', public_dest, commit, last_build)
+
+
+def test_change_filter_skips_irrelevant_changes(filter_setup):
+    job, public_dest, changed, last_build = filter_setup
+    changed[:] = ['README.md', '.github/workflows/ci.yml']
+    assert run_filter(job, public_dest, last_build) == {'changed': changed, 'relevant': []}
+
+
+def test_change_filter_builds_on_relevant_changes(filter_setup):
+    job, public_dest, changed, last_build = filter_setup
+    changed[:] = ['README.md', 'content/post.md']
+    assert run_filter(job, public_dest, last_build) is None
+
+
+def test_change_filter_builds_when_history_is_missing(filter_setup, monkeypatch):
+    job, public_dest, changed, last_build = filter_setup
+    monkeypatch.setattr(deployer, 'git_changed_paths', lambda repo_path, old, new: None)
+    assert run_filter(job, public_dest, last_build) is None
+
+
+def test_change_filter_builds_on_force(filter_setup):
+    job, public_dest, changed, last_build = filter_setup
+    changed[:] = ['README.md']
+    assert run_filter({**job, 'force': True}, public_dest, last_build) is None
+
+
+def test_change_filter_builds_after_image_change(filter_setup):
+    job, public_dest, changed, last_build = filter_setup
+    changed[:] = ['README.md']
+    set_pinned_image('hugomods/hugo@sha256:' + '3' * 64)
+    assert run_filter(job, public_dest, last_build) is None
+
+
+def test_change_filter_builds_without_previous_output(filter_setup):
+    job, public_dest, changed, last_build = filter_setup
+    changed[:] = ['README.md']
+    public_dest.rmdir()
+    assert run_filter(job, public_dest, last_build) is None
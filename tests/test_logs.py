@@ -0,0 +1,86 @@
+import gzip
+
+import pytest
+
+from conftest import SECRET, deployer
+
+DOMAIN = 'example.com'
+DEPLOY_ID = '20260101_120000_abcdef'
+LINES = [f"Zeile {i} " + 'x' * (i % 50) + "\n" for i in range(2000)]
+CONTENT = ''.join(LINES).encode('utf-8')
+
+
+@pytest.fixture
+def log_file(pages_root):
+    path = deployer.deploy_log_path(DOMAIN, DEPLOY_ID)
+    path.parent.mkdir(parents=True)
+    path.write_bytes(CONTENT)
+    return path
+
+
+@pytest.fixture
+def gz_log_file(log_file):
+    path = log_file.with_name(log_file.name + '.gz')
+    with gzip.open(path, 'wb') as f:
+        f.write(CONTENT)
+    log_file.unlink()
+    return path
+
+
+def get_log(client, query='', headers=None):
+    return client.get(f"/logs/{DOMAIN}/{DEPLOY_ID}?secret={SECRET}{query}", headers=headers or {})
+
+
+@pytest.mark.parametrize('count', [1, 3, 150, 1999, 2000, 5000])
+def test_read_tail_lines(log_file, count):
+    # 150 Zeilen gehen über mehrere 8 KiB Blöcke
+    assert deployer.read_tail_lines(log_file, count) == LINES[-count:]
+
+
+def test_read_tail_lines_without_trailing_newline(log_file):
+    log_file.write_bytes(b'eins\nzwei\ndrei')
+    assert deployer.read_tail_lines(log_file, 2) == ['zwei\n', 'drei']
+
+
+def test_read_tail_lines_gz(gz_log_file):
+    assert deployer.read_tail_lines(gz_log_file, 3) == LINES[-3:]
+
+
+def test_tail_query(client, log_file):
+    response = get_log(client, '&tail=3')
+    assert response.status_code == 200
+    assert response.get_data(as_text=True) == ''.join(LINES[-3:])
+
+
+@pytest.mark.parametrize('tail', ['0', '-1', 'abc', ''])
+def test_tail_query_invalid(client, log_file, tail):
+    assert get_log(client, f'&tail={tail}').status_code == 400
+
+
+def test_range_plain(client, log_file):
+    response = get_log(client, headers={'Range': 'bytes=10-19'})
+    assert response.status_code == 206
+    assert response.data == CONTENT[10:20]
+
+
+def test_range_gz(client, gz_log_file):
+    response = get_log(client, headers={'Range': 'bytes=-100'})
+    assert response.status_code == 206
+    assert response.headers['Content-Range'] == f"bytes {len(CONTENT) - 100}-{len(CONTENT) - 1}/{len(CONTENT)}"
+    assert response.data == CONTENT[-100:]
+
+
+def test_range_gz_unsatisfiable(client, gz_log_file):
+    response = get_log(client, headers={'Range': f'bytes={len(CONTENT) + 10}-'})
+    assert response.status_code == 416
+    assert response.headers['Content-Range'] == f"bytes */{len(CONTENT)}"
+
+
+def test_gz_without_range(client, gz_log_file):
+    response = get_log(client)
+    assert response.status_code == 200
+    assert response.data == CONTENT
+
+
+def test_log_requires_secret(client, log_file):
+    assert client.get(f"/logs/{DOMAIN}/{DEPLOY_ID}?secret=wrong").status_code == 401
@@ -0,0 +1,54 @@
+from conftest import deployer
+
+
+def entry(size, sha256):
+    return {'size': size, 'sha256': sha256}
+
+
+def test_diff_manifests():
+    previous = {
+        'index.html': entry(10, 'a'),
+        'style.css': entry(20, 'b'),
+        'old.html': entry(5, 'c'),
+        'img.png': entry(100, 'd')
+    }
+    current = {
+        'index.html': entry(12, 'e'),
+        'style.css': entry(20, 'b'),
+        'new.html': entry(7, 'f'),
+        'img.png': entry(100, 'd')
+    }
+    diff, stats = deployer.diff_manifests(previous, current)
+    assert diff == {
+        'added': ['new.html'],
+        'changed': ['index.html'],
+        'removed': ['old.html'],
+        'reused': ['style.css', 'img.png']
+    }
+    assert stats == {
+        'added': {'files': 1, 'bytes': 7},
+        'changed': {'files': 1, 'bytes': 12},
+        'removed': {'files': 1, 'bytes': 5},
+        'reused': {'files': 2, 'bytes': 120}
+    }
+
+
+def test_diff_manifests_same_hash_other_size_is_changed():
+    diff, _ = deployer.diff_manifests({'a': entry(1, 'x')}, {'a': entry(2, 'x')})
+    assert diff['changed'] == ['a']
+
+
+def test_diff_manifests_first_release():
+    diff, stats = deployer.diff_manifests({}, {'a': entry(3, 'x')})
+    assert diff['added'] == ['a'] and stats['reused'] == {'files': 0, 'bytes': 0}
+
+
+def test_build_manifest_skips_sidecars_and_symlinks(tmp_path):
+    (tmp_path / 'css').mkdir()
+    (tmp_path / 'index.html').write_text('<h1>hi</h1>')
+    (tmp_path / 'index.html.br').write_bytes(b'br')
+    (tmp_path / 'css' / 'main.css').write_text('body{}')
+    (tmp_path / 'link.html').symlink_to('index.html')
+    files = deployer.build_manifest(tmp_path)
+    assert sorted(files) == ['css/main.css', 'index.html']
+    assert files['index.html'] == entry(11, deployer.file_sha256(tmp_path / 'index.html'))
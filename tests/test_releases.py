@@ -0,0 +1,72 @@
+import os
+from datetime import datetime, timedelta
+
+import pytest
+
+from conftest import deployer
+
+DOMAIN = 'example.com'
+BASE = datetime(2026, 1, 1, 12, 0, 0)
+
+
+def make_release(pages_root, release_id, created=None, mtime=None):
+    path = pages_root / DOMAIN / 'releases' / release_id
+    path.mkdir(parents=True)
+    (path / 'index.html').write_text(release_id)
+    if created is not None:
+        deployer.write_json_atomic(deployer.release_meta_path(DOMAIN, release_id), {'created': created.isoformat()})
+    if mtime is not None:
+        os.utime(path, (mtime.timestamp(), mtime.timestamp()))
+    return path
+
+
+def test_list_releases_orders_by_creation_time(pages_root):
+    # Gleiche Sekunde: das zufällige Suffix sagt nichts über die Reihenfolge
+    make_release(pages_root, '20260101_120000_ffffff', created=BASE)
+    make_release(pages_root, '20260101_120000_000000', created=BASE + timedelta(milliseconds=300))
+    make_release(pages_root, '20260101_115959_aaaaaa', created=BASE - timedelta(seconds=1))
+    assert deployer.list_releases(DOMAIN) == [
+        '20260101_120000_000000', '20260101_120000_ffffff', '20260101_115959_aaaaaa'
+    ]
+
+
+def test_list_releases_falls_back_to_mtime(pages_root):
+    make_release(pages_root, '20260101_120000_abcdef', created=BASE)
+    make_release(pages_root, '20250101_000000_legacy', mtime=BASE - timedelta(days=1))
+    assert deployer.list_releases(DOMAIN) == ['20260101_120000_abcdef', '20250101_000000_legacy']
+
+
+def test_list_releases_without_directory(pages_root):
+    assert deployer.list_releases(DOMAIN) == []
+
+
+@pytest.fixture
+def five_releases(pages_root, monkeypatch):
+    monkeypatch.setitem(deployer.PUBLISH_CONFIG, 'keep_releases', 3)
+    ids = [f"20260101_12000{i}_abcdef" for i in range(5)]
+    for i, release_id in enumerate(ids):
+        make_release(pages_root, release_id, created=BASE + timedelta(seconds=i))
+    return ids
+
+
+def test_prune_releases_keeps_newest(pages_root, five_releases):
+    deployer.activate_release(DOMAIN, five_releases[-1])
+    removed = deployer.prune_releases(DOMAIN)
+    assert sorted(removed) == five_releases[:2]
+    assert deployer.list_releases(DOMAIN) == five_releases[:1:-1]
+    assert not deployer.release_meta_path(DOMAIN, five_releases[0]).exists()
+
+
+def test_prune_releases_keeps_active_after_rollback(pages_root, five_releases):
+    deployer.activate_release(DOMAIN, five_releases[0])
+    deployer.prune_releases(DOMAIN)
+    # Das aktive Release zählt zu den behaltenen
+    assert deployer.list_releases(DOMAIN) == [five_releases[4], five_releases[3], five_releases[0]]
+    assert deployer.current_release(DOMAIN) == five_releases[0]
+
+
+def test_prune_releases_keeps_at_least_active(pages_root, five_releases, monkeypatch):
+    monkeypatch.setitem(deployer.PUBLISH_CONFIG, 'keep_releases', 0)
+    deployer.activate_release(DOMAIN, five_releases[2])
+    deployer.prune_releases(DOMAIN)
+    assert deployer.list_releases(DOMAIN) == [five_releases[2]]